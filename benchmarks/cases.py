@@ -0,0 +1,122 @@
+"""
+    Benchmark cases: every case gets fixtures, prepares its data
+    and returns function without arguments, which is timed
+"""
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.common_code.efficiency_surface import EfficiencySurface
+from operations.common_parsers import tsv_parser
+from operations.common_parsers.response_parser import _parse_response_table
+from operations.interpolate_efficiency_operation import LINEAR_LOG, \
+    _interpolate_efficiency_to_new_distance
+from operations.lsrm_parsers import efaparser
+from operations.lsrm_parsers.mu import MuDB
+from operations.lsrm_parsers.speparser import SpectrumReader
+from operations.mcmodules_wrappers.read_output_bin import read_double_bin_array
+
+from .fixtures import Fixtures
+
+
+BenchmarkCase = tp.Callable[[Fixtures], tp.Callable[[], tp.Any]]
+CASES: tp.Dict[str, BenchmarkCase] = {}
+
+
+def benchmark_case(name: str) -> tp.Callable[[BenchmarkCase], BenchmarkCase]:
+    def register(case: BenchmarkCase) -> BenchmarkCase:
+        CASES[name] = case
+        return case
+    return register
+
+
+@benchmark_case("efaparser.get_all_efficiencies_from_efa")
+def _efa_parse_all(fixtures: Fixtures):
+    return lambda: efaparser.get_all_efficiencies_from_efa(fixtures.efa_filename)
+
+
+@benchmark_case("efaparser.get_eff_by_name")
+def _efa_lookup(fixtures: Fixtures):
+    return lambda: efaparser.get_eff_by_name(fixtures.efa_filename, fixtures.efa_last_record)
+
+
+@benchmark_case("Efficiency.get_eff")
+def _get_eff(fixtures: Fixtures):
+    efficiencies = [eff for eff in
+                    efaparser.get_all_efficiencies_from_efa(fixtures.efa_filename).values()
+                    if eff.zones]
+    eff = max(efficiencies, key=lambda e: len(e.zones))
+    # outside, inside, overlap of zones
+    emin, emax = eff.get_energy_range_kev()
+    energies = np.geomspace(emin / 2, emax * 2, 1000).tolist()
+    return lambda: [eff.get_eff(e) for e in energies]
+
+
+@benchmark_case("SpectrumReader.parse_spe")
+def _parse_spe(fixtures: Fixtures):
+    return lambda: SpectrumReader.parse_spe(fixtures.spe_filename)
+
+
+@benchmark_case("read_double_bin_array")
+def _read_bin(fixtures: Fixtures):
+    return lambda: read_double_bin_array(fixtures.bin_filename)
+
+
+@benchmark_case("tsv_parser.parse_tsv_to_str_cols")
+def _tsv_str_cols(fixtures: Fixtures):
+    return lambda: tsv_parser.parse_tsv_to_str_cols(fixtures.tsv_filename)
+
+
+@benchmark_case("tsv_parser.parse_tsv_to_cols")
+def _tsv_cols(fixtures: Fixtures):
+    return lambda: tsv_parser.parse_tsv_to_cols(fixtures.tsv_filename)
+
+
+@benchmark_case("tsv_parser.parse_tsv_to_str_rows")
+def _tsv_str_rows(fixtures: Fixtures):
+    return lambda: tsv_parser.parse_tsv_to_str_rows(fixtures.tsv_filename)
+
+
+@benchmark_case("tsv_parser.parse_tsv_to_float_cols")
+def _tsv_float_cols(fixtures: Fixtures):
+    return lambda: tsv_parser.parse_tsv_to_float_cols(fixtures.efficiency_tsv_filenames[0])
+
+
+@benchmark_case("MuDB.read_from_directory")
+def _mudb_load(fixtures: Fixtures):
+    return lambda: MuDB.read_from_directory(fixtures.xcom_dir)
+
+
+@benchmark_case("MuDB.get_mu_by_symbol")
+def _mudb_lookup(fixtures: Fixtures):
+    db = MuDB.read_from_directory(fixtures.xcom_dir)
+    symbols = ["H", "C", "O", "Al", "Si", "Fe", "Ge", "Pb"]
+    energies = np.geomspace(0.01, 10, 125).tolist()
+    return lambda: [db.get_mu_by_symbol(s, e) for s in symbols for e in energies]
+
+
+@benchmark_case("_interpolate_efficiency_to_new_distance")
+def _interpolate_efficiency(fixtures: Fixtures):
+    output_filename = os.path.join(fixtures.output_dir, "efficiency_7cm.tsv")
+    return lambda: _interpolate_efficiency_to_new_distance(
+        fixtures.efficiency_tsv_filenames, output_filename, [5, 10], 7, LINEAR_LOG)
+
+
+@benchmark_case("EfficiencySurface.evaluate")
+def _efficiency_surface_evaluate(fixtures: Fixtures):
+    tables = [tsv_parser.parse_tsv_to_float_cols(filename)
+              for filename in fixtures.efficiency_tsv_filenames]
+    distances = np.concatenate([np.full(len(t["energy"]), d) for t, d in zip(tables, [5, 10])])
+    energies = np.concatenate([t["energy"] for t in tables])
+    efficiencies = np.concatenate([t["efficiency"] for t in tables])
+    surface = EfficiencySurface.fit(distances, energies, efficiencies, 1, 8)
+    rng = np.random.default_rng(42)
+    query_distances = rng.uniform(5, 10, 10000)
+    query_energies = rng.uniform(20, 3000, 10000)
+    return lambda: surface.evaluate(query_distances, query_energies)
+
+
+@benchmark_case("response_parser._parse_response_table")
+def _parse_response(fixtures: Fixtures):
+    return lambda: _parse_response_table(fixtures.response_filename)
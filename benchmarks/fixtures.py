@@ -0,0 +1,135 @@
+"""
+    Synthetic input files of realistic size for benchmarks,
+    efa-records and response rows are replicated from examples/, mu-tables are XCOM/ ones
+"""
+import glob
+import os
+import struct
+import typing as tp
+from dataclasses import dataclass
+
+import numpy as np
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_DIR = os.path.join(REPO_DIR, "examples")
+XCOM_DIR = os.path.join(REPO_DIR, "XCOM")
+
+
+@dataclass
+class Fixtures:
+    efa_filename: str
+    efa_last_record: str
+    spe_filename: str
+    bin_filename: str
+    tsv_filename: str
+    efficiency_tsv_filenames: tp.List[str]
+    response_filename: str
+    output_dir: str  # temporary directory of fixtures, cases can write their outputs to it
+    xcom_dir: str = XCOM_DIR
+
+
+def _read_efa_records(filename: str) -> tp.List[tp.List[str]]:
+    """efa-file records as lists of lines, the first line is record name"""
+    records: tp.List[tp.List[str]] = []
+    with open(filename, encoding='cp1251') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith('[') and line.endswith(']') and line != "[MaterialsDescription]":
+                records.append([line])
+            elif records and line:
+                records[-1].append(line)
+    return records
+
+
+def _create_efa(filename: str, n_records: int) -> str:
+    """returns the last record name (the worst case for lookup by name)"""
+    examples = [r for efa in sorted(glob.glob(os.path.join(EXAMPLES_DIR, '**', '*.efa'),
+                                              recursive=True))
+                for r in _read_efa_records(efa)]
+    record_name = ""
+    with open(filename, 'w', encoding='cp1251') as f:
+        for i in range(n_records):
+            record = examples[i % len(examples)]
+            record_name = f'{record[0][:-1]}-{i}]'
+            f.write('\n'.join([record_name] + record[1:]) + '\n\n')
+    return record_name
+
+
+def _create_spe(filename: str, n_channels: int, rng: np.random.Generator) -> None:
+    header = ["SHIFR=benchmark", "TLIVE=3600", "TREAL=3610", "MEASBEGIN=01.01.2024 00:00:00",
+              "GEOMETRY=Point-10cm", "DISTANCE=10"]
+    channels = np.arange(n_channels)
+    counts = rng.poisson(1000 * np.exp(-channels / (n_channels / 4)) + 10).astype(np.int32)
+    with open(filename, 'wb') as f:
+        f.write(''.join(line + '\r\n' for line in header).encode('cp1251'))
+        f.write(b'SPECTR=')
+        f.write(counts.tobytes())
+
+
+def _create_bin(filename: str, size: int, rng: np.random.Generator) -> None:
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('i', size))
+        f.write(rng.random(size).astype(np.float64).tobytes())
+
+
+def _create_tsv(filename: str, columns: tp.Dict[str, np.ndarray]) -> None:
+    with open(filename, 'w') as f:
+        f.write('\t'.join(columns.keys()) + '\n')
+        for row in zip(*columns.values()):
+            f.write('\t'.join(str(v) for v in row) + '\n')
+
+
+def _create_response(filename: str, n_rows: int) -> None:
+    """rows of example response csv with increasing energies"""
+    example = os.path.join(EXAMPLES_DIR, "effmaker_distance_calc", "response_output_hpge_point.csv")
+    with open(example) as f:
+        header, *rows = [line for line in f.read().splitlines() if line]
+    with open(filename, 'w') as f:
+        f.write(header + '\n')
+        for i in range(n_rows):
+            energy, rest = rows[i % len(rows)].split(',', 1)
+            f.write(f'{0.05 + 0.01 * i:.4f},{rest}\n')
+
+
+def create_fixtures(output_dir: str, scale: float = 1.0, seed: int = 0) -> Fixtures:
+    """creates fixtures in output_dir, scale multiplies sizes of all files"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def size(n: int) -> int:
+        return max(1, int(n * scale))
+
+    efa_filename = os.path.join(output_dir, "benchmark.efa")
+    efa_last_record = _create_efa(efa_filename, size(200))
+
+    spe_filename = os.path.join(output_dir, "benchmark.spe")
+    _create_spe(spe_filename, size(8192), rng)
+
+    bin_filename = os.path.join(output_dir, "benchmark.bin")
+    _create_bin(bin_filename, size(100000), rng)
+
+    n_rows = size(10000)
+    tsv_filename = os.path.join(output_dir, "benchmark.tsv")
+    _create_tsv(tsv_filename, {
+        "energy": np.linspace(20, 3000, n_rows), "efficiency": rng.random(n_rows),
+        "defficiency": rng.random(n_rows), "nuclide": rng.choice(["Co-60", "Cs-137"], n_rows),
+        "count": rng.integers(0, 100000, n_rows), "is_valid": rng.choice(["true", "false"], n_rows),
+    })
+
+    n_rows = size(2000)
+    efficiency_tsv_filenames = []
+    for distance in [5, 10]:
+        filename = os.path.join(output_dir, f"efficiency_{distance}cm.tsv")
+        energies = np.linspace(20, 3000, n_rows)
+        _create_tsv(filename, {
+            "energy": energies, "efficiency": 0.1 / distance**2 * (energies / 100)**-0.8,
+            "defficiency": np.full(n_rows, 2.0)
+        })
+        efficiency_tsv_filenames.append(filename)
+
+    response_filename = os.path.join(output_dir, "response_output.csv")
+    _create_response(response_filename, size(300))
+
+    return Fixtures(efa_filename, efa_last_record, spe_filename, bin_filename, tsv_filename,
+                    efficiency_tsv_filenames, response_filename, output_dir)
@@ -0,0 +1,102 @@
+"""
+    Benchmarks of parsers and post-processing hot paths, no native libraries are needed.
+    Run from the repository root:
+        python -m benchmarks.run --save baseline.json
+        python -m benchmarks.run --compare baseline.json --threshold 0.2
+    With --compare exit code is 1 if any benchmark is slower than baseline by more than threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+import typing as tp
+
+from .cases import CASES
+from .fixtures import create_fixtures
+
+
+def _measure(func: tp.Callable[[], tp.Any], repeat: int, min_time: float) -> tp.Dict[str, tp.Any]:
+    """seconds per call: min and median of repeat runs, each run is at least min_time long"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min": min(times), "median": statistics.median(times), "number": number,
+            "repeat": repeat}
+
+
+def _format_time(seconds: float) -> str:
+    for unit, mul in [("s", 1), ("ms", 1e3), ("us", 1e6)]:
+        if seconds * mul >= 1:
+            return f"{seconds * mul:.3f} {unit}"
+    return f"{seconds * 1e9:.1f} ns"
+
+
+def _compare(results: tp.Dict[str, tp.Dict[str, tp.Any]],
+             baseline: tp.Dict[str, tp.Dict[str, tp.Any]], threshold: float) -> tp.List[str]:
+    """names of benchmarks slower than baseline by more than threshold (by min time)"""
+    regressions = []
+    print(f"\n{'benchmark':<48}{'baseline':>14}{'current':>14}{'ratio':>8}")
+    for name, res in results.items():
+        if name not in baseline:
+            print(f"{name:<48}{'-':>14}{_format_time(res['min']):>14}{'-':>8}")
+            continue
+        ratio = res["min"] / baseline[name]["min"]
+        is_regression = ratio > 1 + threshold
+        if is_regression:
+            regressions.append(name)
+        print(f"{name:<48}{_format_time(baseline[name]['min']):>14}"
+              f"{_format_time(res['min']):>14}{ratio:>8.2f}{'  SLOWER' if is_regression else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runs benchmarks of parsers and post-processing")
+    parser.add_argument("-k", "--filter", default="",
+                        help="run benchmarks with the substring in name only")
+    parser.add_argument("--scale", type=float, default=1.0, help="fixtures size multiplier")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimal duration of one timed run, seconds")
+    parser.add_argument("--save", default="", help="save results to json-file (baseline)")
+    parser.add_argument("--compare", default="", help="baseline json-file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown relative to baseline, default: 0.2 (20%%)")
+    args = parser.parse_args()
+
+    cases = {name: case for name, case in CASES.items() if args.filter in name}
+    results: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark_fixtures_") as fixtures_dir:
+        fixtures = create_fixtures(fixtures_dir, args.scale)
+        print(f"{'benchmark':<48}{'min':>14}{'median':>14}{'calls':>8}")
+        for name, case in cases.items():
+            res = _measure(case(fixtures), args.repeat, args.min_time)
+            results[name] = res
+            print(f"{name:<48}{_format_time(res['min']):>14}{_format_time(res['median']):>14}"
+                  f"{res['number']:>8}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "scale": args.scale, "results": results}, f, indent=4)
+        print(f"results are saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("scale", 1.0) != args.scale:
+            print(f"warning: baseline scale {baseline.get('scale')} != {args.scale}")
+        regressions = _compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks are slower than baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
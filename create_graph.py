@@ -4,6 +4,8 @@ import yaml
 
 from operations import register_operation
 from operations import Operation
+from operations.common_code.profiler import run_operation
+from operations.common_code.row_collector import start_run
 
 
 class Graph:
@@ -11,8 +13,9 @@ class Graph:
         self.operations = operations or []
 
     def run(self) -> None:
+        start_run()
         for operation in self.operations:
-            operation.run()
+            run_operation(operation)
 
 
 def parse_config(filename: str) -> Graph:
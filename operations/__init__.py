@@ -7,17 +7,25 @@ from .appspec_convert_cr2spectrum_operation import AppspecConvertcr2spectrumOper
 from .appspec_convolute_straight_spec_operation import AppspecConvoluteStraightSpecOperation  # noqa
 from .appspec_efficiency_input_prepare_operation import AppspecEfficiencyInputOperation  # noqa
 from .appspec_efficiency_calculation_operation import AppspecEfficiencyOperation  # noqa
+from .appspec_peaks_efficiency_operation import AppspecPeaksEfficiencyOperation  # noqa
 from .appspec_spectrum_input_prepare_operation import AppspecSpectrumInputOperation  # noqa
 from .appspec_spectrum_calculation_operation import AppspecSpectrumOperation  # noqa
 from .appspec_tsv_output_to_efr_operation import AppspecTsvOutputToEfr  # noqa
 from .auto_efficiency_calibrate_operation import AutoEfficiencyCalibrationOperation  # noqa
+from .bulk_detector_init_characterisation_operation import BulkDetectorInitCharacterisationOperation  # noqa
+from .bulk_efficiency_calibrate_operation import BulkEfficiencyCalibrationOperation  # noqa
+from .compare_tsv_files_operation import CompareTsvFilesOperation  # noqa
 from .copy_file_operation import CopyFileOperation  # noqa
+from .detector_characterisation_coeffs_operation import DetectorCharacterisationCoeffsOperation  # noqa
 from .detector_init_characterisation_operation import DetectorInitCharacterisationOperation  # noqa
-# from .detector_precalc_grad_characterisation_operation import DetectorPrecalGradsCharacterisationOperation  # noqa
+from .detector_precalc_grad_characterisation_operation import DetectorPrecalGradsCharacterisationOperation  # noqa
+from .detector_successive_halving_characterisation_operation import DetectorSuccessiveHalvingCharacterisationOperation  # noqa
 from .editinfile_operation import EditInFileOperation  # noqa
 from .editjson_operation import EditJsonOperation  # noqa
 from .effcalc_operation import EffCalcOperation  # noqa
 from .effcalc_out_to_tsv_operation import EffCalcOutToTsvOperation  # noqa
+from .efficiency_surface_fit_operation import EfficiencySurfaceFitOperation  # noqa
+from .efficiency_surface_query_operation import EfficiencySurfaceQueryOperation  # noqa
 from .efr_add_params_operation import EfrAddParametersOperation  # noqa
 from .efr_from_efa_operation import EfrFromEfaOperation  # noqa
 from .efr_to_tsv_operation import EfrToTsvOperation  # noqa
@@ -42,7 +50,9 @@ from .reduce_tsv_by_value_operation import ReduceTsvByValueOperation  # noqa
 from .set_effmaker_distance_operation import SetEffMakerDistanceOperation  # noqa
 from .spe2txt_converter_operation import Spe2TxtOperation  # noqa
 from .sl_extended_object_efficiency_operation import ExtendedObjectEfficiencyOperation  # noqa
+from .tsv_collect_rows_operation import TsvCollectRowOperation, TsvCollectedRowsSaveOperation  # noqa
 from .tsv_create_from_list_operation import TsvCreateFromList  # noqa
+from .tsv_group_by_operation import TsvGroupByOperation  # noqa
 from .tsv_join_by_one_column_tccfcalc_operation import TsvOneColumnJoinOperation  # noqa
 from .tsv_rename_columns_operation import TsvRenameColumnsOperation  # noqa
 from .tsv_reduce_function_operations import TsvReduceFunctionOperation  # noqa
@@ -6,13 +6,13 @@ import numpy as np
 
 from operations.operation_registry import register_operation
 from .lsrm_parsers.speparser import Spectrum, SpectrumInformation, save_spectrum_as_txt
-from .mcmodules_wrappers.appspec_wrapper import AppspecDllWrapper
+from .mcmodules_wrappers.lib_factory import create_appspec_wrapper
 
 APPSPEC_NAME = "test_spe.json"
 
 
 def _convolute_spectr(physspec_output_filename: str):
-    appspec_dll = AppspecDllWrapper()
+    appspec_dll = create_appspec_wrapper()
     res = appspec_dll.make_apparatus_spectrum(physspec_output_filename, "test_spe.json")
     if res != 0:
         raise Exception(f"Error in making app spectrum: {res}")
@@ -1,30 +1,17 @@
-import csv
+import functools
 import json
 import os
 import typing as tp
 
 from operations.operation_registry import register_operation
+from .common_code.appspec_input_template import AppspecInputTemplate, DYNAMIC_SECTION
+from .common_code.file_cache import FileCacheKey, file_cache_key
+from .common_code.physspec_results_store import get_results, to_appspec_physspec_data
+from .common_parsers.response_parser import load_response_table, to_efficiency_response
 
 
 MIN_FLOAT = 1e-15
-
-
-def _parse_response_output(
-        input_filename: str) -> tp.Tuple[tp.List[float], tp.List[float], tp.List[float]]:
-    with open(input_filename) as f:
-        reader = csv.reader(f, delimiter=",")
-        header = None
-        resp_energies = []
-        resp_nfep = []
-        resp_dfep = []
-        for row in reader:
-            if header is None:
-                header = {name: i for i, name in enumerate(row)}
-                continue
-            resp_energies.append(float(row[header["energy"]]))
-            resp_nfep.append(float(row[header["FEP"]]))
-            resp_dfep.append(float(row[header["dfep"]]))
-    return resp_energies, resp_nfep, resp_dfep
+TEMPLATE_CACHE_SIZE = 8
 
 
 def _parse_physspec_output_full(input_filename: str) -> tp.Dict[str, tp.Any]:
@@ -45,23 +32,22 @@ def _parse_physspec_output_full(input_filename: str) -> tp.Dict[str, tp.Any]:
     return res
 
 
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _get_input_template(response_key: FileCacheKey, to_indent: bool) -> AppspecInputTemplate:
+    """DetectorResponse is serialized once while response file is not changed"""
+    response = to_efficiency_response(load_response_table(response_key[0]))
+    sections = {
+        "DetectorResponse": response,
+        "PhysSpec": DYNAMIC_SECTION,
+    }
+    return AppspecInputTemplate(sections, to_indent)
+
+
 def _write_appspec_input_file(
         output_filename: str,
-        resp_energies: tp.List[float], resp_nfep: tp.List[float], resp_dfep: tp.List[float],
-        physspec_data: tp.Dict[str, tp.Any],
-        to_indent: bool = False):
-    data = {}
-    data["DetectorResponse"] = []
-    for e, fep, dfep in zip(resp_energies, resp_nfep, resp_dfep):
-        data["DetectorResponse"].append({
-            "Energy": e,
-            "normalized_fep": fep,
-            "dfep": dfep
-        })
-    data["PhysSpec"] = physspec_data
-    indent = 4 if to_indent else None
-    with open(output_filename, 'w') as f:
-        json.dump(data, f, indent=indent)
+        template: AppspecInputTemplate,
+        physspec_data: tp.Dict[str, tp.Any]):
+    template.write(output_filename, {"PhysSpec": physspec_data})
 
 
 @register_operation
@@ -71,6 +57,7 @@ class AppspecEfficiencyInputOperation:
     parameters:
         - input_response_filename: output csv-file from response calculation
         - input_physspec_filename: output json-file from physspec calculation
+            (results kept in memory by PhysspecOperation are used instead of file, if any)
         - output_filename: desirable input filename for appspec calculation
         - to_indent_output: add spaces and CR to json or create one-line json
     """
@@ -92,10 +79,15 @@ class AppspecEfficiencyInputOperation:
 
     def run(self) -> None:
         print('start apspec_efficiency_prepare')
-        # get energies, nfep, dfep from response
-        resp_energies, resp_nfep, resp_dfep = _parse_response_output(self.input_response_filename)
+        # get energies, nfep, dfep from response (serialized once per file)
+        template = _get_input_template(file_cache_key(self.input_response_filename),
+                                       self.to_indent_output)
         # get energies, crs, intensities from physspec_output
-        physspec_data = _parse_physspec_output_full(self.input_physspec_filename)
+        physspec_results = get_results(self.input_physspec_filename)
+        if physspec_results is not None:
+            physspec_data = to_appspec_physspec_data(physspec_results,
+                                                     self.input_physspec_filename)
+        else:
+            physspec_data = _parse_physspec_output_full(self.input_physspec_filename)
         # write'em all to output-file
-        _write_appspec_input_file(self.output_filename, resp_energies, resp_nfep, resp_dfep,
-                                  physspec_data, self.to_indent_output)
+        _write_appspec_input_file(self.output_filename, template, physspec_data)
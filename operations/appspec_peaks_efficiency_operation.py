@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.physspec_results_store import get_results
+from .common_parsers.response_parser import load_response_table
+from .common_parsers.tsv_parser import parse_tsv_to_float_cols
+from .mcmodules_wrappers.appspec import calc_efficiency_batch
+
+
+OUTPUT_COLUMNS = ["energy", "efficiency", "defficiency", "count_rate", "intensity", "error"]
+
+
+def _load_peaks_from_tsv(filename: str, column_names: tp.List[str]) -> tp.List[np.ndarray]:
+    data = parse_tsv_to_float_cols(filename)
+    return [np.array(data[name], dtype=np.float64) for name in column_names]
+
+
+def _load_peaks_from_physspec(filename: str) -> tp.List[np.ndarray]:
+    results = get_results(filename)
+    if results is not None:
+        return [results.x1, results.y1, results.dy1, results.y0]
+    with open(filename) as f:
+        data = json.load(f)["CalculationResults"]
+    return [np.array(data[name], dtype=np.float64) for name in ["x1", "y1", "dy1", "y0"]]
+
+
+def _save_tsv(columns: tp.List[np.ndarray], output_filename: str):
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(OUTPUT_COLUMNS))
+        f.write('\n')
+        for row in zip(*[c.tolist() for c in columns]):
+            f.write('\t'.join(str(v) for v in row))
+            f.write('\n')
+
+
+@register_operation
+class AppspecPeaksEfficiencyOperation:
+    """
+    AppspecPeaksEfficiencyOperation calculates efficiencies for the whole peak table
+    using appspec.dll(.so) directly (without appspec input and output json-files)
+    parameters:
+        - input_response_filename: output csv-file from response calculation
+        - input_filename: tsv-file with peaks (energy in MeV, count rate, its uncertainty,
+            intensity), or
+        - input_physspec_filename: output json-file from physspec calculation
+            (results kept in memory by PhysspecOperation are used instead of file, if any)
+        - output_filename: output tsv-file with columns
+            energy, efficiency, defficiency, count_rate, intensity, error
+            (can be converted by AppspecTsvOutputToEfr)
+        - column_names: peaks tsv column names for energy, count rate, its uncertainty
+            and intensity (default: energy, count_rate, dcount_rate, intensity)
+        - is_log: use log for approximation
+    """
+    def __init__(self):
+        self.input_response_filename = ""
+        self.input_filename = ""
+        self.input_physspec_filename = ""
+        self.output_filename = ""
+        self.column_names = ["energy", "count_rate", "dcount_rate", "intensity"]
+        self.is_log = False
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> (
+            'AppspecPeaksEfficiencyOperation'):
+        op = AppspecPeaksEfficiencyOperation()
+        op.input_response_filename = os.path.join(project_dir, section['input_response_filename'])
+        if 'input_filename' in section:
+            op.input_filename = os.path.join(project_dir, section['input_filename'])
+        if 'input_physspec_filename' in section:
+            op.input_physspec_filename = os.path.join(project_dir,
+                                                      section['input_physspec_filename'])
+        assert bool(op.input_filename) != bool(op.input_physspec_filename), \
+            "set input_filename or input_physspec_filename"
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.column_names = section.get('column_names', op.column_names)
+        assert len(op.column_names) == 4, "column_names: energy, count_rate, dcount_rate, intensity"
+        op.is_log = section.get('is_log', op.is_log)
+        return op
+
+    def run(self) -> None:
+        print('start appspec_peaks_efficiency calculation')
+        if self.input_filename:
+            energies, crs, dcrs, intensities = _load_peaks_from_tsv(self.input_filename,
+                                                                    self.column_names)
+        else:
+            energies, crs, dcrs, intensities = _load_peaks_from_physspec(
+                self.input_physspec_filename)
+        response = load_response_table(self.input_response_filename)
+        effs, deffs, errors = calc_efficiency_batch(
+            response.column("energy"), response.column("FEP"), response.column("dfep"),
+            self.is_log, energies, crs, dcrs, intensities)
+        n_errors = np.count_nonzero(errors)
+        if n_errors:
+            logging.warning(f'efficiency calculation errors for {n_errors} of {len(errors)} peaks')
+        _save_tsv([energies, effs, deffs, crs, intensities, errors], self.output_filename)
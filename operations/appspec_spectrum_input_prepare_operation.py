@@ -1,95 +1,17 @@
-import csv
+import functools
 import json
 import os
 import typing as tp
 
 from operations.operation_registry import register_operation
+from .common_code.appspec_input_template import AppspecInputTemplate, DYNAMIC_SECTION
+from .common_code.file_cache import FileCacheKey, file_cache_key
+from .common_code.physspec_results_store import get_results, to_appspec_physspec_data
+from .common_parsers.response_parser import load_response_table, to_detector_response
 
 
 MIN_FLOAT = 1e-15
-RESPONSE_JSON_TO_CSV_NAMES = {
-    "Energy": "energy",
-    "fep": "fep",
-    "sep": "sep",
-    "dep": "dep",
-    "p511": "p511",
-    "xep_total": "xept",
-    "dfep": "dfep",
-    "dsep": "dsep",
-    "ddep": "ddep",
-    "dp511": "dp511",
-    "dxep_total": "dxept",
-    "normalized_fep": "FEP",
-    "normalized_sep": "SEP",
-    "normalized_dep": "DEP",
-    "normalized_p511": "P511",
-    "normalized_xep_total": "XEPT",
-    "e_xep": "exep",
-    "xep": "xep",
-    "dxep": "dxep",
-    "normalized_xep": "XEP",
-}
-
-
-def _list_func(value: str) -> list[float]:
-    return [float(token) for token in value.split(';')]
-
-
-CSV_NAME_TO_FUNC = {
-    "exep": _list_func,
-    "xep": _list_func,
-    "dxep": _list_func,
-    "XEP": _list_func,
-}
-
-
-def _parse_response_row(row: tp.List[str], header: tp.Dict[str, int]) -> tp.Dict[str, tp.Any]:
-    res = {}
-    for j_name, c_name in RESPONSE_JSON_TO_CSV_NAMES.items():
-        idx = header[c_name]
-        f = CSV_NAME_TO_FUNC.get(c_name, float)
-        value = f(row[idx])
-        res[j_name] = value
-    # a-array
-    res["a"] = []
-    for i in range(6):
-        for j in range(9):
-            c_name = f"a{i}{j}"
-            idx = header[c_name]
-            value = float(row[idx])
-            res["a"].append(value)
-    # b-array
-    res["b"] = []
-    for i in range(2):
-        for j in range(9):
-            c_name = f"b{i}{j}"
-            idx = header[c_name]
-            value = float(row[idx])
-            res["b"].append(value)
-    return res
-
-
-def _parse_response_output(
-        input_filename: str) -> tp.Dict[str, tp.Any]:
-    responses = []
-    with open(input_filename) as f:
-        reader = csv.reader(f, delimiter=",")
-        header = None
-        for row in reader:
-            if header is None:
-                header = {name: i for i, name in enumerate(row)}
-                continue
-            responses.append(
-                _parse_response_row(row, header)
-            )
-    return {
-        "Emin": responses[0]["Energy"],
-        "Emax": responses[-1]["Energy"],
-        "N_points": len(responses),
-        "Nmin": 100,
-        "Nmax": 1000,
-        "Response": responses,
-    }
+TEMPLATE_CACHE_SIZE = 8
 
 
 def _parse_physspec_output_full(input_filename: str) -> tp.Dict[str, tp.Any]:
@@ -115,20 +37,25 @@ def _read_json_data(input_filename: str) -> tp.Dict[str, tp.Any]:
         return json.load(f)
 
 
-def _write_appspec_input_file(
-        output_filename: str,
-        response: tp.Dict[str, tp.Any],
-        physspec_data: tp.Dict[str, tp.Any],
-        analyzer_data: tp.Dict[str, tp.Any],
-        resp_mtx_data: tp.Dict[str, tp.Any],
-        to_indent: bool = False):
-    data = {
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _get_input_template(response_key: FileCacheKey, analyzer_key: FileCacheKey,
+                        resp_mtx_key: FileCacheKey, to_indent: bool) -> AppspecInputTemplate:
+    """static sections are serialized once while their files are not changed"""
+    response = to_detector_response(load_response_table(response_key[0]))
+    analyzer_data = _read_json_data(analyzer_key[0])
+    resp_mtx_data = _read_json_data(resp_mtx_key[0])
+    sections = {
         "DetectorResponse": response,
-        "PhysSpec": physspec_data,
+        "PhysSpec": DYNAMIC_SECTION,
     } | resp_mtx_data | analyzer_data
-    indent = 4 if to_indent else None
-    with open(output_filename, 'w') as f:
-        json.dump(data, f, indent=indent)
+    return AppspecInputTemplate(sections, to_indent)
+
+
+def _write_appspec_input_file(
+        output_filename: str,
+        template: AppspecInputTemplate,
+        physspec_data: tp.Dict[str, tp.Any]):
+    template.write(output_filename, {"PhysSpec": physspec_data})
 
 
 @register_operation
@@ -138,6 +65,7 @@ class AppspecSpectrumInputOperation:
     parameters:
         - input_response_filename: output csv-file from response calculation
         - input_physspec_filename: output json-file from physspec calculation
+            (results kept in memory by PhysspecOperation are used instead of file, if any)
         - input_analyzer_filename: input filename with analyzer
         - input_response_matrix_filename: input filename with response matrix
         - output_filename: desirable input filename for appspec calculation
@@ -165,10 +93,16 @@ class AppspecSpectrumInputOperation:
 
     def run(self) -> None:
         print('start apspec_efficiency_prepare')
-        response = _parse_response_output(self.input_response_filename)
-        physspec_data = _parse_physspec_output_full(self.input_physspec_filename)
-        analyzer_data = _read_json_data(self.input_analyzer_filename)
-        resp_mtx_data = _read_json_data(self.input_response_matrix_filename)
-        # write'em all to output-file
-        _write_appspec_input_file(self.output_filename, response, physspec_data, analyzer_data,
-                                  resp_mtx_data, self.to_indent_output)
+        template = _get_input_template(
+            file_cache_key(self.input_response_filename),
+            file_cache_key(self.input_analyzer_filename),
+            file_cache_key(self.input_response_matrix_filename),
+            self.to_indent_output)
+        physspec_results = get_results(self.input_physspec_filename)
+        if physspec_results is not None:
+            physspec_data = to_appspec_physspec_data(physspec_results,
+                                                     self.input_physspec_filename)
+        else:
+            physspec_data = _parse_physspec_output_full(self.input_physspec_filename)
+        # write'em all to output-file, only PhysSpec is serialized on every run
+        _write_appspec_input_file(self.output_filename, template, physspec_data)
@@ -5,6 +5,7 @@ from operations.operation_registry import register_operation
 
 from .lsrm_parsers import efaparser
 from .sl_wrappers import efficiency_calibration as ec
+from .sl_wrappers import zone_search as zs
 
 
 @register_operation
@@ -12,18 +13,28 @@ class AutoEfficiencyCalibrationOperation:
     """
     AutoEfficiencyCalibrationOperation make auto efficiency calibration for efr-file and
         saves approximation to efa-file.
-    It needs liborthogonal_polynomials.so for work
+    It needs liborthogonal_polynomials.so for work (or numpy backend)
     parameters:
         - input_filename: input efr file
         - output_filename: desirable name of the output efa filename
         - zones_config: list with zone to create: [{degree: 3, left: 50, right: 300}, ...]
         - is_append: append new efficiency section to file or create new one
+        - backend: library (liborthogonal_polynomials.so, default) or numpy
+        - search: search zones boundaries and degrees instead of zones_config, dict with
+            optional parameters (see ZoneSearchConfig): {degrees: [2, 3, 4, 5], splits: [],
+            n_splits: 8, overlap: 0.25, max_zones: 2, folds: 5, workers: 1, seed: 0}.
+            Candidates are fitted with numpy, the best one (by cross-validation chi2)
+            is fitted with backend and saved.
+        - search_report_filename: tsv-file with all scored candidates (optional)
     """
     def __init__(self):
         self.input_filename = ""
         self.output_filename = ""
         self.zones_config = ec.DEFAULT_ZONES_CONFIG
         self.is_append = False
+        self.backend = ec.LIBRARY_BACKEND
+        self.search_config: tp.Optional[zs.ZoneSearchConfig] = None
+        self.search_report_filename = ""
 
     @staticmethod
     def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
@@ -33,18 +44,27 @@ class AutoEfficiencyCalibrationOperation:
         op.output_filename = os.path.join(project_dir, section['output_filename'])
         assert op.input_filename != op.output_filename
         if section.get("zone_config"):
-            op.zones_config = []
-            zones = section["zone_config"]
-            for z in zones:
-                op.zones_config.append(
-                    ec.ZoneConfig(z["degree"], z["left"], z["right"])
-                )
+            op.zones_config = ec.zones_config_from_yaml(section["zone_config"])
         assert len(op.zones_config) > 0
         op.is_append = section.get("is_append", op.is_append)
+        op.backend = section.get("backend", op.backend)
+        assert op.backend in ec.BACKENDS, f"backend must be one of {ec.BACKENDS}"
+        if section.get("search") is not None:
+            op.search_config = zs.ZoneSearchConfig(**section["search"])
+        if section.get("search_report_filename"):
+            op.search_report_filename = os.path.join(project_dir,
+                                                     section["search_report_filename"])
         return op
 
     def run(self) -> None:
         print('start auto_efficiency_calibration')
         efr = efaparser.get_efficiency_from_efa(self.input_filename)
-        efa = ec.approx_efr_with_polynomes(efr, self.zones_config)
+        zones_config = self.zones_config
+        if self.search_config is not None:
+            scores = zs.search_zones(*ec.get_fit_data(efr), self.search_config)
+            if self.search_report_filename:
+                zs.save_scores_to_tsv(scores, self.search_report_filename)
+            zones_config = scores[0].zones_config
+            print(f'best zones config: {zones_config}, cv_chi2: {scores[0].cv_chi2}')
+        efa = ec.approx_efr_with_polynomes(efr, zones_config, self.backend)
         efa.save_as_efa(self.output_filename, self.is_append)
@@ -0,0 +1,120 @@
+import glob
+import os
+import re
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.text_files import save_report
+from .detector_init_characterisation_operation import DETECTOR_TYPE_TO_PARAM_NAMES, \
+    _edit_infile, _load_eff_from_tsv, features_to_params, load_coeffs_solver, solve_features
+
+
+# coeffs files are named like coeffs_coaxial_ge_25cm.json
+COEFFS_DISTANCE_RE = re.compile(r'_(\d+(?:\.\d+)?)cm\.json$')
+
+
+def _get_coeffs_distances(filemask: str) -> tp.Dict[str, float]:
+    res = {}
+    for filename in sorted(glob.glob(filemask)):
+        m = COEFFS_DISTANCE_RE.search(filename)
+        if m:
+            res[filename] = float(m.group(1))
+    if not res:
+        raise RuntimeError(f"no coeffs files with distance in name for {filemask}")
+    return res
+
+
+def _select_matrix_file(coeffs_distances: tp.Dict[str, float], distance: float) -> str:
+    """coeffs file for the closest distance"""
+    return min(coeffs_distances, key=lambda f: abs(coeffs_distances[f] - distance))
+
+
+@register_operation
+class BulkDetectorInitCharacterisationOperation:
+    """
+    BulkDetectorInitCharacterisationOperation makes the 1st step in detector characterisation
+        (as DetectorInitCharacterisationOperation) for many detectors: detectors with the same
+        coeffs file are solved with one matrix product, coeffs are factorized once per file
+    parameters:
+        - detectors: list of detectors: [{input_in_filename: ..., input_tsv_filename: ...,
+            output_filename: ..., distance: ...}, ...], distance is optional
+        - detector_type: COAXIAL, SCINTIL
+        - input_matrix_file: json-file with precalculated coefficients for all detectors
+        - input_matrix_filemask: coeffs files mask, e.g. coeffs_coaxial_ge_*cm.json,
+            instead of input_matrix_file: file with the closest distance (from filename)
+            is selected for every detector
+        - distance: point source distance of detectors without distance, cm
+        - report_filename: tsv-file with selected coeffs file and params of every detector
+            (optional)
+    """
+    def __init__(self):
+        self.detectors: tp.List[tp.Dict[str, tp.Any]] = []
+        self.detector_type = ""
+        self.input_matrix_file = ""
+        self.input_matrix_filemask = ""
+        self.distance: tp.Optional[float] = None
+        self.report_filename = ""
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'BulkDetectorInitCharacterisationOperation':
+        op = BulkDetectorInitCharacterisationOperation()
+        op.distance = section.get("distance", op.distance)
+        for rec in section['detectors']:
+            detector = {k: os.path.join(project_dir, rec[k])
+                        for k in ['input_in_filename', 'input_tsv_filename', 'output_filename']}
+            assert detector['input_in_filename'] != detector['output_filename'], \
+                "input and output in-files cannot be the same"
+            detector['distance'] = rec.get('distance', op.distance)
+            op.detectors.append(detector)
+        op.detector_type = section["detector_type"]
+        assert op.detector_type in DETECTOR_TYPE_TO_PARAM_NAMES, "unsupported detector type"
+        if section.get('input_matrix_file'):
+            op.input_matrix_file = os.path.join(project_dir, section['input_matrix_file'])
+        else:
+            op.input_matrix_filemask = os.path.join(project_dir, section['input_matrix_filemask'])
+            assert all(d['distance'] is not None for d in op.detectors), \
+                "distance is needed to select coeffs file"
+        if section.get('report_filename'):
+            op.report_filename = os.path.join(project_dir, section['report_filename'])
+        return op
+
+    def _group_by_matrix_file(self) -> tp.Dict[str, tp.List[int]]:
+        if self.input_matrix_file:
+            return {self.input_matrix_file: list(range(len(self.detectors)))}
+        coeffs_distances = _get_coeffs_distances(self.input_matrix_filemask)
+        groups: tp.Dict[str, tp.List[int]] = {}
+        for i, detector in enumerate(self.detectors):
+            matrix_file = _select_matrix_file(coeffs_distances, detector['distance'])
+            groups.setdefault(matrix_file, []).append(i)
+        return groups
+
+    def run(self) -> None:
+        print('start bulk_detector_init_characterisation operation')
+        param_names = DETECTOR_TYPE_TO_PARAM_NAMES[self.detector_type]
+        report = [[] for _ in self.detectors]
+        for matrix_file, indices in self._group_by_matrix_file().items():
+            energies_count = len(load_coeffs_solver(matrix_file).bias)
+            effs = []
+            for i in indices:
+                input_tsv_filename = self.detectors[i]['input_tsv_filename']
+                eff = _load_eff_from_tsv(input_tsv_filename)
+                assert eff, f"no efficiency in {input_tsv_filename}"
+                # efficiencies are stacked to one matrix, energies must be as in coeffs
+                if len(eff) != energies_count:
+                    raise RuntimeError(f"{len(eff)} efficiencies in {input_tsv_filename}, "
+                                       f"{energies_count} energies in {matrix_file}")
+                effs.append(eff)
+            features = solve_features(matrix_file, np.array(effs))
+            for i, x_hat in zip(indices, features):
+                detector = self.detectors[i]
+                param_values = features_to_params(x_hat, self.detector_type)
+                _edit_infile(detector['input_in_filename'], detector['output_filename'],
+                             dict(zip(param_names, param_values)))
+                report[i] = [detector['input_in_filename'], matrix_file] + param_values
+            print(f'{os.path.basename(matrix_file)}: {len(indices)} detectors')
+        if self.report_filename:
+            save_report(report, ["input_in_filename", "matrix_file"] + param_names,
+                        self.report_filename)
@@ -0,0 +1,82 @@
+import glob
+import logging
+import os
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+
+from operations.operation_registry import register_operation
+
+from .lsrm_parsers import efaparser
+from .sl_wrappers import efficiency_calibration as ec
+
+
+def _calibrate_files(args) -> tp.List[efaparser.Efficiency]:
+    """reads efr-files and approximates them with one fitter, files with errors are skipped"""
+    filenames, zones_config, backend = args
+    effs = []
+    for filename in filenames:
+        eff = efaparser.get_efficiency_from_efa(filename)
+        if eff is None or not ec.has_enough_points(eff, zones_config):
+            logging.warning(f'{filename}: not enough efficiency points for zones, skipped')
+            continue
+        effs.append(eff)
+    if not effs:
+        return []
+    return ec.approx_efrs_with_polynomes(effs, zones_config, backend)
+
+
+@register_operation
+class BulkEfficiencyCalibrationOperation:
+    """
+    BulkEfficiencyCalibrationOperation makes auto efficiency calibration for many efr-files
+        and saves all approximations to one efa-file
+    parameters:
+        - input_filemask: efr-files mask, e.g. path/*.efr (or path/**/*.efr for subdirectories)
+        - output_filename: desirable name of the output efa filename
+        - zone_config: list with zone to create: [{degree: 3, left: 50, right: 300}, ...]
+        - backend: library (liborthogonal_polynomials.so, default) or numpy
+            (numpy fits every zone for all files at once)
+        - workers: number of processes, files are split between them (default: 1)
+        - is_append: append to output file or create new one
+    """
+    def __init__(self):
+        self.input_filemask = ""
+        self.output_filename = ""
+        self.zones_config = ec.DEFAULT_ZONES_CONFIG
+        self.backend = ec.LIBRARY_BACKEND
+        self.workers = 1
+        self.is_append = False
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'BulkEfficiencyCalibrationOperation':
+        op = BulkEfficiencyCalibrationOperation()
+        op.input_filemask = os.path.join(project_dir, section['input_filemask'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        if section.get("zone_config"):
+            op.zones_config = ec.zones_config_from_yaml(section["zone_config"])
+        assert len(op.zones_config) > 0
+        op.backend = section.get("backend", op.backend)
+        assert op.backend in ec.BACKENDS, f"backend must be one of {ec.BACKENDS}"
+        op.workers = section.get("workers", op.workers)
+        assert op.workers > 0
+        op.is_append = section.get("is_append", op.is_append)
+        return op
+
+    def run(self) -> None:
+        print('start bulk_efficiency_calibration')
+        filenames = sorted(
+            f for f in glob.glob(self.input_filemask, recursive=True)
+            if os.path.isfile(f) and os.path.abspath(f) != os.path.abspath(self.output_filename)
+        )
+        if self.workers > 1 and len(filenames) > 1:
+            chunk_size = (len(filenames) + self.workers - 1) // self.workers
+            chunks = [filenames[i:i+chunk_size] for i in range(0, len(filenames), chunk_size)]
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = pool.map(_calibrate_files,
+                                   [(chunk, self.zones_config, self.backend) for chunk in chunks])
+                effs = [eff for chunk_effs in results for eff in chunk_effs]
+        else:
+            effs = _calibrate_files((filenames, self.zones_config, self.backend))
+        print(f'calibrated {len(effs)} of {len(filenames)} files')
+        efaparser.save_efficiencies_as_efa(effs, self.output_filename, self.is_append)
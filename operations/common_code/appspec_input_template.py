@@ -0,0 +1,68 @@
+import json
+import typing as tp
+
+
+INDENT = 4
+
+
+class _DynamicSection:
+    def __repr__(self) -> str:
+        return "DYNAMIC_SECTION"
+
+
+# placeholder for sections, which are set on every write
+DYNAMIC_SECTION = _DynamicSection()
+
+
+def _dump_value(value: tp.Any, to_indent: bool) -> str:
+    if not to_indent:
+        return json.dumps(value)
+    # nested value is placed on the 1st indent level of the top object,
+    # json strings cannot contain raw new lines, so it's safe to shift all lines
+    return json.dumps(value, indent=INDENT).replace('\n', '\n' + ' ' * INDENT)
+
+
+class AppspecInputTemplate:
+    """
+    AppspecInputTemplate -- precompiled appspec input json-file.
+    Static top-level sections are serialized once in constructor,
+    sections with DYNAMIC_SECTION value are serialized on every write and spliced between
+    static parts. Output is the same as json.dump of the whole dict.
+    """
+    def __init__(self, sections: tp.Dict[str, tp.Any], to_indent: bool = False):
+        self.to_indent = to_indent
+        if to_indent:
+            begin, item_sep, key_sep, end = '{\n' + ' ' * INDENT, ',\n' + ' ' * INDENT, ': ', '\n}'
+        else:
+            begin, item_sep, key_sep, end = '{', ', ', ': ', '}'
+        if not sections:
+            begin, end = '{', '}'
+
+        # parts: static strings and dynamic section names
+        self._parts: tp.List[tp.Tuple[bool, str]] = []
+        static = begin
+        for i, (name, value) in enumerate(sections.items()):
+            if i > 0:
+                static += item_sep
+            static += json.dumps(name) + key_sep
+            if value is DYNAMIC_SECTION:
+                self._parts.append((False, static))
+                self._parts.append((True, name))
+                static = ''
+            else:
+                static += _dump_value(value, to_indent)
+        self._parts.append((False, static + end))
+
+    @property
+    def dynamic_names(self) -> tp.List[str]:
+        return [part for is_dynamic, part in self._parts if is_dynamic]
+
+    def render(self, dynamic_sections: tp.Dict[str, tp.Any]) -> tp.List[str]:
+        return [
+            _dump_value(dynamic_sections[part], self.to_indent) if is_dynamic else part
+            for is_dynamic, part in self._parts
+        ]
+
+    def write(self, output_filename: str, dynamic_sections: tp.Dict[str, tp.Any]) -> None:
+        with open(output_filename, 'w') as f:
+            f.writelines(self.render(dynamic_sections))
@@ -0,0 +1,111 @@
+"""
+    Efficiency surface eff(distance, energy): least squares fit of log(efficiency) by
+    2d Legendre polynomial of log(distance) and log(energy) (both mapped to [-1, 1]).
+    The model is a small coefficients matrix, it's saved to json-file and evaluated
+    for a batch of (distance, energy) pairs with a few vectorized numpy calls.
+"""
+import json
+import logging
+import typing as tp
+
+import numpy as np
+from numpy.polynomial import legendre
+
+
+MODEL_TYPE = "legendre2d_log"
+
+
+def _to_unit(log_x: np.ndarray, log_range: tp.Tuple[float, float]) -> np.ndarray:
+    left, right = log_range
+    if right == left:
+        return np.zeros_like(log_x)
+    return 2 * (log_x - left) / (right - left) - 1
+
+
+class EfficiencySurface:
+    """
+    EfficiencySurface -- smooth efficiency model by distance and energy
+    """
+    def __init__(self, coeffs: np.ndarray, distance_range: tp.Tuple[float, float],
+                 energy_range: tp.Tuple[float, float]):
+        # coeffs[i, j] -- coefficient of P_i(distance) * P_j(energy)
+        self.coeffs = np.asarray(coeffs, dtype=np.float64)
+        self.distance_range = (float(distance_range[0]), float(distance_range[1]))
+        self.energy_range = (float(energy_range[0]), float(energy_range[1]))
+        self.log_distance_range = (np.log(self.distance_range[0]), np.log(self.distance_range[1]))
+        self.log_energy_range = (np.log(self.energy_range[0]), np.log(self.energy_range[1]))
+
+    @property
+    def distance_degree(self) -> int:
+        return self.coeffs.shape[0] - 1
+
+    @property
+    def energy_degree(self) -> int:
+        return self.coeffs.shape[1] - 1
+
+    @staticmethod
+    def fit(distances: np.ndarray, energies: np.ndarray, efficiencies: np.ndarray,
+            distance_degree: int, energy_degree: int) -> "EfficiencySurface":
+        """distances, energies, efficiencies: points of the surface, arrays of the same shape"""
+        distances = np.ravel(distances).astype(np.float64)
+        energies = np.ravel(energies).astype(np.float64)
+        log_d = np.log(distances)
+        log_e = np.log(energies)
+        log_eff = np.log(np.ravel(efficiencies).astype(np.float64))
+        assert len(log_d) == len(log_e) == len(log_eff)
+        assert np.all(np.isfinite(log_eff)), "efficiencies must be positive"
+        n_distances = len(np.unique(log_d))
+        n_energies = len(np.unique(log_e))
+        if distance_degree >= n_distances or energy_degree >= n_energies:
+            raise RuntimeError(f"not enough points for degrees ({distance_degree}, "
+                               f"{energy_degree}): {n_distances} distances, "
+                               f"{n_energies} energies")
+        surface = EfficiencySurface(np.zeros((distance_degree + 1, energy_degree + 1)),
+                                    (distances.min(), distances.max()),
+                                    (energies.min(), energies.max()))
+        a = legendre.legvander2d(_to_unit(log_d, surface.log_distance_range),
+                                 _to_unit(log_e, surface.log_energy_range),
+                                 [distance_degree, energy_degree])
+        coeffs, _, _, _ = np.linalg.lstsq(a, log_eff, rcond=None)
+        surface.coeffs = coeffs.reshape(surface.coeffs.shape)
+        return surface
+
+    def _is_in_range(self, log_x: np.ndarray, log_range: tp.Tuple[float, float]) -> bool:
+        eps = 1e-9 * max(1.0, abs(log_range[1] - log_range[0]))
+        return bool(np.all((log_x >= log_range[0] - eps) & (log_x <= log_range[1] + eps)))
+
+    def evaluate(self, distances: tp.Any, energies: tp.Any) -> np.ndarray:
+        """efficiencies for (distance, energy) pairs, arguments are broadcasted"""
+        log_d, log_e = np.broadcast_arrays(np.log(np.asarray(distances, dtype=np.float64)),
+                                           np.log(np.asarray(energies, dtype=np.float64)))
+        if not self._is_in_range(log_d, self.log_distance_range) or \
+                not self._is_in_range(log_e, self.log_energy_range):
+            logging.warning("efficiency surface is extrapolated out of the fitted range")
+        return np.exp(legendre.legval2d(_to_unit(log_d, self.log_distance_range),
+                                        _to_unit(log_e, self.log_energy_range), self.coeffs))
+
+    def to_dict(self) -> tp.Dict[str, tp.Any]:
+        return {
+            "type": MODEL_TYPE,
+            "distance_range": list(self.distance_range),
+            "energy_range": list(self.energy_range),
+            "distance_degree": self.distance_degree,
+            "energy_degree": self.energy_degree,
+            "coeffs": self.coeffs.tolist(),
+        }
+
+    @staticmethod
+    def from_dict(data: tp.Dict[str, tp.Any]) -> "EfficiencySurface":
+        if data.get("type") != MODEL_TYPE:
+            raise RuntimeError(f"unsupported efficiency surface type: {data.get('type')}")
+        return EfficiencySurface(np.array(data["coeffs"]), data["distance_range"],
+                                 data["energy_range"])
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @staticmethod
+    def load(filename: str) -> "EfficiencySurface":
+        with open(filename) as f:
+            return EfficiencySurface.from_dict(json.load(f))
@@ -0,0 +1,15 @@
+import os
+import typing as tp
+
+
+FileCacheKey = tp.Tuple[str, int, int]
+
+
+def file_cache_key(filename: str) -> FileCacheKey:
+    """
+    file_cache_key returns key for caching of parsed file content: (abs path, mtime, size),
+        key changes when file is rewritten
+    """
+    filename = os.path.abspath(filename)
+    stat = os.stat(filename)
+    return filename, stat.st_mtime_ns, stat.st_size
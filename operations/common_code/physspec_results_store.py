@@ -0,0 +1,59 @@
+"""
+    In-memory storage for physspec results: operations in the same graph run can pass
+    physspec results to each other without json-file round trip.
+    Results are stored by the output filename, they would be saved to.
+"""
+import os
+import re
+import typing as tp
+
+from ..mcmodules_wrappers.physspec_wrapper import PhysspecResults
+
+
+_RESULTS: tp.Dict[str, PhysspecResults] = {}
+
+_UNCOLLIDED_FLUX_RE = re.compile(r'"(d?func)"\s*:\s*([^,}\s]+)')
+
+
+def put_results(filename: str, results: PhysspecResults) -> None:
+    _RESULTS[os.path.abspath(filename)] = results
+
+
+def get_results(filename: str) -> tp.Optional[PhysspecResults]:
+    return _RESULTS.get(os.path.abspath(filename))
+
+
+def discard_results(filename: str) -> None:
+    _RESULTS.pop(os.path.abspath(filename), None)
+
+
+def _read_uncollided_flux(filename: str) -> tp.Tuple[float, float]:
+    """func and dfunc values of physspec json output, other results are not parsed"""
+    with open(filename) as f:
+        values = dict(_UNCOLLIDED_FLUX_RE.findall(f.read()))
+    if "func" not in values or "dfunc" not in values:
+        raise RuntimeError(f"no uncollided flux in {filename}")
+    return float(values["func"]), float(values["dfunc"])
+
+
+def to_appspec_physspec_data(results: PhysspecResults, filename: str) -> tp.Dict[str, tp.Any]:
+    """
+    converts physspec results to PhysSpec section of appspec input,
+    the same as section from physspec json output.
+    Uncollided flux is absent in calculation results, it is read from json output (filename)
+    on the first call
+    """
+    if results.func is None:
+        results.func, results.dfunc = _read_uncollided_flux(filename)
+    return {
+        "UncollidedFlux": results.func,
+        "dUncollidedFlux": results.dfunc,
+        "CollidedFlux": results.fcol,
+        "dCollidedFlux": results.dfcol,
+        "PeaksIntensity": results.y0.tolist(),
+        "PeaksEnergy": results.x1.tolist(),
+        "PeaksArea": results.y1.tolist(),
+        "PeaksdArea": results.dy1.tolist(),
+        "ContinuumEnergies": results.x2.tolist(),
+        "ContinuumCounts": results.y2.tolist(),
+    }
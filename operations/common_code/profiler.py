@@ -0,0 +1,234 @@
+"""
+    Profiling of graph execution: wall time, cpu time, peak RSS increase and read/written bytes
+    for every operation run (nested records for ForOperation and ForFilesOperation iterations),
+    metrics records of calculations inside operations (e.g. Monte-Carlo throughput).
+    Profiling is enabled by set_profiler (run.py --profile), otherwise profile() does nothing.
+"""
+import contextlib
+import json
+import os
+import time
+import typing as tp
+from dataclasses import asdict, dataclass
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+@dataclass
+class ProfileRecord:
+    name: str
+    path: str  # names of parent records and this one, separated by '/'
+    depth: int
+    details: str  # e.g. iteration parameters
+    start: float  # seconds from profiler start
+    wall: float
+    cpu: float
+    # peak RSS of process and finished children so far (lifetime high-water mark, not of record)
+    process_max_rss_kb: tp.Optional[int]
+    # increase of process_max_rss_kb during record: memory, which record needed above previous peak
+    max_rss_increase_kb: tp.Optional[int]
+    read_bytes: tp.Optional[int]
+    written_bytes: tp.Optional[int]
+    pid: int
+
+
+def _max_rss_kb() -> tp.Optional[int]:
+    if resource is None:
+        return None
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _io_counters() -> tp.Tuple[tp.Optional[int], tp.Optional[int]]:
+    """bytes read and written by process (linux /proc/self/io: rchar, wchar)"""
+    try:
+        with open('/proc/self/io') as f:
+            values = dict(line.split(':') for line in f if ':' in line)
+        return int(values['rchar']), int(values['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _diff(end: tp.Optional[int], start: tp.Optional[int]) -> tp.Optional[int]:
+    if end is None or start is None:
+        return None
+    return end - start
+
+
+class Profiler:
+    def __init__(self, stack: tp.Optional[tp.List[str]] = None, start: tp.Optional[float] = None):
+        """stack and start are set for worker profilers (see get_worker_context)"""
+        self.records: tp.List[ProfileRecord] = []
+        self.metrics: tp.List[tp.Dict[str, tp.Any]] = []  # e.g. Monte-Carlo throughput records
+        self._stack: tp.List[str] = list(stack or [])
+        self._start = time.perf_counter() if start is None else start
+
+    def get_worker_context(self) -> tp.Tuple[tp.List[str], float]:
+        """
+        arguments of Profiler for worker process: its records are nested in the current one,
+        perf_counter is system-wide, so workers times are from the same start
+        """
+        return list(self._stack), self._start
+
+    def merge(self, records: tp.Iterable[ProfileRecord],
+              metrics: tp.Iterable[tp.Dict[str, tp.Any]]) -> None:
+        """adds records and metrics of worker profiler"""
+        self.records.extend(records)
+        self.metrics.extend(metrics)
+
+    @contextlib.contextmanager
+    def measure(self, name: str, details: str = ""):
+        self._stack.append(name)
+        path = '/'.join(self._stack)
+        depth = len(self._stack) - 1
+        read_start, written_start = _io_counters()
+        rss_start = _max_rss_kb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            cpu = time.process_time() - cpu_start
+            wall_end = time.perf_counter()
+            read_end, written_end = _io_counters()
+            rss_end = _max_rss_kb()
+            self._stack.pop()
+            self.records.append(ProfileRecord(
+                name, path, depth, details, wall_start - self._start, wall_end - wall_start, cpu,
+                rss_end, _diff(rss_end, rss_start), _diff(read_end, read_start),
+                _diff(written_end, written_start), os.getpid()))
+
+    def add_metrics(self, record: tp.Dict[str, tp.Any]) -> None:
+        """adds metrics record (e.g. from mc_metrics) to the current profile record path"""
+        self.metrics.append(dict(record, path='/'.join(self._stack),
+                                 time=time.perf_counter() - self._start))
+
+    def metrics_summary(self) -> tp.List[tp.Dict[str, tp.Any]]:
+        """summary metrics records aggregated by path and name"""
+        groups: tp.Dict[tp.Tuple[str, str], tp.Dict[str, tp.Any]] = {}
+        for m in self.metrics:
+            if m["type"] != "summary":
+                continue
+            g = groups.setdefault((m["path"], m["name"]), {
+                "path": m["path"], "name": m["name"], "count": 0, "histories": 0,
+                "batches": 0, "elapsed": 0.0, "latency_max": 0.0})
+            g["count"] += 1
+            g["histories"] += m["histories"]
+            g["batches"] += m["batches"]
+            g["elapsed"] += m["elapsed"]
+            g["latency_max"] = max(g["latency_max"], m["latency_max"])
+        for g in groups.values():
+            g["rate"] = g["histories"] / g["elapsed"] if g["elapsed"] > 0 else None
+        return list(groups.values())
+
+    def summary(self) -> tp.List[tp.Dict[str, tp.Any]]:
+        """
+        records aggregated by path, children groups follow their parent,
+        groups with the same parent are sorted by total wall time
+        """
+        groups: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        for r in self.records:
+            g = groups.setdefault(r.path, {
+                "name": r.name, "path": r.path, "depth": r.depth, "count": 0,
+                "wall": 0.0, "cpu": 0.0, "read_bytes": 0, "written_bytes": 0,
+                "process_max_rss_kb": 0, "max_rss_increase_kb": 0})
+            g["count"] += 1
+            g["wall"] += r.wall
+            g["cpu"] += r.cpu
+            g["read_bytes"] += r.read_bytes or 0
+            g["written_bytes"] += r.written_bytes or 0
+            g["process_max_rss_kb"] = max(g["process_max_rss_kb"], r.process_max_rss_kb or 0)
+            g["max_rss_increase_kb"] = max(g["max_rss_increase_kb"], r.max_rss_increase_kb or 0)
+
+        children: tp.Dict[str, tp.List[tp.Dict[str, tp.Any]]] = {}
+        for g in groups.values():
+            parent = g["path"].rsplit('/', 1)[0] if g["depth"] else ""
+            children.setdefault(parent, []).append(g)
+        res = []
+
+        def add_sorted(parent: str) -> None:
+            for g in sorted(children.get(parent, []), key=lambda g: g["wall"], reverse=True):
+                res.append(g)
+                add_sorted(g["path"])
+        add_sorted("")
+        return res
+
+    def format_summary(self) -> str:
+        header = f"{'operation':<48}{'count':>7}{'wall, s':>10}{'cpu, s':>10}" \
+                 f"{'read, MB':>10}{'write, MB':>10}{'rss+, MB':>10}{'peak, MB':>10}"
+        # rss+ -- max increase of process peak RSS by one record, peak -- process peak so far
+        lines = [header, '-' * len(header)]
+        for g in self.summary():
+            name = '  ' * g["depth"] + g["name"]
+            lines.append(f"{name[:48]:<48}{g['count']:>7}{g['wall']:>10.3f}{g['cpu']:>10.3f}"
+                         f"{g['read_bytes'] / 2**20:>10.2f}{g['written_bytes'] / 2**20:>10.2f}"
+                         f"{g['max_rss_increase_kb'] / 2**10:>10.1f}"
+                         f"{g['process_max_rss_kb'] / 2**10:>10.1f}")
+        metrics = self.metrics_summary()
+        if metrics:
+            header = f"{'calculation':<48}{'count':>7}{'histories':>12}{'batches':>9}" \
+                     f"{'time, s':>10}{'hist/s':>12}{'max batch, s':>14}"
+            lines += ['', header, '-' * len(header)]
+            for g in metrics:
+                name = f"{g['path']}/{g['name']}" if g['path'] else g['name']
+                lines.append(f"{name[-48:]:<48}{g['count']:>7}{g['histories']:>12}"
+                             f"{g['batches']:>9}{g['elapsed']:>10.3f}{g['rate'] or 0:>12.0f}"
+                             f"{g['latency_max']:>14.3f}")
+        return '\n'.join(lines)
+
+    def save_json(self, output_filename: str) -> None:
+        with open(output_filename, 'w') as f:
+            json.dump({"records": [asdict(r) for r in self.records],
+                       "summary": self.summary(),
+                       "metrics": self.metrics,
+                       "metrics_summary": self.metrics_summary()}, f, indent=4)
+
+    def save_chrome_trace(self, output_filename: str) -> None:
+        """trace for chrome://tracing or https://ui.perfetto.dev"""
+        pid = os.getpid()
+        # records of ForFilesOperation workers are shown as other processes
+        events = [
+            {"name": r.name, "ph": "X", "ts": r.start * 1e6, "dur": r.wall * 1e6,
+             "pid": r.pid, "tid": 0,
+             "args": {"path": r.path, "details": r.details, "cpu": r.cpu,
+                      "process_max_rss_kb": r.process_max_rss_kb,
+                      "max_rss_increase_kb": r.max_rss_increase_kb,
+                      "read_bytes": r.read_bytes, "written_bytes": r.written_bytes}}
+            for r in self.records
+        ]
+        # throughput of Monte-Carlo batches as counters
+        events += [
+            {"name": f"{m['name']} histories/s", "ph": "C", "ts": m["time"] * 1e6, "pid": pid,
+             "args": {"rate": m["rate"] or 0}}
+            for m in self.metrics if m["type"] == "batch"
+        ]
+        with open(output_filename, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+_profiler: tp.Optional[Profiler] = None
+
+
+def set_profiler(profiler: tp.Optional[Profiler]) -> None:
+    global _profiler
+    _profiler = profiler
+
+
+def get_profiler() -> tp.Optional[Profiler]:
+    return _profiler
+
+
+def profile(name: str, details: str = "") -> tp.ContextManager:
+    """measures code block, if profiler is set"""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.measure(name, details)
+
+
+def run_operation(operation) -> None:
+    """runs operation, measures it by its type name, if profiler is set"""
+    with profile(type(operation).__name__):
+        operation.run()
@@ -0,0 +1,89 @@
+"""
+    Rows collected by iterations of ForOperation or ForFilesOperation for one dataset:
+    rows are kept in memory of process and flushed to its own shard file
+    ({output_filename}.shards/{run_id}/{pid}.tsv) when buffer is full or worker task is finished,
+    so parallel workers never write to the same file. The dataset is saved once
+    by merging shards of the current run (see TsvCollectedRowsSaveOperation).
+    Values are kept as text, like TsvOneColumnJoinOperation writes them.
+"""
+import glob
+import os
+import shutil
+import time
+import typing as tp
+
+# all processes of one graph run have the same run id (workers get it with task),
+# shards of failed or interrupted runs have other ids and are not merged
+_run_id = ""
+_buffers: tp.Dict[str, tp.List[tp.List[str]]] = {}
+
+
+def start_run(run_id: str = "") -> None:
+    """
+    starts graph run (new run id) or worker task of run with run_id,
+        buffered rows are dropped: forked worker has a copy of not flushed parent rows
+    """
+    global _run_id
+    _run_id = run_id or f'{os.getpid()}-{time.time_ns()}'
+    _buffers.clear()
+
+
+def get_run_id() -> str:
+    if not _run_id:
+        start_run()
+    return _run_id
+
+
+def get_shards_dir(output_filename: str) -> str:
+    return output_filename + '.shards'
+
+
+def _get_run_dir(output_filename: str) -> str:
+    return os.path.join(get_shards_dir(output_filename), get_run_id())
+
+
+def add_row(output_filename: str, row: tp.List[tp.Any], buffer_rows: int) -> None:
+    rows = _buffers.setdefault(output_filename, [])
+    rows.append([str(v) for v in row])
+    if len(rows) >= buffer_rows:
+        flush_rows(output_filename)
+
+
+def flush_rows(output_filename: str) -> None:
+    """appends buffered rows to shard file of this process"""
+    rows = _buffers.pop(output_filename, [])
+    if not rows:
+        return
+    run_dir = _get_run_dir(output_filename)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, f'{os.getpid()}.tsv'), 'a') as f:
+        f.write(''.join('\t'.join(row) + '\n' for row in rows))
+
+
+def flush_all_rows() -> None:
+    """flushes all datasets, workers call it before returning results"""
+    for output_filename in list(_buffers):
+        flush_rows(output_filename)
+
+
+def read_rows(output_filename: str) -> tp.List[tp.List[str]]:
+    """rows of all shards of the current run and buffer of this process"""
+    rows = []
+    for shard in sorted(glob.glob(os.path.join(_get_run_dir(output_filename), '*.tsv'))):
+        with open(shard) as f:
+            rows.extend(line.rstrip('\n').split('\t') for line in f if line.strip())
+    rows.extend(_buffers.get(output_filename, []))
+    return rows
+
+
+def get_stale_runs(output_filename: str) -> tp.List[str]:
+    """shard directories of other (failed or interrupted) runs"""
+    run_dir = _get_run_dir(output_filename)
+    return [d for d in sorted(glob.glob(os.path.join(get_shards_dir(output_filename), '*')))
+            if d != run_dir]
+
+
+def clear_rows(output_filename: str) -> None:
+    """removes shards of all runs and buffer, e.g. after the dataset is saved"""
+    _buffers.pop(output_filename, None)
+    shutil.rmtree(get_shards_dir(output_filename), ignore_errors=True)
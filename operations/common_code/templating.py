@@ -0,0 +1,65 @@
+"""
+    Templates for operations yaml-sections with ${NAME} placeholders.
+    Section is compiled once: strings are split into literal parts and placeholders,
+    rendering only fills placeholders and rebuilds containers (no string searching).
+"""
+import re
+import typing as tp
+
+
+_PLACEHOLDER_RE = re.compile(r'\$\{(\w+)\}')
+
+Renderer = tp.Callable[[tp.Dict[str, tp.Any]], tp.Any]
+
+
+def _compile_str(section: str, names: tp.Set[str]) -> tp.Optional[Renderer]:
+    parts: tp.List[tp.Tuple[bool, str]] = []  # (is_placeholder, literal or name)
+    pos = 0
+    for m in _PLACEHOLDER_RE.finditer(section):
+        if m.group(1) not in names:
+            continue
+        if m.start() > pos:
+            parts.append((False, section[pos:m.start()]))
+        parts.append((True, m.group(1)))
+        pos = m.end()
+    if not parts:
+        return None
+    if pos < len(section):
+        parts.append((False, section[pos:]))
+
+    if len(parts) == 1:
+        # whole value placeholder
+        name = parts[0][1]
+        return lambda values: values[name]
+    return lambda values: ''.join(
+        str(values[part]) if is_placeholder else part for is_placeholder, part in parts
+    )
+
+
+def _compile(section: tp.Any, names: tp.Set[str]) -> Renderer:
+    if isinstance(section, dict):
+        items = [(k, _compile(v, names)) for k, v in section.items()]
+        return lambda values: {k: render(values) for k, render in items}
+    if isinstance(section, list):
+        renders = [_compile(v, names) for v in section]
+        return lambda values: [render(values) for render in renders]
+    if type(section) is str:
+        render = _compile_str(section, names)
+        if render is not None:
+            return render
+    return lambda values: section
+
+
+class CompiledTemplate:
+    """
+    CompiledTemplate -- yaml-section (dicts, lists, scalars) with ${NAME} placeholders for names.
+    Placeholder, which is the whole string, is replaced by the value itself,
+    placeholders inside strings are replaced by str(value), unknown placeholders are kept.
+    render returns new containers on every call.
+    """
+    def __init__(self, section: tp.Any, names: tp.Iterable[str]):
+        self.names = list(names)
+        self._render = _compile(section, set(self.names))
+
+    def render(self, values: tp.Dict[str, tp.Any]) -> tp.Any:
+        return self._render(values)
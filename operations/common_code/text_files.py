@@ -0,0 +1,32 @@
+"""
+    Small text files helpers of detector characterisation operations:
+    in-files are read as text and edited in memory, iterations reports are saved as tsv.
+"""
+import typing as tp
+
+
+def read_text(filename: str) -> str:
+    with open(filename) as f:
+        return f.read()
+
+
+def edit_in_text(text: str, params: tp.Dict[str, tp.Any]) -> str:
+    """in-file text with new values of params (key = value lines), comments are kept"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and not line.startswith('//') and '=' in line:
+            key = line.split('=', maxsplit=1)[0].strip()
+            if key in params:
+                line = f'{key} = {params[key]:.5f}'
+        lines.append(line)
+    return ''.join(line + '\n' for line in lines)
+
+
+def save_report(rows: tp.List[tp.List[tp.Any]], header: tp.List[str], output_filename: str
+                ) -> None:
+    """tsv-file with header, values are written with str()"""
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(header) + '\n')
+        for row in rows:
+            f.write('\t'.join(str(v) for v in row) + '\n')
@@ -0,0 +1,137 @@
+"""
+    Parser for response output csv-files (response.dll(.so) calculation results)
+"""
+import csv
+import functools
+import typing as tp
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..common_code.file_cache import file_cache_key
+
+
+RESPONSE_JSON_TO_CSV_NAMES = {
+    "Energy": "energy",
+    "fep": "fep",
+    "sep": "sep",
+    "dep": "dep",
+    "p511": "p511",
+    "xep_total": "xept",
+    "dfep": "dfep",
+    "dsep": "dsep",
+    "ddep": "ddep",
+    "dp511": "dp511",
+    "dxep_total": "dxept",
+    "normalized_fep": "FEP",
+    "normalized_sep": "SEP",
+    "normalized_dep": "DEP",
+    "normalized_p511": "P511",
+    "normalized_xep_total": "XEPT",
+    "e_xep": "exep",
+    "xep": "xep",
+    "dxep": "dxep",
+    "normalized_xep": "XEP",
+}
+# columns with ';'-separated lists of values
+LIST_CSV_NAMES = ["exep", "xep", "dxep", "XEP"]
+A_CSV_NAMES = [f"a{i}{j}" for i in range(6) for j in range(9)]
+B_CSV_NAMES = [f"b{i}{j}" for i in range(2) for j in range(9)]
+
+CACHE_SIZE = 16
+
+
+@dataclass(frozen=True)
+class ResponseTable:
+    """
+    ResponseTable -- preparsed response csv-file:
+        values: 2d-array (rows x numerical columns), read-only
+        header: numerical column name -> column index in values
+        list_values: list column name -> list of arrays (one per row)
+    """
+    values: np.ndarray
+    header: tp.Dict[str, int]
+    list_values: tp.Dict[str, tp.List[np.ndarray]]
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.header[name]]
+
+    def columns(self, names: tp.List[str]) -> np.ndarray:
+        return self.values[:, [self.header[name] for name in names]]
+
+
+def _list_func(value: str) -> np.ndarray:
+    return np.array(value.split(';'), dtype=np.float64)
+
+
+def _parse_response_table(filename: str) -> ResponseTable:
+    with open(filename) as f:
+        reader = csv.reader(f, delimiter=",")
+        header_row = next(reader)
+        rows = [row for row in reader if row]
+
+    num_names = [name for name in header_row if name not in LIST_CSV_NAMES]
+    num_indices = [i for i, name in enumerate(header_row) if name not in LIST_CSV_NAMES]
+    values = np.array([[row[i] for i in num_indices] for row in rows], dtype=np.float64)
+    values = values.reshape(len(rows), len(num_indices))
+    values.flags.writeable = False
+
+    list_values = {}
+    for i, name in enumerate(header_row):
+        if name in LIST_CSV_NAMES:
+            arrays = [_list_func(row[i]) for row in rows]
+            for arr in arrays:
+                arr.flags.writeable = False
+            list_values[name] = arrays
+
+    return ResponseTable(values, {name: i for i, name in enumerate(num_names)}, list_values)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _load_response_table_cached(filename: str, mtime_ns: int, size: int) -> ResponseTable:
+    return _parse_response_table(filename)
+
+
+def load_response_table(filename: str) -> ResponseTable:
+    """
+    load_response_table parses response csv-file once and returns cached table
+        while file is not changed (cache key: path, mtime, size).
+    Returned table is shared between callers, its arrays are read-only.
+    """
+    return _load_response_table_cached(*file_cache_key(filename))
+
+
+def to_efficiency_response(table: ResponseTable) -> tp.List[tp.Dict[str, float]]:
+    """converts response table to appspec DetectorResponse for efficiency calculation"""
+    energies = table.column("energy").tolist()
+    nfeps = table.column("FEP").tolist()
+    dfeps = table.column("dfep").tolist()
+    return [
+        {"Energy": e, "normalized_fep": fep, "dfep": dfep}
+        for e, fep, dfep in zip(energies, nfeps, dfeps)
+    ]
+
+
+def to_detector_response(table: ResponseTable) -> tp.Dict[str, tp.Any]:
+    """converts response table to appspec DetectorResponse for spectrum calculation"""
+    names = list(RESPONSE_JSON_TO_CSV_NAMES.keys()) + ["a", "b"]
+    columns = []
+    for c_name in RESPONSE_JSON_TO_CSV_NAMES.values():
+        if c_name in LIST_CSV_NAMES:
+            columns.append([arr.tolist() for arr in table.list_values[c_name]])
+        else:
+            columns.append(table.column(c_name).tolist())
+    columns.append(table.columns(A_CSV_NAMES).tolist())
+    columns.append(table.columns(B_CSV_NAMES).tolist())
+    responses = [dict(zip(names, row_values)) for row_values in zip(*columns)]
+    return {
+        "Emin": responses[0]["Energy"],
+        "Emax": responses[-1]["Energy"],
+        "N_points": len(responses),
+        "Nmin": 100,
+        "Nmax": 1000,
+        "Response": responses,
+    }
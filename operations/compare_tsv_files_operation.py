@@ -0,0 +1,149 @@
+import glob
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.common_parsers.tsv_parser import parse_tsv_to_float_cols
+from operations.operation_registry import register_operation
+
+EPS = 1e-16
+
+METRIC_NAMES = ["max_abs", "mean_abs", "rms_abs", "max_rel", "mean_rel", "rms_rel"]
+
+
+def _get_file_pairs(filemask_1: str, filemask_2: str) -> tp.List[tp.Tuple[str, str, str]]:
+    """
+    pairs of existing files with the same part instead of * in masks,
+        e.g. res/appspec_output_d*.tsv and res/efficiency_interpolated_d*.tsv
+    """
+    prefix, suffix = filemask_1.split('*')
+    pairs = []
+    unpaired = []
+    for filename_1 in sorted(glob.glob(filemask_1)):
+        match = filename_1[len(prefix):len(filename_1) - len(suffix)]
+        filename_2 = filemask_2.replace('*', match)
+        if os.path.exists(filename_2):
+            pairs.append((filename_1, filename_2, match))
+        else:
+            unpaired.append(filename_1)
+    if unpaired:
+        print(f'{len(unpaired)} files without pair for {filemask_2}: {", ".join(unpaired)}')
+    if not pairs:
+        raise RuntimeError(f"no file pairs for {filemask_1} and {filemask_2}")
+    return pairs
+
+
+def _align_by_key(keys_1: np.ndarray, keys_2: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """row indices of both files with close key values (as math.isclose)"""
+    if not len(keys_1) or not len(keys_2):
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    order = np.argsort(keys_2, kind='stable')
+    sorted_keys = keys_2[order]
+    pos = np.searchsorted(sorted_keys, keys_1)
+    left = np.clip(pos - 1, 0, len(sorted_keys) - 1)
+    right = np.clip(pos, 0, len(sorted_keys) - 1)
+    # the closest of neighbours in sorted keys
+    nearest = np.where(np.abs(sorted_keys[left] - keys_1) <= np.abs(sorted_keys[right] - keys_1),
+                       left, right)
+    found = np.isclose(sorted_keys[nearest], keys_1, rtol=1e-9, atol=0.0)
+    return np.flatnonzero(found), order[nearest[found]]
+
+
+def _calc_metrics(values_1: np.ndarray, values_2: np.ndarray, relative_to_average: bool
+                  ) -> np.ndarray:
+    """metrics (METRIC_NAMES order) for every column of (rows, columns) arrays"""
+    diff = np.abs(values_1 - values_2)
+    base = (values_1 + values_2) / 2 if relative_to_average else values_1
+    rel_diff = diff / (base + EPS)
+    metrics = []
+    for d in (diff, rel_diff):
+        metrics += [np.max(d, axis=0, initial=0.0), np.mean(d, axis=0),
+                    np.sqrt(np.mean(d**2, axis=0))]
+    return np.stack(metrics, axis=1)
+
+
+def _compare_files(filename_1: str, filename_2: str, column_names: tp.List[str], key_column: str,
+                   relative_to_average: bool) -> tp.Tuple[np.ndarray, int]:
+    """metrics (columns, metrics) and number of compared rows"""
+    table_1 = parse_tsv_to_float_cols(filename_1)
+    table_2 = parse_tsv_to_float_cols(filename_2)
+    values_1 = np.array([table_1[name] for name in column_names]).T
+    values_2 = np.array([table_2[name] for name in column_names]).T
+    if key_column:
+        rows_1, rows_2 = _align_by_key(np.array(table_1[key_column]),
+                                       np.array(table_2[key_column]))
+        if len(rows_1) < max(len(values_1), len(values_2)):
+            print(f'{filename_1}, {filename_2}: {len(rows_1)} common {key_column} values '
+                  f'of {len(values_1)} and {len(values_2)}')
+        values_1, values_2 = values_1[rows_1], values_2[rows_2]
+    elif len(values_1) != len(values_2):
+        raise RuntimeError(f"different number of rows in {filename_1} and {filename_2}")
+    if not len(values_1):
+        raise RuntimeError(f"no rows to compare in {filename_1} and {filename_2}")
+    return _calc_metrics(values_1, values_2, relative_to_average), len(values_1)
+
+
+@register_operation
+class CompareTsvFilesOperation:
+    """
+    CompareTsvFilesOperation compares columns of file pairs and writes one summary table:
+        max, mean and rms of absolute and relative differences for every column of every pair
+    parameters:
+        - input_filenames_1, input_filenames_2: lists of files to compare pairwise
+        - input_filemask_1, input_filemask_2: masks with one * instead of lists, e.g.
+            res/appspec_output_d*.tsv and res/efficiency_interpolated_d*.tsv,
+            files with the same * part are compared (all matching files, including outputs
+            of previous runs, so prefer lists in reproducible graphs)
+        - column_names: list of numerical columns in both files (default: [efficiency])
+        - key_column: rows are aligned by close values in this column (default: energy),
+            "" -- rows are compared by order
+        - relative_to_average: relative difference to average of two values,
+            otherwise to the value from the 1st file
+        - output_filename: tsv-file with columns: filename_1, filename_2, match (* part),
+            rows and {column}_{metric} for metrics: max_abs, mean_abs, rms_abs, max_rel,
+            mean_rel, rms_rel
+    """
+    def __init__(self):
+        self.file_pairs: tp.List[tp.Tuple[str, str, str]] = []
+        self.input_filemask_1 = ""
+        self.input_filemask_2 = ""
+        self.column_names: tp.List[str] = ["efficiency"]
+        self.key_column = "energy"
+        self.relative_to_average = False
+        self.output_filename = ""
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> (
+            'CompareTsvFilesOperation'):
+        op = CompareTsvFilesOperation()
+        if section.get('input_filenames_1'):
+            assert len(section['input_filenames_1']) == len(section['input_filenames_2'])
+            op.file_pairs = [(os.path.join(project_dir, f1), os.path.join(project_dir, f2), "")
+                             for f1, f2 in zip(section['input_filenames_1'],
+                                               section['input_filenames_2'])]
+        else:
+            op.input_filemask_1 = os.path.join(project_dir, section['input_filemask_1'])
+            op.input_filemask_2 = os.path.join(project_dir, section['input_filemask_2'])
+            assert op.input_filemask_1.count('*') == 1 and op.input_filemask_2.count('*') == 1, \
+                "file masks must have one *"
+        op.column_names = section.get('column_names', op.column_names)
+        op.key_column = section.get('key_column', op.key_column)
+        op.relative_to_average = section.get('relative_to_average', op.relative_to_average)
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        return op
+
+    def run(self) -> None:
+        print('start compare tsv files')
+        # masks are expanded on run, files can be created by previous operations
+        file_pairs = self.file_pairs or _get_file_pairs(self.input_filemask_1,
+                                                        self.input_filemask_2)
+        header = ["filename_1", "filename_2", "match", "rows"] + [
+            f'{name}_{metric}' for name in self.column_names for metric in METRIC_NAMES]
+        with open(self.output_filename, 'w') as f:
+            f.write('\t'.join(header) + '\n')
+            for filename_1, filename_2, match in file_pairs:
+                metrics, rows = _compare_files(filename_1, filename_2, self.column_names,
+                                               self.key_column, self.relative_to_average)
+                f.write('\t'.join([filename_1, filename_2, match, str(rows)]
+                                  + [str(v) for v in metrics.reshape(-1)]) + '\n')
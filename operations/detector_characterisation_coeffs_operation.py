@@ -0,0 +1,193 @@
+import itertools
+import json
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.text_files import edit_in_text, read_text
+from .detector_init_characterisation_operation import DETECTOR_TYPE_TO_PARAM_NAMES
+from .lsrm_parsers.infile_reader import InFileReader
+from .mcmodules_wrappers.nuclide import Nuclide
+from .mcmodules_wrappers.tccfcalc_runner import TccfcalcRunner, TccfcalcTask
+
+
+# names of coeffs rows after bias row
+DETECTOR_TYPE_TO_FEATURE_NAMES = {
+    "COAXIAL": ["log_diameter", "sqrt_height", "dead_layer"],
+    "SCINTIL": ["log_diameter", "sqrt_height"],
+}
+
+
+def get_detector_params(in_filename: str, detector_type: str) -> np.ndarray:
+    """diameter, height (and dead layer for COAXIAL) from in-file"""
+    reader = InFileReader(in_filename)
+    # front and side dead layers are characterised as one parameter
+    names = DETECTOR_TYPE_TO_PARAM_NAMES[detector_type][:3]
+    return np.array([reader.get_float_with_cm(name) for name in names])
+
+
+def params_to_in_values(params: np.ndarray, detector_type: str) -> tp.Dict[str, float]:
+    """in-file parameters for diameter, height (and dead layer)"""
+    values = list(params)
+    if detector_type == "COAXIAL":
+        values.append(params[2])
+    return dict(zip(DETECTOR_TYPE_TO_PARAM_NAMES[detector_type], values))
+
+
+def params_to_features(params: np.ndarray, detector_type: str) -> np.ndarray:
+    """
+    features, which log(efficiency) depends on linearly:
+        log of sensitive diameter, sqrt of sensitive height (and dead layer),
+        see DetectorInitCharacterisationOperation for the inverse transform
+    """
+    params = np.atleast_2d(params)
+    d, h = params[:, 0], params[:, 1]
+    if detector_type == "COAXIAL":
+        dl = params[:, 2]
+        return np.stack([np.log(d - 2 * dl), np.sqrt(h - dl), dl], axis=1)
+    return np.stack([np.log(d), np.sqrt(h)], axis=1)
+
+
+def make_in_text(detector_text: str, other_texts: tp.List[str], params: np.ndarray,
+                 detector_type: str) -> str:
+    """tccfcalc in-file content: detector with params, source and calculation parameters"""
+    texts = [edit_in_text(detector_text, params_to_in_values(params, detector_type))]
+    return '\n'.join(texts + other_texts)
+
+
+def _get_sweep_points(reference: np.ndarray, detector_type: str, relative_range: float,
+                      dead_layer_range: tp.List[float], points_per_param: int) -> np.ndarray:
+    """full factorial grid around reference detector"""
+    axes = [reference[i] * np.linspace(1 - relative_range, 1 + relative_range, points_per_param)
+            for i in range(2)]
+    if detector_type == "COAXIAL":
+        axes.append(np.linspace(dead_layer_range[0], dead_layer_range[1], points_per_param))
+    return np.array(list(itertools.product(*axes)))
+
+
+def fit_coeffs(features: np.ndarray, log_eff: np.ndarray, rel_errors: np.ndarray
+               ) -> tp.Tuple[np.ndarray, float]:
+    """
+    weighted least squares log_eff = bias + features @ sensitivities for every energy,
+        returns coeffs (bias row and row for every feature) and rms of weighted residuals
+    """
+    a = np.hstack([np.ones((len(features), 1)), features])
+    weights = 1 / np.maximum(rel_errors, 1e-12)
+    coeffs = np.empty((a.shape[1], log_eff.shape[1]))
+    residuals = np.empty_like(log_eff)
+    for j in range(log_eff.shape[1]):
+        w = weights[:, j]
+        coeffs[:, j], _, _, _ = np.linalg.lstsq(a * w[:, np.newaxis], log_eff[:, j] * w,
+                                                rcond=None)
+        residuals[:, j] = (log_eff[:, j] - a @ coeffs[:, j]) * w
+    return coeffs, float(np.sqrt(np.mean(residuals**2)))
+
+
+@register_operation
+class DetectorCharacterisationCoeffsOperation:
+    """
+    DetectorCharacterisationCoeffsOperation generates coefficients file for
+        DetectorInitCharacterisationOperation: calculates efficiencies with tccfcalc for grid of
+        detector parameters around reference detector and fits log(efficiency) by log of
+        diameter, sqrt of height (and dead layer) for every energy of tccfcalc results
+    parameters:
+        - input_in_filename: in-file with reference detector
+        - input_source_filename: in-file with source (e.g. point with distance)
+        - input_calc_params_filename: in-file with calculation parameters (optional)
+        - output_filename: output json-file with energy grid and coefficients
+        - detector_type: COAXIAL, SCINTIL
+        - relative_range: diameter and height are varied in
+            [(1 - relative_range) * value, (1 + relative_range) * value], default: 0.2
+        - dead_layer_range: [min, max] of front and side dead layers (COAXIAL), cm
+        - points_per_param: number of grid points for every parameter, default: 3
+        - histories: number of simulated histories in thousands for every point
+        - seed: seed for random generator, fixed seed reduces noise of differences (default: 42)
+        - nuclide: nuclide in format: Co-60, default is gread (290.enx)
+        - workers: number of worker processes for tccfcalc calculations
+        - cache_dir: directory with cached tccfcalc results, already calculated points are
+            not recalculated, "" -- no cache (default: tccfcalc_cache)
+        - batch_size: histories in one library call
+    """
+    def __init__(self):
+        self.input_in_filename = ""
+        self.input_source_filename = ""
+        self.input_calc_params_filename = ""
+        self.output_filename = ""
+        self.detector_type = ""
+        self.relative_range = 0.2
+        self.dead_layer_range = [0.01, 0.2]
+        self.points_per_param = 3
+        self.histories = 100
+        self.seed = 42
+        self.nuclide = Nuclide.get_default()
+        self.workers = 1
+        self.cache_dir = "tccfcalc_cache"
+        self.batch_size = 1000
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'DetectorCharacterisationCoeffsOperation':
+        op = DetectorCharacterisationCoeffsOperation()
+        op.input_in_filename = os.path.join(project_dir, section['input_in_filename'])
+        op.input_source_filename = os.path.join(project_dir, section['input_source_filename'])
+        if section.get('input_calc_params_filename'):
+            op.input_calc_params_filename = os.path.join(project_dir,
+                                                         section['input_calc_params_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.detector_type = section["detector_type"]
+        assert op.detector_type in DETECTOR_TYPE_TO_PARAM_NAMES, "unsupported detector type"
+        op.relative_range = section.get("relative_range", op.relative_range)
+        assert 0 < op.relative_range < 1
+        op.dead_layer_range = section.get("dead_layer_range", op.dead_layer_range)
+        assert len(op.dead_layer_range) == 2
+        op.points_per_param = section.get("points_per_param", op.points_per_param)
+        assert op.points_per_param >= 2, "need 2 or more points to fit sensitivities"
+        op.histories = section.get("histories", op.histories)
+        op.seed = section.get("seed", op.seed)
+        if section.get('nuclide'):
+            op.nuclide = Nuclide.parse_from(section['nuclide'])
+        op.workers = section.get("workers", op.workers)
+        assert op.workers > 0
+        cache_dir = section.get("cache_dir", op.cache_dir)
+        op.cache_dir = os.path.join(project_dir, cache_dir) if cache_dir else ""
+        op.batch_size = section.get("batch_size", op.batch_size)
+        return op
+
+    def run(self) -> None:
+        print('start detector_characterisation_coeffs operation')
+        reference = get_detector_params(self.input_in_filename, self.detector_type)
+        points = _get_sweep_points(reference, self.detector_type, self.relative_range,
+                                   self.dead_layer_range, self.points_per_param)
+        detector_text = read_text(self.input_in_filename)
+        other_texts = [read_text(self.input_source_filename)]
+        if self.input_calc_params_filename:
+            other_texts.append(read_text(self.input_calc_params_filename))
+        tasks = [TccfcalcTask(make_in_text(detector_text, other_texts, p, self.detector_type),
+                              self.histories, self.seed, self.nuclide) for p in points]
+
+        runner = TccfcalcRunner(cache_dir=self.cache_dir, workers=self.workers,
+                                batch_size=self.batch_size)
+        results = runner.run(tasks)
+        print(f'{len(tasks)} points, {runner.cache_hits} from cache')
+
+        energies = results[0].energies
+        for r in results:
+            assert np.array_equal(r.energies, energies), "different energies in tccfcalc results"
+        log_eff = np.log(np.array([r.efficiencies for r in results]))
+        rel_errors = np.array([r.rel_errors for r in results])
+        coeffs, rms = fit_coeffs(params_to_features(points, self.detector_type), log_eff,
+                                 rel_errors)
+        print(f'weighted rms of fit residuals: {rms:.3f}')
+        with open(self.output_filename, 'w') as f:
+            json.dump({
+                "energy_grid": energies.tolist(),
+                "coeffs": coeffs.tolist(),
+                "detector_type": self.detector_type,
+                "features": DETECTOR_TYPE_TO_FEATURE_NAMES[self.detector_type],
+                "reference_params": reference.tolist(),
+                "points": len(points),
+                "histories": self.histories,
+                "weighted_rms": rms,
+            }, f, indent=4)
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 import typing as tp
@@ -5,6 +6,8 @@ import typing as tp
 import numpy as np
 
 from operations.operation_registry import register_operation
+from .common_code.file_cache import file_cache_key
+from .common_code.text_files import edit_in_text, read_text
 from .common_parsers.tsv_parser import parse_tsv_to_float_cols
 
 
@@ -12,6 +15,12 @@ DETECTOR_TYPE_TO_PARAM_NAMES = {
     "COAXIAL": ["DC_CrystalDiameter", "DC_CrystalHeight", "DC_CrystalFrontDeadLayer", "DC_CrystalSideDeadLayer"],
     "SCINTIL": ["DS_CrystalDiameter", "DS_CrystalHeight"],
 }
+COEFFS_CACHE_SIZE = 32
+
+
+class CoeffsSolver(tp.NamedTuple):
+    bias: np.ndarray  # log(efficiency) bias for every energy
+    pinv: np.ndarray  # pseudo-inverse of sensitivities: features = pinv @ (log(eff) - bias)
 
 
 def _load_eff_from_tsv(filename: str) -> tp.Optional[tp.List[float]]:
@@ -26,27 +35,37 @@ def _load_coeffs(filename: str) -> np.ndarray:
     return np.array(a)
 
 
-def _edit_infile(infile_name: str, outfile_name: str, params: tp.Dict[str, tp.Any]):
-    with open(infile_name, 'r') as f, open(outfile_name, 'w') as g:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#') or line.startswith('//') or '=' not in line:
-                g.write(line + '\n')
-                continue
-            key, _ = [w.strip() for w in line.split('=', maxsplit=1)]
-            if key in params:
-                line = f'{key} = {params[key]:.5f}'
-            g.write(line + '\n')
+@functools.lru_cache(maxsize=COEFFS_CACHE_SIZE)
+def _load_coeffs_solver_cached(filename: str, mtime_ns: int, size: int) -> CoeffsSolver:
+    a = _load_coeffs(filename)
+    # SVD of sensitivities once per coeffs file, solutions for all detectors are matmuls
+    solver = CoeffsSolver(a[0, :], np.linalg.pinv(a[1:, :].T))
+    for arr in solver:
+        arr.flags.writeable = False
+    return solver
 
 
-def _minimize_det_parameters(tsv_filename: str, matrix_file: str, infile: str, detector_type: str
-                             ) -> tp.List[float]:
-    eff = _load_eff_from_tsv(tsv_filename)
-    assert eff
-    a = _load_coeffs(matrix_file)
-    y = np.log(eff) - a[0, :]  # substract bias
-    b = a[1:, :]  # coeffs wo bias
-    x_hat, _, _, _ = np.linalg.lstsq(b.T, y, rcond=None)
+def load_coeffs_solver(filename: str) -> CoeffsSolver:
+    """
+    load_coeffs_solver returns cached solver for coeffs file while file is not changed
+        (cache key: path, mtime, size)
+    """
+    return _load_coeffs_solver_cached(*file_cache_key(filename))
+
+
+def solve_features(matrix_file: str, eff: np.ndarray) -> np.ndarray:
+    """least squares features for efficiencies: (energies,) -> (features,),
+        (detectors, energies) -> (detectors, features)"""
+    solver = load_coeffs_solver(matrix_file)
+    eff = np.asarray(eff, dtype=np.float64)
+    if eff.shape[-1] != len(solver.bias):
+        raise RuntimeError(f"{eff.shape[-1]} efficiencies, but {len(solver.bias)} energies "
+                           f"in {matrix_file}")
+    return (np.log(eff) - solver.bias) @ solver.pinv.T
+
+
+def features_to_params(x_hat: np.ndarray, detector_type: str) -> tp.List[float]:
+    """detector params (DETECTOR_TYPE_TO_PARAM_NAMES) from features"""
     d = np.exp(x_hat[0])
     h = x_hat[1]**2
     if detector_type == "COAXIAL":
@@ -62,6 +81,19 @@ def _minimize_det_parameters(tsv_filename: str, matrix_file: str, infile: str, d
     return output_params
 
 
+def _edit_infile(infile_name: str, outfile_name: str, params: tp.Dict[str, tp.Any]):
+    text = edit_in_text(read_text(infile_name), params)
+    with open(outfile_name, 'w') as g:
+        g.write(text)
+
+
+def _minimize_det_parameters(tsv_filename: str, matrix_file: str, infile: str, detector_type: str
+                             ) -> tp.List[float]:
+    eff = _load_eff_from_tsv(tsv_filename)
+    assert eff
+    return features_to_params(solve_features(matrix_file, np.array(eff)), detector_type)
+
+
 @register_operation
 class DetectorInitCharacterisationOperation:
     """
@@ -0,0 +1,199 @@
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.text_files import read_text, save_report
+from .detector_characterisation_coeffs_operation import get_detector_params, make_in_text, \
+    params_to_in_values
+from .detector_init_characterisation_operation import DETECTOR_TYPE_TO_PARAM_NAMES, \
+    _edit_infile, _load_eff_from_tsv
+from .mcmodules_wrappers.nuclide import Nuclide
+from .mcmodules_wrappers.tccfcalc_runner import TccfcalcRunner, TccfcalcTask
+
+
+# absolute finite difference step of dead layer, cm
+DEAD_LAYER_STEP = 0.01
+
+
+def _get_steps(params: np.ndarray, relative_step: float) -> np.ndarray:
+    steps = params * relative_step
+    if len(params) > 2:
+        steps[2] = DEAD_LAYER_STEP
+    return steps
+
+
+def _clip_params(params: np.ndarray) -> np.ndarray:
+    """dead layer is not negative and less than crystal sizes"""
+    params = params.copy()
+    if len(params) > 2:
+        params[2] = np.clip(params[2], 0.0, min(params[0] / 4, params[1] / 2))
+    params[:2] = np.maximum(params[:2], 1e-3)
+    return params
+
+
+class _Characterisation:
+    """evaluates log(efficiency) and its jacobian by detector parameters with tccfcalc"""
+    def __init__(self, detector_text: str, other_texts: tp.List[str], detector_type: str,
+                 histories: int, seed: int, nuclide: Nuclide, runner: TccfcalcRunner):
+        self.detector_text = detector_text
+        self.other_texts = other_texts
+        self.detector_type = detector_type
+        self.histories = histories
+        self.seed = seed
+        self.nuclide = nuclide
+        self.runner = runner
+
+    def _task(self, params: np.ndarray) -> TccfcalcTask:
+        return TccfcalcTask(make_in_text(self.detector_text, self.other_texts, params,
+                                         self.detector_type),
+                            self.histories, self.seed, self.nuclide)
+
+    def log_eff(self, params: np.ndarray) -> np.ndarray:
+        return np.log(self.runner.run([self._task(params)])[0].efficiencies)
+
+    def jacobian(self, params: np.ndarray, log_eff: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        """
+        forward differences from log_eff at params: perturbed points are calculated
+            concurrently with the same seed, so Monte-Carlo noise is mostly cancelled
+            in differences (common random numbers)
+        """
+        results = self.runner.run([self._task(params + step) for step in np.diag(steps)])
+        log_effs = np.log(np.array([r.efficiencies for r in results]))
+        return ((log_effs - log_eff) / steps[:, np.newaxis]).T
+
+
+@register_operation
+class DetectorPrecalGradsCharacterisationOperation:
+    """
+    DetectorPrecalGradsCharacterisationOperation refines detector parameters
+        (e.g. after DetectorInitCharacterisationOperation) by Gauss-Newton iterations:
+        jacobian of log(efficiency) by diameter, height (and dead layer) is calculated by
+        finite differences with tccfcalc, perturbed detectors are calculated in parallel with
+        the same seed (common random numbers), so few histories are enough for every step
+    parameters:
+        - input_in_filename: in-file with initial detector params values
+        - input_source_filename: in-file with source (e.g. point with distance)
+        - input_calc_params_filename: in-file with calculation parameters (optional)
+        - input_tsv_filename: input tsv-file with experimental efficiency,
+            energies must be the same as in tccfcalc results
+        - output_filename: desirable output in-file name with fitted detector params
+        - detector_type: COAXIAL, SCINTIL
+        - histories: number of simulated histories in thousands for every point
+        - seed: seed for random generator, must be fixed (default: 42)
+        - nuclide: nuclide in format: Co-60, default is gread (290.enx)
+        - relative_step: finite difference step of diameter and height (default: 0.02),
+            dead layer step is 0.01 cm
+        - max_iterations: maximum number of Gauss-Newton iterations (default: 10)
+        - tolerance: iterations stop, when rms of log(efficiency) mismatch
+            decreases less than tolerance (default: 1e-3)
+        - workers: number of worker processes for tccfcalc calculations
+        - cache_dir: directory with cached tccfcalc results, "" -- no cache
+            (default: tccfcalc_cache)
+        - batch_size: histories in one library call
+        - report_filename: tsv-file with params and mismatch of every iteration (optional)
+    """
+    def __init__(self):
+        self.input_in_filename = ""
+        self.input_source_filename = ""
+        self.input_calc_params_filename = ""
+        self.input_tsv_filename = ""
+        self.output_filename = ""
+        self.detector_type = ""
+        self.histories = 100
+        self.seed = 42
+        self.nuclide = Nuclide.get_default()
+        self.relative_step = 0.02
+        self.max_iterations = 10
+        self.tolerance = 1e-3
+        self.workers = 1
+        self.cache_dir = "tccfcalc_cache"
+        self.batch_size = 1000
+        self.report_filename = ""
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'DetectorPrecalGradsCharacterisationOperation':
+        op = DetectorPrecalGradsCharacterisationOperation()
+        op.input_in_filename = os.path.join(project_dir, section['input_in_filename'])
+        op.input_source_filename = os.path.join(project_dir, section['input_source_filename'])
+        if section.get('input_calc_params_filename'):
+            op.input_calc_params_filename = os.path.join(project_dir,
+                                                         section['input_calc_params_filename'])
+        op.input_tsv_filename = os.path.join(project_dir, section['input_tsv_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        assert op.input_in_filename != op.output_filename, \
+            "input and output in-files cannot be the same"
+        op.detector_type = section["detector_type"]
+        assert op.detector_type in DETECTOR_TYPE_TO_PARAM_NAMES, "unsupported detector type"
+        op.histories = section.get("histories", op.histories)
+        op.seed = section.get("seed", op.seed)
+        assert op.seed > 0, "common random numbers need fixed seed"
+        if section.get('nuclide'):
+            op.nuclide = Nuclide.parse_from(section['nuclide'])
+        op.relative_step = section.get("relative_step", op.relative_step)
+        op.max_iterations = section.get("max_iterations", op.max_iterations)
+        op.tolerance = section.get("tolerance", op.tolerance)
+        op.workers = section.get("workers", op.workers)
+        assert op.workers > 0
+        cache_dir = section.get("cache_dir", op.cache_dir)
+        op.cache_dir = os.path.join(project_dir, cache_dir) if cache_dir else ""
+        op.batch_size = section.get("batch_size", op.batch_size)
+        if section.get('report_filename'):
+            op.report_filename = os.path.join(project_dir, section['report_filename'])
+        return op
+
+    def run(self) -> None:
+        print('start detector_precalc_grad_characterisation operation')
+        eff = _load_eff_from_tsv(self.input_tsv_filename)
+        assert eff
+        target = np.log(eff)
+        other_texts = [read_text(self.input_source_filename)]
+        if self.input_calc_params_filename:
+            other_texts.append(read_text(self.input_calc_params_filename))
+        runner = TccfcalcRunner(cache_dir=self.cache_dir, workers=self.workers,
+                                batch_size=self.batch_size)
+        characterisation = _Characterisation(read_text(self.input_in_filename), other_texts,
+                                             self.detector_type, self.histories, self.seed,
+                                             self.nuclide, runner)
+
+        params = get_detector_params(self.input_in_filename, self.detector_type)
+        best_params, best_rms, best_step = params, np.inf, None
+        step_scale = 1.0
+        report = []
+        for iteration in range(self.max_iterations + 1):
+            log_eff = characterisation.log_eff(params)
+            if len(log_eff) != len(target):
+                raise RuntimeError(f"{len(target)} experimental efficiencies, "
+                                   f"{len(log_eff)} calculated")
+            residual = target - log_eff
+            rms = float(np.sqrt(np.mean(residual**2)))
+            report.append([iteration] + params.tolist()
+                          + [rms, float(np.max(np.abs(residual))), step_scale])
+            print(f'iteration {iteration}: params {np.round(params, 5).tolist()}, '
+                  f'rms mismatch {rms:.5f}')
+            if rms < best_rms:
+                converged = best_rms - rms < self.tolerance
+                best_params, best_rms = params, rms
+                if converged or iteration == self.max_iterations:
+                    break
+                # jacobian is calculated for accepted points only
+                jacobian = characterisation.jacobian(params, log_eff,
+                                                     _get_steps(params, self.relative_step))
+                best_step, _, _, _ = np.linalg.lstsq(jacobian, residual, rcond=None)
+                step_scale = 1.0
+            else:
+                # mismatch increased: shorter step from the best point
+                step_scale /= 2
+                if step_scale < 1e-2:
+                    break
+            params = _clip_params(best_params + step_scale * best_step)
+
+        print(f'best params {np.round(best_params, 5).tolist()}, rms mismatch {best_rms:.5f}')
+        _edit_infile(self.input_in_filename, self.output_filename,
+                     params_to_in_values(best_params, self.detector_type))
+        if self.report_filename:
+            header = ["iteration"] + DETECTOR_TYPE_TO_PARAM_NAMES[self.detector_type][:3] \
+                + ["rms_mismatch", "max_mismatch", "step_scale"]
+            save_report(report, header, self.report_filename)
@@ -0,0 +1,179 @@
+import itertools
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.text_files import read_text, save_report
+from .detector_characterisation_coeffs_operation import get_detector_params, make_in_text, \
+    params_to_in_values
+from .detector_init_characterisation_operation import DETECTOR_TYPE_TO_PARAM_NAMES, \
+    _edit_infile, _load_eff_from_tsv
+from .mcmodules_wrappers.nuclide import Nuclide
+from .mcmodules_wrappers.tccfcalc_runner import TccfcalcRunner, TccfcalcTask
+
+
+def _sample_candidates(initial: np.ndarray, n: int, relative_range: float,
+                       dead_layer_range: tp.List[float], seed: int) -> np.ndarray:
+    """initial params and latin hypercube samples around them"""
+    left = initial * (1 - relative_range)
+    right = initial * (1 + relative_range)
+    if len(initial) > 2:
+        left[2], right[2] = dead_layer_range
+    rng = np.random.default_rng(seed)
+    # every parameter range is split to n - 1 strata, one sample in every stratum
+    strata = np.stack([rng.permutation(n - 1) for _ in initial], axis=1)
+    u = (strata + rng.random(strata.shape)) / (n - 1)
+    return np.vstack([initial, left + u * (right - left)])
+
+
+def _get_rms_mismatch(target: np.ndarray, efficiencies: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.mean((target - np.log(efficiencies))**2, axis=-1))
+
+
+@register_operation
+class DetectorSuccessiveHalvingCharacterisationOperation:
+    """
+    DetectorSuccessiveHalvingCharacterisationOperation searches detector parameters
+        by successive halving: candidate detectors around initial one are calculated with
+        min_histories, the best 1/eta of them are recalculated with eta times more histories
+        and so on, the last candidate is calculated with max_histories.
+        All candidates of one step use the same seed, so they are compared with
+        the same random numbers and low-history ranking is reliable
+    parameters:
+        - input_in_filename: in-file with initial detector params values
+        - input_source_filename: in-file with source (e.g. point with distance)
+        - input_calc_params_filename: in-file with calculation parameters (optional)
+        - input_tsv_filename: input tsv-file with experimental efficiency,
+            energies must be the same as in tccfcalc results
+        - output_filename: desirable output in-file name with the best detector params
+        - detector_type: COAXIAL, SCINTIL
+        - candidates: number of candidates, including initial detector (default: 27)
+        - relative_range: diameter and height of candidates are in
+            [(1 - relative_range) * value, (1 + relative_range) * value], default: 0.1
+        - dead_layer_range: [min, max] of front and side dead layers (COAXIAL), cm
+        - min_histories, max_histories: histories of the first and the last steps
+            in thousands (default: 10, 1000)
+        - eta: histories multiplier and candidates divider of every step (default: 3)
+        - seed: seed for random generator and candidates sampling (default: 42)
+        - nuclide: nuclide in format: Co-60, default is gread (290.enx)
+        - workers: number of worker processes for tccfcalc calculations
+        - cache_dir: directory with cached tccfcalc results, "" -- no cache
+            (default: tccfcalc_cache)
+        - batch_size: histories in one library call
+        - report_filename: tsv-file with params and mismatch of candidates on every step
+            (optional)
+    """
+    def __init__(self):
+        self.input_in_filename = ""
+        self.input_source_filename = ""
+        self.input_calc_params_filename = ""
+        self.input_tsv_filename = ""
+        self.output_filename = ""
+        self.detector_type = ""
+        self.candidates = 27
+        self.relative_range = 0.1
+        self.dead_layer_range = [0.01, 0.2]
+        self.min_histories = 10
+        self.max_histories = 1000
+        self.eta = 3
+        self.seed = 42
+        self.nuclide = Nuclide.get_default()
+        self.workers = 1
+        self.cache_dir = "tccfcalc_cache"
+        self.batch_size = 1000
+        self.report_filename = ""
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'DetectorSuccessiveHalvingCharacterisationOperation':
+        op = DetectorSuccessiveHalvingCharacterisationOperation()
+        op.input_in_filename = os.path.join(project_dir, section['input_in_filename'])
+        op.input_source_filename = os.path.join(project_dir, section['input_source_filename'])
+        if section.get('input_calc_params_filename'):
+            op.input_calc_params_filename = os.path.join(project_dir,
+                                                         section['input_calc_params_filename'])
+        op.input_tsv_filename = os.path.join(project_dir, section['input_tsv_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        assert op.input_in_filename != op.output_filename, \
+            "input and output in-files cannot be the same"
+        op.detector_type = section["detector_type"]
+        assert op.detector_type in DETECTOR_TYPE_TO_PARAM_NAMES, "unsupported detector type"
+        op.candidates = section.get("candidates", op.candidates)
+        assert op.candidates > 1
+        op.relative_range = section.get("relative_range", op.relative_range)
+        assert 0 < op.relative_range < 1
+        op.dead_layer_range = section.get("dead_layer_range", op.dead_layer_range)
+        assert len(op.dead_layer_range) == 2
+        op.min_histories = section.get("min_histories", op.min_histories)
+        op.max_histories = section.get("max_histories", op.max_histories)
+        assert 0 < op.min_histories <= op.max_histories
+        op.eta = section.get("eta", op.eta)
+        assert op.eta > 1
+        op.seed = section.get("seed", op.seed)
+        assert op.seed > 0, "candidates must be compared with fixed seed"
+        if section.get('nuclide'):
+            op.nuclide = Nuclide.parse_from(section['nuclide'])
+        op.workers = section.get("workers", op.workers)
+        assert op.workers > 0
+        cache_dir = section.get("cache_dir", op.cache_dir)
+        op.cache_dir = os.path.join(project_dir, cache_dir) if cache_dir else ""
+        op.batch_size = section.get("batch_size", op.batch_size)
+        if section.get('report_filename'):
+            op.report_filename = os.path.join(project_dir, section['report_filename'])
+        return op
+
+    def run(self) -> None:
+        print('start detector_successive_halving_characterisation operation')
+        eff = _load_eff_from_tsv(self.input_tsv_filename)
+        assert eff
+        target = np.log(eff)
+        detector_text = read_text(self.input_in_filename)
+        other_texts = [read_text(self.input_source_filename)]
+        if self.input_calc_params_filename:
+            other_texts.append(read_text(self.input_calc_params_filename))
+        runner = TccfcalcRunner(cache_dir=self.cache_dir, workers=self.workers,
+                                batch_size=self.batch_size)
+
+        candidates = _sample_candidates(
+            get_detector_params(self.input_in_filename, self.detector_type), self.candidates,
+            self.relative_range, self.dead_layer_range, self.seed)
+        alive = np.arange(len(candidates))
+        histories = self.min_histories
+        total_histories = 0
+        report = []
+        for step in itertools.count():
+            tasks = [TccfcalcTask(make_in_text(detector_text, other_texts, candidates[i],
+                                               self.detector_type),
+                                  histories, self.seed, self.nuclide) for i in alive]
+            results = runner.run(tasks)
+            total_histories += len(tasks) * histories
+            efficiencies = np.array([r.efficiencies for r in results])
+            if efficiencies.shape[1] != len(target):
+                raise RuntimeError(f"{len(target)} experimental efficiencies, "
+                                   f"{efficiencies.shape[1]} calculated")
+            rms = _get_rms_mismatch(target, efficiencies)
+            order = np.argsort(rms)
+            alive, rms = alive[order], rms[order]
+            print(f'step {step}: {len(alive)} candidates, {histories} thsnds histories, '
+                  f'best rms mismatch {rms[0]:.5f}')
+            for i, r in zip(alive, rms):
+                report.append([step, histories, i] + candidates[i].tolist() + [r])
+            if histories >= self.max_histories:
+                break
+            alive = alive[:max(1, len(alive) // self.eta)]
+            histories = self.max_histories if len(alive) == 1 else \
+                min(histories * self.eta, self.max_histories)
+
+        best = candidates[alive[0]]
+        print(f'best params {np.round(best, 5).tolist()}, rms mismatch {rms[0]:.5f}, '
+              f'{total_histories} thsnds histories, '
+              f'{total_histories / (len(candidates) * self.max_histories):.3f} '
+              f'of all candidates with max histories')
+        _edit_infile(self.input_in_filename, self.output_filename,
+                     params_to_in_values(best, self.detector_type))
+        if self.report_filename:
+            header = ["step", "histories", "candidate"] \
+                + DETECTOR_TYPE_TO_PARAM_NAMES[self.detector_type][:3] + ["rms_mismatch"]
+            save_report(report, header, self.report_filename)
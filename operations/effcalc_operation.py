@@ -19,7 +19,8 @@ class EffCalcOperation:
         - seed: seed for random generator, 0 -- random seed, >0 -- fixed seed
         - activity: activiy in Bq
         - batch_size: number of histories is splitted on batches with size=batch-size.
-            It's used only for logging steps. -1 -- batchsize = histories
+            Progress and throughput are logged for every batch. -1 -- batchsize = histories
+        - metrics_filename: json lines file, batches throughput metrics are appended to (optional)
     """
     def __init__(self):
         self.input_filename = "tccfcalc.in"
@@ -30,7 +31,8 @@ class EffCalcOperation:
         self.activity = 1000.0
         self.is_calc_spectrum = False
         self.output_spe_name = "test_spectr.spe"
-        self.batch_size = -1
+        self.batch_size = 1000
+        self.metrics_filename = ""
 
     @staticmethod
     def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'EffCalcOperation':
@@ -48,8 +50,9 @@ class EffCalcOperation:
         op.is_calc_spectrum = section.get('is_calc_spectrum', op.is_calc_spectrum)
         op.output_spe_name = os.path.join(project_dir,
                                           section.get('output_spe_name', op.output_spe_name))
-        op.batch_size = section.get('batch_size', op.histories
-                                    if op.batch_size < 0 else op.batch_size)
+        op.batch_size = section.get('batch_size', op.batch_size)
+        if section.get('metrics_filename'):
+            op.metrics_filename = os.path.join(project_dir, section['metrics_filename'])
         return op
 
     def run(self) -> None:
@@ -57,10 +60,12 @@ class EffCalcOperation:
         # run effcalc
         if self.input_filename.endswith(".in"):
             shutil.copy(self.input_filename, 'tccfcalc.in')
-            calculate_eff(self.nuclide, self.histories, self.is_calc_spectrum, self.seed, self.activity)
+            calculate_eff(self.nuclide, self.histories, self.is_calc_spectrum, self.seed, self.activity,
+                          self.batch_size, self.metrics_filename)
         elif self.input_filename.endswith(".json"):
             shutil.copy(self.input_filename, 'tccfcalc_input.json')
-            calculate_eff_json(self.histories, self.is_calc_spectrum, self.seed, self.activity)
+            calculate_eff_json(self.histories, self.is_calc_spectrum, self.seed, self.activity,
+                               self.batch_size, self.metrics_filename)
         else:
             raise Exception("unknown input file extension")
         # copy tccfcalc.out -> output
@@ -0,0 +1,116 @@
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.common_code.efficiency_surface import EfficiencySurface
+from operations.common_parsers.tsv_parser import parse_tsv_to_float_cols
+from operations.operation_registry import register_operation
+
+EPS = 1e-16
+
+
+def _load_points(filenames: tp.List[str], distances: tp.List[float], energy_column: str,
+                 column_name: str) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    all_distances, all_energies, all_values = [], [], []
+    for filename, distance in zip(filenames, distances):
+        table = parse_tsv_to_float_cols(filename)
+        all_energies.append(np.array(table[energy_column]))
+        all_values.append(np.array(table[column_name]))
+        all_distances.append(np.full(len(all_energies[-1]), distance, dtype=np.float64))
+    return np.concatenate(all_distances), np.concatenate(all_energies), np.concatenate(all_values)
+
+
+def _calc_max_diff(values: np.ndarray, model_values: np.ndarray, is_relative_diff: bool,
+                   relative_to_average: bool) -> float:
+    diff = np.abs(values - model_values)
+    if is_relative_diff:
+        base = (values + model_values) / 2 if relative_to_average else values
+        diff = diff / (base + EPS)
+    return float(np.max(diff, initial=0.0))
+
+
+def _validate(surface: EfficiencySurface, filenames: tp.List[str], distances: tp.List[float],
+              energy_column: str, column_name: str, is_relative_diff: bool,
+              relative_to_average: bool, output_filename: str) -> None:
+    with open(output_filename, 'w') as f:
+        f.write("filename\tdistance\tmax_diff\n")
+        for filename, distance in zip(filenames, distances):
+            _, energies, values = _load_points([filename], [distance], energy_column,
+                                               column_name)
+            max_diff = _calc_max_diff(values, surface.evaluate(distance, energies),
+                                      is_relative_diff, relative_to_average)
+            print(f'{filename}: max diff {max_diff}')
+            f.write(f"{filename}\t{distance}\t{max_diff}\n")
+
+
+@register_operation
+class EfficiencySurfaceFitOperation:
+    """
+    EfficiencySurfaceFitOperation fits smooth efficiency surface eff(distance, energy):
+        log(efficiency) by 2d Legendre polynomial of log(distance) and log(energy),
+        and saves it to json model file (see EfficiencySurfaceQueryOperation for queries)
+    parameters:
+        - input_filenames: list with tsv-files with efficiencies (train)
+        - distances: list of distances of input files
+        - model_filename: output json-file with the surface model
+        - distance_degree, energy_degree: polynomial degrees by distance and energy,
+            must be less than numbers of distances and energies
+        - energy_column, column_name: names of energy and efficiency columns in tsv-files
+        - validation_filenames, validation_distances: tsv-files with efficiencies for
+            other distances to check the model (optional)
+        - validation_output_filename: tsv-file with max diff of model and every validation file
+            (columns: filename, distance, max_diff)
+        - is_relative_diff, relative_to_average: as in CalcMaxDiffBetweenTwoColumns
+    """
+    def __init__(self):
+        self.input_filenames: tp.List[str] = []
+        self.distances: tp.List[float] = []
+        self.model_filename: str = ""
+        self.distance_degree: int = 4
+        self.energy_degree: int = 8
+        self.energy_column: str = "energy"
+        self.column_name: str = "efficiency"
+        self.validation_filenames: tp.List[str] = []
+        self.validation_distances: tp.List[float] = []
+        self.validation_output_filename: str = ""
+        self.is_relative_diff: bool = True
+        self.relative_to_average: bool = False
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> (
+            'EfficiencySurfaceFitOperation'):
+        op = EfficiencySurfaceFitOperation()
+        op.input_filenames = [os.path.join(project_dir, input_filename)
+                              for input_filename in section['input_filenames']]
+        op.distances = section['distances']
+        assert len(op.input_filenames) == len(op.distances)
+        op.model_filename = os.path.join(project_dir, section['model_filename'])
+        op.distance_degree = section.get("distance_degree", min(op.distance_degree,
+                                                                len(op.distances) - 1))
+        op.energy_degree = section.get("energy_degree", op.energy_degree)
+        op.energy_column = section.get("energy_column", op.energy_column)
+        op.column_name = section.get("column_name", op.column_name)
+        op.validation_filenames = [
+            os.path.join(project_dir, validation_filename)
+            for validation_filename in section.get('validation_filenames', [])]
+        op.validation_distances = section.get('validation_distances', [])
+        assert len(op.validation_filenames) == len(op.validation_distances)
+        if op.validation_filenames:
+            op.validation_output_filename = os.path.join(
+                project_dir, section['validation_output_filename'])
+        op.is_relative_diff = section.get("is_relative_diff", op.is_relative_diff)
+        op.relative_to_average = section.get("relative_to_average", op.relative_to_average)
+        return op
+
+    def run(self) -> None:
+        print('start efficiency_surface_fit')
+        distances, energies, values = _load_points(self.input_filenames, self.distances,
+                                                   self.energy_column, self.column_name)
+        surface = EfficiencySurface.fit(distances, energies, values, self.distance_degree,
+                                        self.energy_degree)
+        surface.save(self.model_filename)
+        if self.validation_filenames:
+            _validate(surface, self.validation_filenames, self.validation_distances,
+                      self.energy_column, self.column_name, self.is_relative_diff,
+                      self.relative_to_average, self.validation_output_filename)
@@ -0,0 +1,71 @@
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.common_code.efficiency_surface import EfficiencySurface
+from operations.common_parsers.tsv_parser import parse_tsv_to_float_cols
+from operations.operation_registry import register_operation
+
+
+def _save_tsv(res: tp.Dict[str, np.ndarray], output_filename: str):
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(res.keys()))
+        f.write('\n')
+        for row in zip(*res.values()):
+            f.write('\t'.join(str(v) for v in row))
+            f.write('\n')
+
+
+def _query_surface(model_filename: str, input_filename: str, output_filename: str,
+                   distance: tp.Optional[float], distance_column: str, energy_column: str,
+                   column_name: str):
+    surface = EfficiencySurface.load(model_filename)
+    table = {k: np.array(v) for k, v in parse_tsv_to_float_cols(input_filename).items()}
+    distances = table[distance_column] if distance is None else distance
+    res = {distance_column: np.broadcast_to(distances, table[energy_column].shape),
+           energy_column: table[energy_column]}
+    res[column_name] = surface.evaluate(res[distance_column], res[energy_column])
+    _save_tsv(res, output_filename)
+
+
+@register_operation
+class EfficiencySurfaceQueryOperation:
+    """
+    EfficiencySurfaceQueryOperation calculates efficiencies by efficiency surface model
+        (see EfficiencySurfaceFitOperation) for batch of (distance, energy) pairs
+    parameters:
+        - model_filename: json-file with the surface model
+        - input_filename: tsv-file with energies (and distances, if distance is not set)
+        - output_filename: output tsv-file with distance, energy and efficiency columns
+        - distance: distance for all energies (optional)
+        - distance_column, energy_column: names of input columns
+        - column_name: name of output efficiency column
+    """
+    def __init__(self):
+        self.model_filename: str = ""
+        self.input_filename: str = ""
+        self.output_filename: str = ""
+        self.distance: tp.Optional[float] = None
+        self.distance_column: str = "distance"
+        self.energy_column: str = "energy"
+        self.column_name: str = "efficiency"
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> (
+            'EfficiencySurfaceQueryOperation'):
+        op = EfficiencySurfaceQueryOperation()
+        op.model_filename = os.path.join(project_dir, section['model_filename'])
+        op.input_filename = os.path.join(project_dir, section['input_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.distance = section.get("distance", op.distance)
+        op.distance_column = section.get("distance_column", op.distance_column)
+        op.energy_column = section.get("energy_column", op.energy_column)
+        op.column_name = section.get("column_name", op.column_name)
+        return op
+
+    def run(self) -> None:
+        print('start efficiency_surface_query')
+        _query_surface(self.model_filename, self.input_filename, self.output_filename,
+                       self.distance, self.distance_column, self.energy_column,
+                       self.column_name)
@@ -1,38 +1,82 @@
 import glob
 import os
+import time
+import traceback
 import typing as tp
+from concurrent.futures import ProcessPoolExecutor
 
 from operations.operation_registry import register_operation
+from .common_code.profiler import Profiler, ProfileRecord, get_profiler, profile, run_operation, \
+    set_profiler
+from .common_code.row_collector import flush_all_rows, get_run_id, start_run
+from .common_code.templating import CompiledTemplate
 from .operaton_interface import Operation
 
 
-def _update_str(section: str, names: tp.List[str], params: tp.List[tp.Any]) -> str:
-    for name, value in zip(names, params):
-        template = '${' + name + '}'
-        if section == template:
-            return value
-        if template in section:
-            section = section.replace(template, str(value))
-    return section
+FILE_PARAM_NAMES = ["FILEPATH", "FILEDIR", "FILENAME", "NAME", "EXT"]
 
 
-def _update_operation_rec(section: tp.Any, names: tp.List[str], params: tp.List[tp.Any]) -> tp.Any:
-    if isinstance(section, dict):
-        return {k: _update_operation_rec(v, names, params) for k, v in section.items()}
-    elif isinstance(section, list):
-        return [_update_operation_rec(r, names, params) for r in section]
-    elif type(section) is str:
-        return _update_str(section, names, params)
-    else:
-        return section
+class _FileResult(tp.NamedTuple):
+    filepath: str
+    seconds: float
+    error: str
+    # profile of file in worker process, it is merged to the main profiler
+    profile_records: tp.Tuple[ProfileRecord, ...] = ()
+    profile_metrics: tp.Tuple[tp.Dict[str, tp.Any], ...] = ()
 
 
-def _update_operation(section, filepath: str):
+def _get_file_params(filepath: str) -> tp.Dict[str, str]:
     filedir, filename = os.path.split(filepath)
     name, ext = os.path.splitext(filename)
+    return dict(zip(FILE_PARAM_NAMES, [filepath, filedir, filename, name, ext]))
 
-    return _update_operation_rec(section, names=["FILEPATH", "FILEDIR", "FILENAME", "NAME", "EXT"],
-                                 params=[filepath, filedir, filename, name, ext])
+
+def _run_for_file(template: CompiledTemplate, project_dir: str, filepath: str,
+                  continue_on_error: bool) -> _FileResult:
+    start = time.perf_counter()
+    try:
+        with profile('file', filepath):
+            for operation_rec in template.render(_get_file_params(filepath)):
+                t = register_operation.registry[operation_rec['type']]
+                operation: Operation = t.parse_from_yaml(operation_rec, project_dir)
+                run_operation(operation)
+    except Exception:
+        if not continue_on_error:
+            raise
+        return _FileResult(filepath, time.perf_counter() - start, traceback.format_exc(limit=3))
+    return _FileResult(filepath, time.perf_counter() - start, "")
+
+
+def _run_for_files(args) -> tp.List[_FileResult]:
+    """worker task: template is compiled once per files chunk"""
+    operation_params, project_dir, filepaths, continue_on_error, profiler_context, run_id = args
+    # forked worker has a copy of not flushed rows of the main process, they would be duplicated
+    start_run(run_id)
+    template = CompiledTemplate(operation_params, FILE_PARAM_NAMES)
+    # forked worker has a copy of the main profiler, its records would be lost
+    profiler = Profiler(*profiler_context) if profiler_context is not None else None
+    set_profiler(profiler)
+    results = []
+    for f in filepaths:
+        records_count, metrics_count = (len(profiler.records), len(profiler.metrics)) \
+            if profiler else (0, 0)
+        result = _run_for_file(template, project_dir, f, continue_on_error)
+        if profiler:
+            result = result._replace(profile_records=tuple(profiler.records[records_count:]),
+                                     profile_metrics=tuple(profiler.metrics[metrics_count:]))
+        results.append(result)
+    # rows collected in worker memory are lost with worker process
+    flush_all_rows()
+    return results
+
+
+def _save_report(results: tp.List[_FileResult], output_filename: str) -> None:
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(["filepath", "status", "seconds", "error"]) + '\n')
+        for r in results:
+            error = r.error.strip().splitlines()[-1] if r.error else ""
+            f.write('\t'.join([r.filepath, "error" if r.error else "ok",
+                               f"{r.seconds:.3f}", error]) + '\n')
 
 
 @register_operation
@@ -43,11 +87,24 @@ class ForFilesOperation:
         input_filemask: filemask to run for, e.g. path/*.txt
         operations: list of operations, they can contain:
           ${FILENAME}, ${FILEPATH}, ${FILEDIR}, ${NAME}, ${EXT}
+        recursive: "**" in filemask matches subdirectories (default: false)
+        sort: process files in sorted order (default: true)
+        parallel: number of worker processes (default: 1 -- run in this process),
+            operations of different files must not share output (or current dir) files
+        chunk_size: number of files for one worker task (default: split files between workers)
+        continue_on_error: capture error and go to the next file (default: false)
+        report_filename: tsv-file with status and time for every file (optional)
     """
     def __init__(self):
         self.input_filemask = ""
         self.operation_params: tp.List[tp.Dict[str, tp.Any]] = []
         self.project_dir = ""
+        self.recursive = False
+        self.sort = True
+        self.parallel = 1
+        self.chunk_size = 0
+        self.continue_on_error = False
+        self.report_filename = ""
 
     @staticmethod
     def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'ForFilesOperation':
@@ -55,15 +112,49 @@ class ForFilesOperation:
         op.input_filemask = os.path.join(project_dir, section["input_filemask"])
         op.operation_params = section['operations']
         op.project_dir = project_dir
+        op.recursive = section.get('recursive', op.recursive)
+        op.sort = section.get('sort', op.sort)
+        op.parallel = section.get('parallel', op.parallel)
+        assert op.parallel > 0
+        op.chunk_size = section.get('chunk_size', op.chunk_size)
+        op.continue_on_error = section.get('continue_on_error', op.continue_on_error)
+        if section.get('report_filename'):
+            op.report_filename = os.path.join(project_dir, section['report_filename'])
         return op
 
+    def _get_filepaths(self) -> tp.List[str]:
+        filepaths = [f for f in glob.glob(self.input_filemask, recursive=self.recursive)
+                     if os.path.isfile(f)]
+        return sorted(filepaths) if self.sort else filepaths
+
     def run(self) -> None:
         print('start for_files operation')
-        for filepath in glob.glob(self.input_filemask):
-            if not os.path.isfile(filepath):
-                continue
-            for operation_rec in self.operation_params:
-                operation_rec = _update_operation(operation_rec, filepath)
-                t = register_operation.registry[operation_rec['type']]
-                operation = t.parse_from_yaml(operation_rec, self.project_dir)
-                operation.run()
+        filepaths = self._get_filepaths()
+        if self.parallel > 1 and len(filepaths) > 1:
+            chunk_size = self.chunk_size or (len(filepaths) + self.parallel - 1) // self.parallel
+            chunks = [filepaths[i:i+chunk_size] for i in range(0, len(filepaths), chunk_size)]
+            # errors are captured in workers to report all files
+            profiler = get_profiler()
+            profiler_context = profiler.get_worker_context() if profiler else None
+            tasks = [(self.operation_params, self.project_dir, chunk, True, profiler_context,
+                      get_run_id()) for chunk in chunks]
+            with ProcessPoolExecutor(max_workers=self.parallel) as pool:
+                results = [r for chunk_results in pool.map(_run_for_files, tasks)
+                           for r in chunk_results]
+            if profiler:
+                for r in results:
+                    profiler.merge(r.profile_records, r.profile_metrics)
+        else:
+            template = CompiledTemplate(self.operation_params, FILE_PARAM_NAMES)
+            results = [_run_for_file(template, self.project_dir, f, self.continue_on_error)
+                       for f in filepaths]
+
+        failed = [r for r in results if r.error]
+        print(f'for_files: {len(results)} files, {len(failed)} failed, '
+              f'{sum(r.seconds for r in results):.1f} s')
+        for r in failed:
+            print(f'{r.filepath}:\n{r.error}')
+        if self.report_filename:
+            _save_report(results, self.report_filename)
+        if failed and not self.continue_on_error:
+            raise RuntimeError(f'for_files: {len(failed)} files failed')
@@ -1,30 +1,11 @@
 import typing as tp
 
 from operations.operation_registry import register_operation
+from .common_code.profiler import profile, run_operation
+from .common_code.templating import CompiledTemplate
 from .operaton_interface import Operation
 
 
-def _update_str(section: str, names: tp.List[str], params: tp.List[tp.Any]) -> str:
-    for name, value in zip(names, params):
-        template = '${' + name + '}'
-        if section == template:
-            return value
-        if template in section:
-            section = section.replace(template, str(value))
-    return section
-
-
-def _update_operation_rec(section: tp.Any, names: tp.List[str], params: tp.List[tp.Any]) -> tp.Any:
-    if isinstance(section, dict):
-        return {k: _update_operation_rec(v, names, params) for k, v in section.items()}
-    elif isinstance(section, list):
-        return [_update_operation_rec(r, names, params) for r in section]
-    elif type(section) is str:
-        return _update_str(section, names, params)
-    else:
-        return section
-
-
 def _transpose(lst: tp.List[tp.List[tp.Any]]) -> tp.List[tp.List[tp.Any]]:
     return list(zip(*lst))
 
@@ -44,27 +25,36 @@ class ForOperation:
     ForOperation -- special operation: creates N branches for graph in params
     parameters:
         - var_params: list of parameters for ForOperation: [name: param_name, values: [v1, v2, ...]]
-        - operations: list of operations, they can contain $param_name,
+        - operations: list of operations, they can contain ${param_name},
             new param value will be set for each for iteration
+            (value keeps its type, if placeholder is the whole string)
     """
     def __init__(self):
         self.operations: tp.List[Operation] = []
+        # parameters and operations of every iteration
+        self.iterations: tp.List[tp.Tuple[tp.Dict[str, tp.Any], tp.List[Operation]]] = []
 
     @staticmethod
     def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'ForOperation':
         op = ForOperation()
         assert len(section['var_params']) > 0
         names, var_params = _make_iterable(section['var_params'])
+        template = CompiledTemplate(section['operations'], names)
         for params in var_params:
             assert len(names) == len(params)
-            for operation_rec in section['operations']:
-                operation_rec = _update_operation_rec(operation_rec, names, params)
+            values = dict(zip(names, params))
+            iteration_operations = []
+            for operation_rec in template.render(values):
                 t = register_operation.registry[operation_rec['type']]
                 operation = t.parse_from_yaml(operation_rec, project_dir)
-                op.operations.append(operation)
+                iteration_operations.append(operation)
+            op.iterations.append((values, iteration_operations))
+            op.operations.extend(iteration_operations)
         return op
 
     def run(self) -> None:
         print('start for')
-        for op in self.operations:
-            op.run()
+        for values, operations in self.iterations:
+            with profile('iteration', str(values)):
+                for op in operations:
+                    run_operation(op)
@@ -1,4 +1,3 @@
-import bisect
 import os
 import typing as tp
 
@@ -11,18 +10,13 @@ from operations.operation_registry import register_operation
 LINEAR = "linear"
 REVERSE_LINEAR = "reverse_linear"
 LINEAR_LOG = "linear_log"
-AVAILIABLE_MODS = [LINEAR, REVERSE_LINEAR, LINEAR_LOG]
-
-
-def _get_close_indices(distances: tp.List[float], target_distance: float) -> tp.Tuple[float, float]:
-    ri = bisect.bisect_left(distances, target_distance)
-    if ri == len(distances):
-        ri -= 1
-    elif ri == 0:
-        ri += 1
-    li = ri - 1
-    assert 0 <= li and ri < len(distances)
-    return li, ri
+# monotone cubic (Fritsch-Carlson) and natural cubic spline by log(distance), log(efficiency)
+PCHIP_LOG = "pchip_log"
+SPLINE_LOG = "spline_log"
+AVAILIABLE_MODS = [LINEAR, REVERSE_LINEAR, LINEAR_LOG, PCHIP_LOG, SPLINE_LOG]
+LINEAR_MODS = [LINEAR, REVERSE_LINEAR, LINEAR_LOG]
+# column, which is interpolated in log scale for log mods
+LOG_COLUMN = "efficiency"
 
 
 def _parse_tsv_output(filename: str) -> tp.Dict[str, np.ndarray]:
@@ -66,59 +60,185 @@ def _save_efficiency(res: tp.Dict[str, tp.List[float]], output_filename: str):
     _save_tsv(res, output_filename)
 
 
-class LinearInterpol:
-    def __init__(self, dist_left: float, dist_right: float, target_distance: float):
-        self.w = (target_distance - dist_left) / (dist_right - dist_left)
+def _get_close_indices(x: np.ndarray, xt: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """indices of nearest left and right points (sorted x), border pairs for extrapolation"""
+    ri = np.clip(np.searchsorted(x, xt, side='left'), 1, len(x) - 1)
+    return ri - 1, ri
+
+
+def _interpolate_linear(x: np.ndarray, y: np.ndarray, xt: np.ndarray) -> np.ndarray:
+    """x: (n,) sorted, y: (n, m), xt: (t,) -> (t, m)"""
+    li, ri = _get_close_indices(x, xt)
+    w = ((xt - x[li]) / (x[ri] - x[li]))[:, np.newaxis]
+    return (1 - w) * y[li] + w * y[ri]
+
+
+def _hermite(x: np.ndarray, y: np.ndarray, d: np.ndarray, xt: np.ndarray) -> np.ndarray:
+    """
+    cubic hermite interpolation with derivatives d in points,
+        linear extrapolation with border derivatives
+    """
+    i = np.clip(np.searchsorted(x, xt, side='right') - 1, 0, len(x) - 2)
+    h = (x[i + 1] - x[i])[:, np.newaxis]
+    t = np.clip((xt - x[i]) / (x[i + 1] - x[i]), 0.0, 1.0)[:, np.newaxis]
+    res = (2*t**3 - 3*t**2 + 1) * y[i] + (t**3 - 2*t**2 + t) * h * d[i] \
+        + (-2*t**3 + 3*t**2) * y[i + 1] + (t**3 - t**2) * h * d[i + 1]
+    left = xt < x[0]
+    res[left] = y[0] + (xt[left] - x[0])[:, np.newaxis] * d[0]
+    right = xt > x[-1]
+    res[right] = y[-1] + (xt[right] - x[-1])[:, np.newaxis] * d[-1]
+    return res
+
+
+def _pchip_derivatives(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Fritsch-Carlson derivatives, keep monotonicity of every column of y"""
+    h = np.diff(x)[:, np.newaxis]
+    delta = np.diff(y, axis=0) / h
+    d = np.zeros_like(y)
+    if len(x) == 2:
+        d[:] = delta[0]
+        return d
+    # interior points: weighted harmonic mean of slopes with the same sign
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = np.sign(delta[:-1]) * np.sign(delta[1:]) > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d[1:-1] = np.where(same_sign, (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:]), 0.0)
+    # border points: three-point formula, limited to keep monotonicity
+    for k, h0, h1, delta0, delta1 in [(0, h[0], h[1], delta[0], delta[1]),
+                                      (-1, h[-1], h[-2], delta[-1], delta[-2])]:
+        dk = ((2 * h0 + h1) * delta0 - h0 * delta1) / (h0 + h1)
+        dk = np.where(np.sign(dk) != np.sign(delta0), 0.0, dk)
+        dk = np.where((np.sign(delta0) != np.sign(delta1)) & (np.abs(dk) > np.abs(3 * delta0)),
+                      3 * delta0, dk)
+        d[k] = dk
+    return d
+
+
+def _spline_derivatives(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """natural cubic spline (zero second derivatives on borders) derivatives in points"""
+    n = len(x)
+    h = np.diff(x)
+    delta = np.diff(y, axis=0) / h[:, np.newaxis]
+    # second derivatives m: m[0] = m[-1] = 0,
+    # h[i-1] m[i-1] + 2 (h[i-1] + h[i]) m[i] + h[i] m[i+1] = 6 (delta[i] - delta[i-1])
+    a = np.eye(n)
+    rhs = np.zeros_like(y)
+    for i in range(1, n - 1):
+        a[i, i - 1:i + 2] = [h[i - 1], 2 * (h[i - 1] + h[i]), h[i]]
+        rhs[i] = 6 * (delta[i] - delta[i - 1])
+    m = np.linalg.solve(a, rhs)
+    d = np.empty_like(y)
+    d[:-1] = delta - h[:, np.newaxis] * (2 * m[:-1] + m[1:]) / 6
+    d[-1] = delta[-1] + h[-1] * (m[-2] + 2 * m[-1]) / 6
+    return d
+
+
+def _get_x(distances: np.ndarray, mode: str) -> np.ndarray:
+    if mode == REVERSE_LINEAR:
+        return 1 / distances
+    if mode in (PCHIP_LOG, SPLINE_LOG):
+        return np.log(distances)
+    return distances
+
+
+def _interpolate(distances: np.ndarray, y: np.ndarray, target_distances: np.ndarray,
+                 mode: str) -> np.ndarray:
+    """distances: (n,) sorted, y: (n, m), target_distances: (t,) -> (t, m)"""
+    x = _get_x(distances, mode)
+    xt = _get_x(target_distances, mode)
+    order = np.argsort(x)
+    x, y = x[order], y[order]
+    if mode in LINEAR_MODS:
+        return _interpolate_linear(x, y, xt)
+    if mode == PCHIP_LOG:
+        return _hermite(x, y, _pchip_derivatives(x, y), xt)
+    return _hermite(x, y, _spline_derivatives(x, y), xt)
+
+
+def _get_needed_indices(distances: np.ndarray, target_distances: np.ndarray,
+                        mode: str) -> np.ndarray:
+    """linear mods need only neighbour tables of every target distance"""
+    if mode not in LINEAR_MODS:
+        return np.arange(len(distances))
+    li, ri = _get_close_indices(distances, target_distances)
+    return np.union1d(li, ri)
+
+
+def _is_log_column(column_name: str, mode: str) -> bool:
+    return column_name == LOG_COLUMN and mode in (LINEAR_LOG, PCHIP_LOG, SPLINE_LOG)
+
+
+def interpolate_efficiency_tables(tables: tp.List[tp.Dict[str, np.ndarray]],
+                                  distances: tp.List[float], target_distances: tp.List[float],
+                                  mode: str) -> tp.List[tp.Dict[str, np.ndarray]]:
+    """
+    interpolate_efficiency_tables interpolates every column of tables (with the same columns
+        and rows, one table per distance) to target distances in one pass,
+        returns one table per target distance
+    """
+    column_names = list(tables[0].keys())
+    for table in tables:
+        assert list(table.keys()) == column_names, "tables must have the same columns"
+    # (distance, column, row) -> (distance, column x row)
+    values = np.stack([np.stack([table[name] for name in column_names]) for table in tables])
+    for i, name in enumerate(column_names):
+        if _is_log_column(name, mode):
+            values[:, i] = np.log10(values[:, i])
+    n_dist, n_cols, n_rows = values.shape
+    res = _interpolate(np.asarray(distances, dtype=np.float64), values.reshape(n_dist, -1),
+                       np.asarray(target_distances, dtype=np.float64), mode)
+    res = res.reshape(len(target_distances), n_cols, n_rows)
+    for i, name in enumerate(column_names):
+        if _is_log_column(name, mode):
+            res[:, i] = 10**res[:, i]
+    return [dict(zip(column_names, r)) for r in res]
+
 
-    def __call__(self, left_a: np.ndarray, right_a: np.ndarray) -> np.ndarray:
-        return (1 - self.w) * left_a + self.w * right_a
+def _interpolate_efficiency_to_new_distances(input_filenames: tp.List[str],
+                                             output_filenames: tp.List[str],
+                                             distances: tp.List[float],
+                                             target_distances: tp.List[float], mode: str):
+    order = np.argsort(distances)
+    distances = np.asarray(distances, dtype=np.float64)[order]
+    input_filenames = [input_filenames[i] for i in order]
+    indices = _get_needed_indices(distances, np.asarray(target_distances, dtype=np.float64), mode)
+    tables = [_load_efficiency(input_filenames[i]) for i in indices]
+    results = interpolate_efficiency_tables(tables, distances[indices].tolist(),
+                                            target_distances, mode)
+    for res, output_filename in zip(results, output_filenames):
+        _save_efficiency(res, output_filename)
 
 
 def _interpolate_efficiency_to_new_distance(input_filenames: tp.List[str], output_filename: str,
                                             distances: tp.List[float], target_distance: float,
                                             mode: str):
-    li, ri = _get_close_indices(distances, target_distance)
-    if mode == LINEAR:
-        interpol = LinearInterpol(distances[li], distances[ri], target_distance)
-    elif mode == REVERSE_LINEAR:
-        interpol = LinearInterpol(1/distances[li], 1/distances[ri], 1/target_distance)
-    elif mode == LINEAR_LOG:
-        interpol = LinearInterpol(distances[li], distances[ri], target_distance)
-    left_efficiency = _load_efficiency(input_filenames[li])
-    right_efficiency = _load_efficiency(input_filenames[ri])
-
-    res = {}
-    for column_name, lvalues in left_efficiency.items():
-        rvalues = right_efficiency[column_name]
-        if mode == LINEAR_LOG and column_name == "efficiency":
-            lvalues = np.log10(lvalues)
-            rvalues = np.log10(rvalues)
-
-        r = interpol(lvalues, rvalues)
-        if mode == LINEAR_LOG and column_name == "efficiency":
-            r = 10**r
-        res[column_name] = r
-
-    _save_efficiency(res, output_filename)
+    _interpolate_efficiency_to_new_distances(input_filenames, [output_filename], distances,
+                                             [target_distance], mode)
 
 
 @register_operation
 class LinearEfficiencyInterpolateOperation:
     """
-    LinearEfficiencyInterpolateOperation linear interpolates efficiencies by distance
+    LinearEfficiencyInterpolateOperation interpolates efficiencies by distance
     parameters:
         - input_filenames: list with tsv-filenames with efficiencies
         - distances: list of distances
         - output_filename: desirable name of output tsv-file (with efficiencies)
             for distance = target_distance
         - target_distance: target distance to calculate interpolated value
-        - mode: type of interpolation: linear, reverse_linear, linear_log
+        - output_filenames, target_distances: lists of output tsv-files and their distances,
+            instead of output_filename and target_distance: input files are read once
+            and all targets are interpolated in one pass
+        - mode: type of interpolation: linear, reverse_linear, linear_log,
+            pchip_log (monotone cubic), spline_log (natural cubic spline),
+            *_log mods interpolate log of efficiency, pchip_log and spline_log -- by log of distance
     """
     def __init__(self):
         self.input_filenames: tp.List[str] = []
         self.distances: tp.List[float] = []
-        self.output_filename = ""
-        self.target_distance = 0.0
+        self.output_filenames: tp.List[str] = []
+        self.target_distances: tp.List[float] = []
         self.mode: str = LINEAR
 
     @staticmethod
@@ -129,9 +249,15 @@ class LinearEfficiencyInterpolateOperation:
             os.path.join(project_dir, input_filename)
             for input_filename in section['input_filenames']]
         op.distances = section['distances']
-        op.output_filename = os.path.join(project_dir, section['output_filename'])
-        op.target_distance = section['target_distance']
+        if 'target_distances' in section:
+            op.output_filenames = [os.path.join(project_dir, output_filename)
+                                   for output_filename in section['output_filenames']]
+            op.target_distances = section['target_distances']
+        else:
+            op.output_filenames = [os.path.join(project_dir, section['output_filename'])]
+            op.target_distances = [section['target_distance']]
         assert len(op.input_filenames) == len(op.distances)
+        assert len(op.output_filenames) == len(op.target_distances)
         assert len(op.distances) > 1, "nothing to interpolate"
         op.mode = section.get("mode", op.mode)
         assert op.mode in AVAILIABLE_MODS
@@ -139,5 +265,5 @@ class LinearEfficiencyInterpolateOperation:
 
     def run(self) -> None:
         print('start linear_efficiency_interpolate')
-        _interpolate_efficiency_to_new_distance(self.input_filenames, self.output_filename,
-                                                self.distances, self.target_distance, self.mode)
+        _interpolate_efficiency_to_new_distances(self.input_filenames, self.output_filenames,
+                                                 self.distances, self.target_distances, self.mode)
@@ -253,20 +253,35 @@ class Efficiency:
         # headers
         self.header_lines.append((nuclide, "100,1,1"))
 
-    def save_as_efa(self, filename: str, is_append: bool = False) -> None:
+    def write_efa(self, f: tp.TextIO) -> None:
+        """writes efficiency as efa-record to opened file"""
         self.convert_records_to_efa()
+        f.write(self.record_name + '\n')
+        for n, v in self.header_lines:
+            f.write(n + '=' + v + '\n')
+        for p in self.points:
+            f.write(str(p) + '\n')
+        f.write(f"Zones={len(self.zones)}\n")
+        for i, zone in enumerate(self.zones):
+            f.write(zone.print_zone(i))
+
+    def save_as_efa(self, filename: str, is_append: bool = False) -> None:
         mode = 'a' if is_append else 'w'
         with open(filename, mode) as f:
             if mode == 'a':
                 f.write('\n')
-            f.write(self.record_name + '\n')
-            for n, v in self.header_lines:
-                f.write(n + '=' + v + '\n')
-            for p in self.points:
-                f.write(str(p) + '\n')
-            f.write(f"Zones={len(self.zones)}\n")
-            for i, zone in enumerate(self.zones):
-                f.write(zone.print_zone(i))
+            self.write_efa(f)
+
+
+def save_efficiencies_as_efa(efficiencies: tp.List[Efficiency], filename: str,
+                             is_append: bool = False) -> None:
+    """saves all efficiencies to one efa-file (records are separated by empty line)"""
+    mode = 'a' if is_append else 'w'
+    with open(filename, mode) as f:
+        for i, eff in enumerate(efficiencies):
+            if i > 0 or mode == 'a':
+                f.write('\n')
+            eff.write_efa(f)
 
 
 def _is_float(s: str) -> bool:
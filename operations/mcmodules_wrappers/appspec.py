@@ -1,17 +1,38 @@
-from .appspec_wrapper import AppspecDllWrapper
+import typing as tp
+
+import numpy as np
+
+from .lib_factory import create_appspec_wrapper
 from .read_output_bin import convert_from_bin_to_txt
 
 
 def calc_efficiency(input_filename: str, output_filename: str, is_log: bool) -> None:
-    lib = AppspecDllWrapper()
+    lib = create_appspec_wrapper()
     res = lib.calculate_efficiency_json(input_filename, output_filename, is_log)
     del lib
     if res != 0:
         raise RuntimeError(f"efficiency calculation error: {res}")
 
 
+def calc_efficiency_batch(response_energies: np.ndarray, response_nfeps: np.ndarray,
+                          response_dfeps: np.ndarray, is_log: bool,
+                          energies: np.ndarray, count_rates: np.ndarray,
+                          dcount_rates: np.ndarray, intensities: np.ndarray
+                          ) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    calc_efficiency_batch calculates efficiencies for peak table with detector response,
+        returns efficiencies, their uncertainties and error codes
+    """
+    lib = create_appspec_wrapper()
+    lib.prepare_efficiency_calculation(response_energies, response_nfeps, response_dfeps, is_log)
+    res = lib.calculate_efficiency_batch(energies, count_rates, dcount_rates, intensities)
+    lib.reset_efficiency_calculation()
+    del lib
+    return res
+
+
 def calc_spectrum(input_filename: str, output_filename: str):
-    lib = AppspecDllWrapper()
+    lib = create_appspec_wrapper()
 
     res = lib.calc_apparatus_spectrum(input_filename)
     if res:
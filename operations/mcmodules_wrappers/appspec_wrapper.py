@@ -3,6 +3,8 @@ import sys
 import typing as tp
 import ctypes as ct
 
+import numpy as np
+
 from .read_output_bin import convert_from_bin_to_txt
 
 
@@ -10,6 +12,8 @@ PREPARE_ERROR_CODES = [
     "",
 ]
 
+_DoubleArray = np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS')
+
 
 def _get_attribute(lib, attributes: tp.List[str]):
     """
@@ -39,8 +43,7 @@ class AppspecDllWrapper:
             ['prepare_efficiency_calculation@20', 'prepare_efficiency_calculation']
         )
         self._prepare_efficiency_calculation.argtypes = [
-            ct.c_int, ct.POINTER(ct.c_double), ct.POINTER(ct.c_double), ct.POINTER(ct.c_double),
-            ct.c_bool]
+            ct.c_int, _DoubleArray, _DoubleArray, _DoubleArray, ct.c_bool]
         # calculate
         self._calculate_efficiency = _get_attribute(self._lib, ['calculate_efficiency@40',
                                                                 'calculate_efficiency'])
@@ -67,6 +70,8 @@ class AppspecDllWrapper:
         self._make_apparatus_spectrum = _get_attribute(
             self._lib, ['make_apparatus_spectrum@8', 'make_apparatus_spectrum'])
         self._make_apparatus_spectrum.argtypes = [ct.c_char_p, ct.c_char_p]
+        # arrays passed to prepare_efficiency_calculation
+        self._efficiency_grid: tp.Tuple[np.ndarray, ...] = ()
 
 
     @staticmethod
@@ -76,15 +81,20 @@ class AppspecDllWrapper:
                 return lib_name
         raise AttributeError(f'cannot find appspec library in "{path_to_dll}"')
 
-    def prepare_efficiency_calculation(self, energy_array: tp.List[float],
-                                       nfep_array: tp.List[float], dfep_array: tp.List[float],
+    def prepare_efficiency_calculation(self, energy_array: tp.Sequence[float],
+                                       nfep_array: tp.Sequence[float],
+                                       dfep_array: tp.Sequence[float],
                                        is_log: bool) -> None:
-        e = (ct.c_double * len(energy_array))(*energy_array)
-        nfep = (ct.c_double * len(nfep_array))(*nfep_array)
-        dfep = (ct.c_double * len(dfep_array))(*dfep_array)
+        """arrays are passed by pointer, float64 contiguous numpy arrays are not copied"""
+        e = np.ascontiguousarray(energy_array, dtype=np.float64)
+        nfep = np.ascontiguousarray(nfep_array, dtype=np.float64)
+        dfep = np.ascontiguousarray(dfep_array, dtype=np.float64)
+        assert len(e) == len(nfep) == len(dfep), "arrays must have same lengths"
+        # library may keep pointers, so arrays live until the next prepare
+        self._efficiency_grid = (e, nfep, dfep)
 
         return self._prepare_efficiency_calculation(
-            len(energy_array), e, nfep, dfep, is_log)
+            len(e), e, nfep, dfep, is_log)
 
     def calculate_efficiency(self, energy: float, peak_count_rate: float, dpeak_count_rate: float,
                              peak_intensity: float) -> tp.Tuple[float, float, int]:
@@ -93,10 +103,43 @@ class AppspecDllWrapper:
         error_num = self._calculate_efficiency(
             energy, peak_count_rate, dpeak_count_rate, peak_intensity,
             ct.pointer(efficiency), ct.pointer(defficiency))
-        return efficiency, defficiency, error_num
+        return float(efficiency.value), float(defficiency.value), error_num
+
+    def calculate_efficiency_batch(self, energies: tp.Sequence[float],
+                                   peak_count_rates: tp.Sequence[float],
+                                   dpeak_count_rates: tp.Sequence[float],
+                                   peak_intensities: tp.Sequence[float]
+                                   ) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        calculates efficiency for every peak (after prepare_efficiency_calculation),
+        returns arrays: efficiencies, their uncertainties and error codes (0 -- ok)
+        """
+        e = np.asarray(energies, dtype=np.float64)
+        cr = np.asarray(peak_count_rates, dtype=np.float64)
+        dcr = np.asarray(dpeak_count_rates, dtype=np.float64)
+        intensity = np.asarray(peak_intensities, dtype=np.float64)
+        assert len(e) == len(cr) == len(dcr) == len(intensity), "arrays must have same lengths"
+        n = len(e)
+        efficiencies = np.empty(n)
+        defficiencies = np.empty(n)
+        error_nums = np.empty(n, dtype=np.int32)
+        # output parameters and their pointers are created once for all peaks
+        efficiency = ct.c_double(-1.0)
+        defficiency = ct.c_double(-1.0)
+        p_efficiency = ct.byref(efficiency)
+        p_defficiency = ct.byref(defficiency)
+        calculate = self._calculate_efficiency
+        for i, args in enumerate(zip(e.tolist(), cr.tolist(), dcr.tolist(), intensity.tolist())):
+            efficiency.value = -1.0
+            defficiency.value = -1.0
+            error_nums[i] = calculate(*args, p_efficiency, p_defficiency)
+            efficiencies[i] = efficiency.value
+            defficiencies[i] = defficiency.value
+        return efficiencies, defficiencies, error_nums
 
     def reset_efficiency_calculation(self) -> None:
         self._reset_efficiency_calculation()
+        self._efficiency_grid = ()
 
     def calc_apparatus_spectrum(self, input_filename: str) -> int:
         return self._calc_apparatus_spectrum(bytes(input_filename, 'utf-8'))
@@ -3,17 +3,29 @@ import os.path
 import sys
 import logging
 
+from .mc_metrics import ThroughputMeter, open_sink, split_to_batches
+from .lib_factory import create_tccfcalc_wrapper
 from .tccfcalc_wrapper import TccFcalcDllWrapper, get_prepare_error_message
 from .nuclide import Nuclide
 
 
+def calculate_batches(lib: TccFcalcDllWrapper, histories: int, batch_size: int,
+                       metrics_filename: str) -> None:
+    """runs histories by batches, throughput of every batch is logged and sent to metrics"""
+    with open_sink(metrics_filename) as sink:
+        meter = ThroughputMeter('tccfcalc', histories, sink)
+        for batch in split_to_batches(histories, batch_size):
+            with meter.measure_batch(batch):
+                lib.tccfcalc_calculate(batch)
+        meter.finish()
+
+
 def calculate_eff(nuclide: Nuclide, N_thsnds: int, is_calc_spectrum: bool, seed: int,
-                  activity: float, batch_size: int = 1000):
-    assert N_thsnds*1000 % batch_size == 0, "batch_size must divide N"
+                  activity: float, batch_size: int = 1000, metrics_filename: str = ""):
     # prepare
     cur_path = os.getcwd()
     cur_lib_path = os.path.join(cur_path, 'Lib')
-    lib = TccFcalcDllWrapper()
+    lib = create_tccfcalc_wrapper()
     error_num = lib.tccfcalc_prepare(nuclide.a, nuclide.z, nuclide.m, cur_path, cur_lib_path, seed)
     if error_num:
         error_msg = get_prepare_error_message(error_num)
@@ -23,14 +35,7 @@ def calculate_eff(nuclide: Nuclide, N_thsnds: int, is_calc_spectrum: bool, seed:
 
     # calculate
     logging.info(f'Starting calculation with N = {N_thsnds} thsnds')
-    percent = 0
-    steps = N_thsnds * 1000 // batch_size
-    for i in range(steps):
-        lib.tccfcalc_calculate(batch_size)
-        new_percent = int(10 * i / steps)
-        if percent != new_percent:
-            percent = new_percent
-            logging.debug(f'{percent*10}%')
+    calculate_batches(lib, N_thsnds * 1000, batch_size, metrics_filename)
 
     # spectrum
     if is_calc_spectrum:
@@ -45,11 +50,11 @@ def calculate_eff(nuclide: Nuclide, N_thsnds: int, is_calc_spectrum: bool, seed:
 
 
 def calculate_eff_json(N_thsnds: int, is_calc_spectrum: bool, seed: int, activity: float,
-                       batch_size: int = 1000):
+                       batch_size: int = 1000, metrics_filename: str = ""):
     # prepare
     cur_path = os.getcwd()
     input_filename = os.path.join(cur_path, 'tccfcalc_input.json')
-    lib = TccFcalcDllWrapper()
+    lib = create_tccfcalc_wrapper()
     error_num = lib.tccfcalc_prepare_json(input_filename, seed)
     if error_num:
         error_msg = get_prepare_error_message(error_num)
@@ -59,14 +64,7 @@ def calculate_eff_json(N_thsnds: int, is_calc_spectrum: bool, seed: int, activit
 
     # calculate
     logging.info(f'Starting calculation with N = {N_thsnds} thsnds')
-    percent = 0
-    steps = N_thsnds * 1000 // batch_size
-    for i in range(steps):
-        lib.tccfcalc_calculate(batch_size)
-        new_percent = int(10 * i / steps)
-        if percent != new_percent:
-            percent = new_percent
-            logging.debug(f'{percent*10}%')
+    calculate_batches(lib, N_thsnds * 1000, batch_size, metrics_filename)
 
     # spectrum
     if is_calc_spectrum:
@@ -94,6 +92,10 @@ def main():
     parser.add_argument('-c', '--calc_spectrum', action='store_true', help='calculate spectrum')
     parser.add_argument('--activity', help='activity for source in Bq, default = 1000 Bq',
                         type=float, default=1000)
+    parser.add_argument('-b', '--batch_size', help='histories in one library call, default=1000',
+                        type=int, default=1000)
+    parser.add_argument('--metrics', help='json lines file for batches throughput metrics',
+                        default='')
     parser.add_argument('--json', help='search tccfcalc_input.json', action="store_true",
                         default=False)
     parser.add_argument('-v', '--verbose', help='verbose mode', action="store_true",
@@ -128,9 +130,10 @@ def main():
     is_calc_spectrum = args.calc_spectrum
 
     if args.json:
-        calculate_eff_json(N, is_calc_spectrum, seed, activity)
+        calculate_eff_json(N, is_calc_spectrum, seed, activity, args.batch_size, args.metrics)
     else:
-        calculate_eff(nuclide, N, is_calc_spectrum, seed, activity)
+        calculate_eff(nuclide, N, is_calc_spectrum, seed, activity, args.batch_size,
+                      args.metrics)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,405 @@
+"""
+    Deterministic python stand-ins for calculation libraries (tccfcalc, physspec, appspec)
+    with the same interface as their wrappers. They write output files in the real formats
+    and spend configurable cpu time per history, so graphs can be run and benchmarked
+    without the libraries. Results are synthetic: smooth efficiency curve with Monte-Carlo
+    like noise, which depends on input file content, seed and number of histories only.
+    Fake tccfcalc efficiency of in-files with crystal sizes depends smoothly on detector
+    geometry and point source distance, so characterisation graphs can be checked too.
+"""
+import json
+import math
+import os.path
+import struct
+import time
+import typing as tp
+import zlib
+from ctypes import POINTER, pointer
+
+import numpy as np
+
+from ..common_parsers.config_parser import ConfigFileParser
+from .physspec_wrapper import CalculationResults, PhysspecResults
+
+
+# tccfcalc results energies, keV
+TCCFCALC_ENERGIES = [46.5, 59.5, 88.0, 122.1, 165.9, 279.2, 391.7, 514.0, 661.7, 834.8, 898.0,
+                     1115.5, 1173.2, 1332.5, 1836.1, 2614.5]
+SPECTRUM_CHANNELS = 4096
+SPECTRUM_EMAX_KEV = 3000.0
+RESOLUTION_FWHM_KEV = 2.0
+TCCFCALC_OUT_FILENAME = "tccfcalc.out"
+TCCFCALC_SPECTRUM_FILENAME = "test_spectr.spe"
+APPSPEC_OUTPUT_BIN_FILENAME = "appspec_output.bin"
+
+
+def spend_cpu_time(seconds: float) -> None:
+    """busy wait, so fake calculation loads cpu like the real one"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _file_key(filename: str) -> int:
+    with open(filename, 'rb') as f:
+        return zlib.crc32(f.read())
+
+
+def _efficiency_curve(energies_kev: np.ndarray, key: int) -> np.ndarray:
+    """typical full energy peak efficiency shape, scale depends on input file content"""
+    scale = 0.01 * (0.5 + (key % 1000) / 1000)
+    e = np.asarray(energies_kev, dtype=np.float64)
+    return scale * (e / 100) ** -0.8 * (1 - np.exp(-(e / 40) ** 3))
+
+
+def _parse_cm(value: tp.Optional[str]) -> tp.Optional[float]:
+    return float(value.split()[0]) if value else None
+
+
+def _geometry_efficiency_curve(energies_kev: np.ndarray, input_filename: str
+                               ) -> tp.Optional[np.ndarray]:
+    """
+    efficiency of point source on detector axis: solid angle of crystal front,
+        attenuation in front dead layer and absorption in crystal height,
+        None if in-file has no crystal sizes
+    """
+    if not input_filename.endswith('.in'):
+        return None
+    params = ConfigFileParser(input_filename).get_dict()
+    prefix = 'DC_' if 'DC_CrystalDiameter' in params else 'DS_'
+    diameter = _parse_cm(params.get(f'{prefix}CrystalDiameter'))
+    height = _parse_cm(params.get(f'{prefix}CrystalHeight'))
+    if diameter is None or height is None:
+        return None
+    dead_layer = _parse_cm(params.get(f'{prefix}CrystalFrontDeadLayer')) or 0.0
+    distance = (_parse_cm(params.get('pdistance')) or 10.0) + dead_layer
+    e = np.asarray(energies_kev, dtype=np.float64) / 100
+    solid_angle = 0.5 * (1 - distance / math.hypot(distance, diameter / 2 - dead_layer))
+    mu_crystal = 0.6 * e ** -1.5 + 0.35 * e ** -0.35
+    mu_dead_layer = 3.0 * e ** -2.5
+    photo_fraction = 1 / (1 + 0.3 * e / math.sqrt(diameter * height))
+    return solid_angle * np.exp(-mu_dead_layer * dead_layer) * photo_fraction \
+        * (1 - np.exp(-mu_crystal * (height - dead_layer)))
+
+
+def _monte_carlo_noise(efficiency: np.ndarray, histories: int, seed: int, key: int
+                       ) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """efficiency with noise and relative uncertainty for histories"""
+    rel = 1 / np.sqrt(np.maximum(histories * efficiency, 1.0))
+    rng = np.random.default_rng([seed, key, histories])
+    return efficiency * (1 + rel * rng.standard_normal(len(efficiency))), rel
+
+
+def _spectrum(energies_kev: np.ndarray, areas: np.ndarray, channels: int = SPECTRUM_CHANNELS,
+              emax_kev: float = SPECTRUM_EMAX_KEV) -> np.ndarray:
+    """gaussian peaks and flat compton continuum below every peak"""
+    x = (np.arange(channels) + 0.5) * emax_kev / channels
+    sigma = RESOLUTION_FWHM_KEV / 2.355
+    spectrum = np.zeros(channels)
+    for e, area in zip(energies_kev, areas):
+        peak = np.exp(-0.5 * ((x - e) / sigma) ** 2)
+        spectrum += area * peak / max(peak.sum(), 1e-300)
+        spectrum += np.where(x < e, 2 * area / channels, 0.0)
+    return spectrum
+
+
+def _write_spe(filename: str, counts: np.ndarray, tlive: float) -> None:
+    header = ["SHIFR=fake tccfcalc", f"TLIVE={tlive}", f"TREAL={tlive}",
+              "MEASBEGIN=01.01.2000 00:00:00"]
+    with open(filename, 'wb') as f:
+        f.write(''.join(line + '\r\n' for line in header).encode('cp1251'))
+        f.write(b'SPECTR=')
+        f.write(np.asarray(counts, dtype=np.int32).tobytes())
+
+
+class FakeTccFcalcDllWrapper:
+    """TccFcalcDllWrapper stand-in, writes tccfcalc.out after every calculation"""
+    def __init__(self, history_cost: float = 0.0):
+        self.history_cost = history_cost
+        self._input_filename = ""
+        self._key = 0
+        self._seed = 0
+        self._histories = 0
+        self._cur_path = ""
+        self._curve: tp.Optional[np.ndarray] = None
+
+    def _prepare(self, input_filename: str, seed: int) -> int:
+        if not os.path.exists(input_filename):
+            return 5  # TCCFCALC.IN file not found
+        self._input_filename = input_filename
+        self._key = _file_key(input_filename)
+        self._curve = _geometry_efficiency_curve(np.array(TCCFCALC_ENERGIES), input_filename)
+        self._seed = seed
+        self._histories = 0
+        self._cur_path = os.path.dirname(input_filename)
+        return 0
+
+    def tccfcalc_prepare(self, a: int, z: int, m, cur_path: str, library_path: str,
+                         seed: int = 0) -> int:
+        error_num = self._prepare(os.path.join(cur_path, 'tccfcalc.in'), seed)
+        self._key = zlib.crc32(bytes(f'{self._key},{a},{z},{m}', 'utf-8'))
+        return error_num
+
+    def tccfcalc_prepare_json(self, input_filename: str, seed: int) -> int:
+        return self._prepare(input_filename, seed)
+
+    def tccfcalc_calculate(self, histories: int) -> None:
+        spend_cpu_time(histories * self.history_cost)
+        self._histories += histories
+        self._save_out()
+
+    def tccfcalc_reset(self) -> None:
+        self._histories = 0
+
+    def _efficiency(self) -> tp.Tuple[np.ndarray, np.ndarray]:
+        if self._curve is None:
+            curve = _efficiency_curve(np.array(TCCFCALC_ENERGIES), self._key)
+            return _monte_carlo_noise(curve, self._histories, self._seed, self._key)
+        # fixed seed gives the same random numbers for all geometries, like real Monte-Carlo
+        key = 0 if self._seed else self._key
+        return _monte_carlo_noise(self._curve, self._histories, self._seed, key)
+
+    def _save_out(self) -> None:
+        eff, rel = self._efficiency()
+        with open(os.path.join(self._cur_path, TCCFCALC_OUT_FILENAME), 'w') as f:
+            f.write('TCCFCALC (fake library)\n')
+            f.write(f'Input: {self._input_filename}\n')
+            f.write(f'Histories: {self._histories}\n')
+            f.write(f'Seed: {self._seed}\n\n')
+            f.write('Results:\n\n')
+            f.write('Energy\tEff\tdEff(%)\n')
+            f.write('=' * 40 + '\n')
+            for e, v, dv in zip(TCCFCALC_ENERGIES, eff, rel):
+                f.write(f'{e}\t{v:.6e}\t{100 * dv:.3f}\n')
+            f.write('-' * 40 + '\n')
+
+    def _save_spectrum(self, activity: float, time_sec: float) -> int:
+        if not self._histories:
+            return 1
+        eff, _ = self._efficiency()
+        counts = _spectrum(np.array(TCCFCALC_ENERGIES), eff * activity * time_sec)
+        rng = np.random.default_rng([self._seed, self._key])
+        _write_spe(os.path.join(self._cur_path, TCCFCALC_SPECTRUM_FILENAME),
+                   rng.poisson(counts), time_sec)
+        return 0
+
+    def tccfcalc_calc_spectrum_file(self, analyzer_filename: str, activity: float) -> int:
+        return self._save_spectrum(activity, 1000.0)
+
+    def tccfcalc_calculate_spectrum(self, activity: float) -> int:
+        return self._save_spectrum(activity, 1000.0)
+
+    def tccfcalc_calc_spectrum_n_sec(self, time_sec: int, activity: float) -> int:
+        return self._save_spectrum(activity, time_sec)
+
+    def tccfcalc_reset_spectrum(self) -> None:
+        pass
+
+
+def _get_source_lines(data: tp.Dict[str, tp.Any]) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """energies (MeV) and intensities of all cells with radioactive source"""
+    lines = [line for cell in data["ContainerSource"]["Cells"]
+             for line in cell.get("RadioactiveSource") or []]
+    return (np.array([line["E"] for line in lines], dtype=np.float64),
+            np.array([line["I"] for line in lines], dtype=np.float64))
+
+
+class FakePhysspecDllWrapper:
+    """PhysspecDllWrapper stand-in, histories are accumulated until reset"""
+    def __init__(self, history_cost: float = 0.0):
+        self.history_cost = history_cost
+        self._key = 0
+        self._seed = 0
+        self._histories = 0
+        self._energies = np.zeros(0)
+        self._intensities = np.zeros(0)
+        self._continuum_energies = np.zeros(0)
+        self._results: tp.Optional[PhysspecResults] = None
+        self._c_results: tp.Optional[CalculationResults] = None
+
+    def physspec_prepare(self, input_filename: str, seed: int) -> int:
+        try:
+            with open(input_filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 15  # Bad input json file
+        try:
+            self._energies, self._intensities = _get_source_lines(data)
+            params = data.get("CalculationParameters", {})
+            emax = params.get("phys_spectrum_Emax", 3.0)
+            de = params.get("phys_spectrum_dE", 0.01)
+        except (KeyError, TypeError):
+            return 16  # Error while parsing input json file
+        self._continuum_energies = np.arange(de, emax + de / 2, de)
+        self._key = _file_key(input_filename)
+        self._seed = seed
+        self._histories = 0
+        return 0
+
+    def _calculate_results(self) -> PhysspecResults:
+        eff = _efficiency_curve(self._energies * 1000, self._key)
+        eff, rel = _monte_carlo_noise(eff, self._histories, self._seed, self._key)
+        areas = self._intensities * eff
+        continuum = _spectrum(self._energies * 1000, areas, len(self._continuum_energies),
+                              self._continuum_energies[-1] * 1000 if len(self._continuum_energies)
+                              else SPECTRUM_EMAX_KEV)
+        fcol = float(continuum.sum())
+        return PhysspecResults(
+            y0=self._intensities.copy(), x1=self._energies.copy(), y1=areas, dy1=areas * rel,
+            x2=self._continuum_energies.copy(), y2=continuum,
+            fcol=fcol, dfcol=fcol / math.sqrt(max(self._histories, 1)))
+
+    def physspec_calculate(self, histories: int, calculate_results: bool):
+        spend_cpu_time(histories * self.history_cost)
+        self._histories += histories
+        if not calculate_results:
+            return POINTER(CalculationResults)()
+        self._results = self._calculate_results()
+        r = self._results
+        # arrays are kept by self._results, like library keeps its memory
+        self._c_results = CalculationResults(
+            len(r.x1), np.ctypeslib.as_ctypes(r.y0), np.ctypeslib.as_ctypes(r.x1),
+            np.ctypeslib.as_ctypes(r.y1), np.ctypeslib.as_ctypes(r.dy1), len(r.x2),
+            np.ctypeslib.as_ctypes(r.x2), np.ctypeslib.as_ctypes(r.y2), r.fcol, r.dfcol)
+        return pointer(self._c_results)
+
+    def physspec_calculate_arrays(self, histories: int) -> PhysspecResults:
+        res = self.physspec_calculate(histories, True)
+        return PhysspecResults.create_from_ct(res.contents)
+
+    def physspec_reset(self) -> None:
+        self._histories = 0
+
+    def physspec_save_json(self, output_filename: str) -> None:
+        r = self._results or self._calculate_results()
+        eff = np.divide(r.y1, r.y0, out=np.zeros_like(r.y1), where=r.y0 > 0)
+        calculation_time = self._histories / max(float(r.y0.sum()), 1e-300)
+        data = {
+            "CalculationResults": {
+                "npeaks": len(r.x1), "y0": r.y0.tolist(), "x1": r.x1.tolist(),
+                "y1": r.y1.tolist(), "dy1": r.dy1.tolist(),
+                "nchannels": len(r.x2), "x2": r.x2.tolist(), "y2": r.y2.tolist(),
+                "fcol": r.fcol, "dfcol": r.dfcol,
+                "func": float(r.y1.sum()), "dfunc": float(np.sqrt((r.dy1 ** 2).sum())),
+                "calculation_time": calculation_time,
+            },
+            "StraightCalculationResults": {
+                "Peaks": {
+                    "energy": r.x1.tolist(), "intensity": r.y0.tolist(),
+                    "count_rate": r.y1.tolist(), "efficiency": eff.tolist(),
+                    "defficiency": np.divide(eff * r.dy1, r.y1, out=np.zeros_like(eff),
+                                             where=r.y1 > 0).tolist(),
+                },
+            },
+        }
+        with open(output_filename, 'w') as f:
+            json.dump(data, f)
+
+
+class FakeAppspecDllWrapper:
+    """AppspecDllWrapper stand-in: efficiency = count rate * normalized fep / intensity"""
+    def __init__(self):
+        self._efficiency_grid: tp.Tuple[np.ndarray, ...] = ()
+        self._is_log = False
+
+    def prepare_efficiency_calculation(self, energy_array: tp.Sequence[float],
+                                       nfep_array: tp.Sequence[float],
+                                       dfep_array: tp.Sequence[float],
+                                       is_log: bool) -> None:
+        e = np.asarray(energy_array, dtype=np.float64)
+        nfep = np.asarray(nfep_array, dtype=np.float64)
+        dfep = np.asarray(dfep_array, dtype=np.float64)
+        assert len(e) == len(nfep) == len(dfep), "arrays must have same lengths"
+        self._efficiency_grid = (e, nfep, dfep)
+        self._is_log = is_log
+
+    def _interpolate(self, energies: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+        e, nfep, dfep = self._efficiency_grid
+        if self._is_log:
+            x, xs = np.log(e), np.log(np.maximum(energies, 1e-300))
+            nfeps = np.exp(np.interp(xs, x, np.log(np.maximum(nfep, 1e-300))))
+        else:
+            xs, x = energies, e
+            nfeps = np.interp(xs, x, nfep)
+        return nfeps, np.interp(xs, x, dfep)
+
+    def calculate_efficiency_batch(self, energies: tp.Sequence[float],
+                                   peak_count_rates: tp.Sequence[float],
+                                   dpeak_count_rates: tp.Sequence[float],
+                                   peak_intensities: tp.Sequence[float]
+                                   ) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        e = np.asarray(energies, dtype=np.float64)
+        cr = np.asarray(peak_count_rates, dtype=np.float64)
+        dcr = np.asarray(dpeak_count_rates, dtype=np.float64)
+        intensity = np.asarray(peak_intensities, dtype=np.float64)
+        assert len(e) == len(cr) == len(dcr) == len(intensity), "arrays must have same lengths"
+        if not self._efficiency_grid:
+            return np.full(len(e), -1.0), np.full(len(e), -1.0), np.ones(len(e), dtype=np.int32)
+        nfep, dfep = self._interpolate(e)
+        is_valid = (intensity > 0) & (cr > 0)
+        efficiencies = np.where(is_valid, cr * nfep / np.where(is_valid, intensity, 1), -1.0)
+        rel = np.sqrt((dcr / np.where(is_valid, cr, 1)) ** 2 + (dfep / 100) ** 2)
+        defficiencies = np.where(is_valid, efficiencies * rel, -1.0)
+        return efficiencies, defficiencies, np.where(is_valid, 0, 1).astype(np.int32)
+
+    def calculate_efficiency(self, energy: float, peak_count_rate: float, dpeak_count_rate: float,
+                             peak_intensity: float) -> tp.Tuple[float, float, int]:
+        eff, deff, error_num = self.calculate_efficiency_batch(
+            [energy], [peak_count_rate], [dpeak_count_rate], [peak_intensity])
+        return float(eff[0]), float(deff[0]), int(error_num[0])
+
+    def reset_efficiency_calculation(self) -> None:
+        self._efficiency_grid = ()
+
+    def calculate_efficiency_json(self, input_filename: str, output_filename: str,
+                                  is_log: bool) -> int:
+        try:
+            with open(input_filename) as f:
+                data = json.load(f)
+            response = data["DetectorResponse"]
+            physspec = data["PhysSpec"]
+        except (OSError, ValueError, KeyError):
+            return 1
+        if isinstance(response, dict):  # spectrum calculation input
+            response = response["Response"]
+        self.prepare_efficiency_calculation([r["Energy"] for r in response],
+                                            [r["normalized_fep"] for r in response],
+                                            [r["dfep"] for r in response], is_log)
+        energies = physspec["PeaksEnergy"]
+        eff, deff, _ = self.calculate_efficiency_batch(
+            energies, physspec["PeaksArea"], physspec["PeaksdArea"], physspec["PeaksIntensity"])
+        with open(output_filename, 'w') as f:
+            f.write('\t'.join(["energy", "efficiency", "defficiency", "intensity",
+                               "count_rate"]) + '\n')
+            for row in zip(energies, eff, deff, physspec["PeaksIntensity"], physspec["PeaksArea"]):
+                f.write('\t'.join(str(v) for v in row) + '\n')
+        self.reset_efficiency_calculation()
+        return 0
+
+    def calc_apparatus_spectrum(self, input_filename: str) -> int:
+        """writes count rates spectrum to appspec_output.bin in current directory"""
+        try:
+            with open(input_filename) as f:
+                physspec = json.load(f)["PhysSpec"]
+        except (OSError, ValueError, KeyError):
+            return 1
+        spectrum = _spectrum(np.array(physspec["PeaksEnergy"]) * 1000,
+                             np.array(physspec["PeaksArea"]))
+        with open(APPSPEC_OUTPUT_BIN_FILENAME, 'wb') as f:
+            f.write(struct.pack('i', len(spectrum)))
+            f.write(spectrum.astype(np.float64).tobytes())
+        return 0
+
+    def make_apparatus_spectrum(self, input_filename: str, output_filename: str) -> int:
+        """writes spectrum for physspec output json-file to json: ApparatusSpectrum"""
+        try:
+            with open(input_filename) as f:
+                data = json.load(f)["CalculationResults"]
+        except (OSError, ValueError, KeyError):
+            return 1
+        live_time = data.get("calculation_time", 1.0)
+        spectrum = _spectrum(np.array(data["x1"]) * 1000, np.array(data["y1"]) * live_time)
+        with open(output_filename, 'w') as f:
+            json.dump({"ApparatusSpectrum": {"live_time": live_time,
+                                             "data": np.rint(spectrum).astype(int).tolist()}}, f)
+        return 0
@@ -0,0 +1,51 @@
+"""
+    Calculation libraries wrappers factory: wrappers of real libraries (from current directory)
+    or their python stand-ins from fake_libs.py, if LSRM_FAKE_LIBS environment variable is set
+    (run.py --fake-libs). Settings are in environment, so worker processes inherit them.
+"""
+import os
+import typing as tp
+
+from .appspec_wrapper import AppspecDllWrapper
+from .physspec_wrapper import PhysspecDllWrapper
+from .tccfcalc_wrapper import TccFcalcDllWrapper
+
+
+FAKE_LIBS_ENV = "LSRM_FAKE_LIBS"
+# cpu seconds per one Monte-Carlo history in fake libraries
+FAKE_HISTORY_COST_ENV = "LSRM_FAKE_HISTORY_COST"
+DEFAULT_FAKE_HISTORY_COST = 1e-6
+
+
+def enable_fake_libs(history_cost: float = DEFAULT_FAKE_HISTORY_COST) -> None:
+    os.environ[FAKE_LIBS_ENV] = "1"
+    os.environ[FAKE_HISTORY_COST_ENV] = str(history_cost)
+
+
+def is_fake_libs_enabled() -> bool:
+    return os.environ.get(FAKE_LIBS_ENV, "") not in ("", "0")
+
+
+def get_fake_history_cost() -> float:
+    return float(os.environ.get(FAKE_HISTORY_COST_ENV, DEFAULT_FAKE_HISTORY_COST))
+
+
+def create_tccfcalc_wrapper(path_to_dll: tp.Optional[str] = None):
+    if is_fake_libs_enabled():
+        from .fake_libs import FakeTccFcalcDllWrapper
+        return FakeTccFcalcDllWrapper(get_fake_history_cost())
+    return TccFcalcDllWrapper(path_to_dll)
+
+
+def create_physspec_wrapper():
+    if is_fake_libs_enabled():
+        from .fake_libs import FakePhysspecDllWrapper
+        return FakePhysspecDllWrapper(get_fake_history_cost())
+    return PhysspecDllWrapper()
+
+
+def create_appspec_wrapper():
+    if is_fake_libs_enabled():
+        from .fake_libs import FakeAppspecDllWrapper
+        return FakeAppspecDllWrapper()
+    return AppspecDllWrapper()
@@ -0,0 +1,155 @@
+"""
+    Throughput metrics of Monte-Carlo calculations, which are run by batches of histories:
+    histories per second, elapsed time and ETA for every batch, batch latency histogram.
+    Records are logged, written to JSON lines file (if set) and passed to the graph profiler
+    (if it's set by run.py --profile).
+"""
+import bisect
+import contextlib
+import json
+import logging
+import math
+import time
+import typing as tp
+
+from ..common_code.profiler import get_profiler
+
+
+# batch latency histogram bins upper bounds, seconds (the last bin is for slower batches)
+LATENCY_BINS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0,
+                20.0, 50.0, 100.0]
+
+
+def split_to_batches(histories: int, batch_size: int) -> tp.List[int]:
+    """histories in every batch, the last batch can be smaller, batch_size <= 0 -- one batch"""
+    if batch_size <= 0 or batch_size >= histories:
+        return [histories]
+    batches = [batch_size] * (histories // batch_size)
+    if histories % batch_size:
+        batches.append(histories % batch_size)
+    return batches
+
+
+class JsonLinesSink:
+    """appends metrics records to json lines file, one record per line"""
+    def __init__(self, filename: str):
+        self._file = open(filename, 'a')
+
+    def write(self, record: tp.Dict[str, tp.Any]) -> None:
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _finite_or_none(value: float) -> tp.Optional[float]:
+    """json has no infinity"""
+    return value if math.isfinite(value) else None
+
+
+def _format_seconds(seconds: float) -> str:
+    if math.isinf(seconds):
+        return '?'
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+
+class ThroughputMeter:
+    """
+    ThroughputMeter measures batches of Monte-Carlo histories:
+        meter = ThroughputMeter('physspec', total_histories)
+        for batch in split_to_batches(total_histories, batch_size):
+            with meter.measure_batch(batch):
+                lib.calculate(batch)
+        meter.finish()
+    Every batch is logged with level=logging.DEBUG, summary -- with logging.INFO
+    """
+    def __init__(self, name: str, total_histories: int, sink: tp.Optional[JsonLinesSink] = None):
+        self.name = name
+        self.total_histories = total_histories
+        self.sink = sink
+        self.histories = 0
+        self.latencies: tp.List[float] = []
+        self._start = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    @contextlib.contextmanager
+    def measure_batch(self, histories: int):
+        start = time.perf_counter()
+        yield
+        self.add_batch(histories, time.perf_counter() - start)
+
+    def add_batch(self, histories: int, seconds: float) -> tp.Dict[str, tp.Any]:
+        self.histories += histories
+        self.latencies.append(seconds)
+        elapsed = self.elapsed
+        rate = self.histories / elapsed if elapsed > 0 else math.inf
+        eta = (self.total_histories - self.histories) / rate if rate > 0 else math.inf
+        record = {
+            "type": "batch", "name": self.name, "batch": len(self.latencies),
+            "histories": histories, "done": self.histories, "total": self.total_histories,
+            "seconds": seconds, "batch_rate": histories / seconds if seconds > 0 else None,
+            "elapsed": elapsed, "rate": _finite_or_none(rate), "eta": _finite_or_none(eta),
+        }
+        logging.debug(f'{self.name}: {self.histories}/{self.total_histories} '
+                      f'({100 * self.histories / self.total_histories:.0f}%), '
+                      f'{rate:.0f} histories/s, elapsed {_format_seconds(elapsed)}, '
+                      f'eta {_format_seconds(eta)}')
+        self._emit(record)
+        return record
+
+    def histogram(self) -> tp.List[int]:
+        """batches count for every LATENCY_BINS bin and one more bin for slower batches"""
+        counts = [0] * (len(LATENCY_BINS) + 1)
+        for latency in self.latencies:
+            counts[bisect.bisect_left(LATENCY_BINS, latency)] += 1
+        return counts
+
+    def summary(self) -> tp.Dict[str, tp.Any]:
+        elapsed = self.elapsed
+        latencies = sorted(self.latencies) or [0.0]
+        return {
+            "type": "summary", "name": self.name, "batches": len(self.latencies),
+            "histories": self.histories, "total": self.total_histories, "elapsed": elapsed,
+            "rate": self.histories / elapsed if elapsed > 0 else None,
+            "latency_min": latencies[0], "latency_max": latencies[-1],
+            "latency_mean": sum(latencies) / len(latencies),
+            "latency_p50": latencies[(len(latencies) - 1) // 2],
+            "latency_p95": latencies[int(0.95 * (len(latencies) - 1))],
+            "latency_bins": LATENCY_BINS, "latency_histogram": self.histogram(),
+        }
+
+    def finish(self) -> tp.Dict[str, tp.Any]:
+        record = self.summary()
+        logging.info(f'{self.name}: {record["histories"]} histories in {record["batches"]} '
+                     f'batches, {_format_seconds(record["elapsed"])}, '
+                     f'{record["rate"] or 0:.0f} histories/s, '
+                     f'batch latency mean={record["latency_mean"]:.3f} s '
+                     f'p95={record["latency_p95"]:.3f} s')
+        self._emit(record)
+        return record
+
+    def _emit(self, record: tp.Dict[str, tp.Any]) -> None:
+        if self.sink is not None:
+            self.sink.write(record)
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.add_metrics(record)
+
+
+@contextlib.contextmanager
+def open_sink(metrics_filename: str = ""):
+    """json lines sink for metrics_filename, None if filename is empty"""
+    if not metrics_filename:
+        yield None
+        return
+    sink = JsonLinesSink(metrics_filename)
+    try:
+        yield sink
+    finally:
+        sink.close()
@@ -4,13 +4,24 @@ import logging
 import os.path
 import sys
 
-from .physspec_wrapper import PhysspecDllWrapper, PREPARE_ERROR_CODES
+from .mc_metrics import ThroughputMeter, open_sink, split_to_batches
+from .lib_factory import create_physspec_wrapper
+from .physspec_wrapper import PhysspecResults, PREPARE_ERROR_CODES
 
 
-def calc_physspec(seed, histories):
+def calc_physspec(seed, histories, save_json: bool = True, batch_size: int = 0,
+                  metrics_filename: str = "") -> PhysspecResults:
+    """
+    calc_physspec runs physspec for physspec_input.json in current directory,
+        saves results to physspec_output.json (if save_json is set) and returns them as arrays.
+    Histories are run by batches (batch_size <= 0 -- one batch, default), results are calculated
+        after the last one, throughput of every batch is logged and sent to metrics.
+    Batches rely on accumulation of histories between PhysSpec_Calculate calls,
+        check it with your library version before use
+    """
     # load lib and prepare
     cur_path = os.getcwd()
-    lib = PhysspecDllWrapper()
+    lib = create_physspec_wrapper()
     input_filename = os.path.join(cur_path, 'physspec_input.json')
     error_num = lib.physspec_prepare(input_filename, seed)
     if error_num:
@@ -22,17 +33,25 @@ def calc_physspec(seed, histories):
     # calculate
     N = histories * 1000
     logging.info(f'Starting calculation with N={N} and seed={seed}')
-    _ = lib.physspec_calculate(N, True)
-    # if res != 0:
-    #     logging.error(f'Calculation error #{res}')
-    #     return
+    batches = split_to_batches(N, batch_size)
+    with open_sink(metrics_filename) as sink:
+        meter = ThroughputMeter('physspec', N, sink)
+        for batch in batches[:-1]:
+            with meter.measure_batch(batch):
+                lib.physspec_calculate(batch, False)
+        with meter.measure_batch(batches[-1]):
+            # arrays point to the library memory, copy them before the library is released
+            results = lib.physspec_calculate_arrays(batches[-1]).copy()
+        meter.finish()
 
     # save results
-    output_filename = os.path.join(cur_path, 'physspec_output.json')
-    lib.physspec_save_json(output_filename)
+    if save_json:
+        output_filename = os.path.join(cur_path, 'physspec_output.json')
+        lib.physspec_save_json(output_filename)
 
     del lib
     logging.info('done')
+    return results
 
 
 def _pretty_output_json(filename):
@@ -50,6 +69,11 @@ if __name__ == '__main__':
                         default=1)
     parser.add_argument('-s', '--seed', help='seed for random generator, default=0 <- random seed',
                         type=int, default=0)
+    parser.add_argument('-b', '--batch_size',
+                        help='histories in one library call, default=0 <- one call',
+                        type=int, default=0)
+    parser.add_argument('--metrics', help='json lines file for batches throughput metrics',
+                        default='')
     parser.add_argument('-v', '--verbose', help='verbose mode', action="store_true", default=False)
     parser.add_argument('--pretty', help='pretty json output file', action="store_true")
 
@@ -62,7 +86,8 @@ if __name__ == '__main__':
         stream=sys.stderr,
     )
 
-    calc_physspec(args.seed, args.histories)
+    calc_physspec(args.seed, args.histories, batch_size=args.batch_size,
+                  metrics_filename=args.metrics)
 
     if args.pretty:
         _pretty_output_json('physspec_output.json')
@@ -3,6 +3,9 @@ import sys
 import typing as tp
 from ctypes import CDLL, RTLD_GLOBAL, POINTER, Structure, \
     c_int, c_bool, c_double, c_char_p
+from dataclasses import dataclass
+
+import numpy as np
 
 
 PREPARE_ERROR_CODES = [
@@ -41,6 +44,61 @@ class CalculationResults(Structure):
     ]
 
 
+def _as_array(ptr, size: int) -> np.ndarray:
+    if size <= 0 or not ptr:
+        return np.zeros(0)
+    return np.ctypeslib.as_array(ptr, shape=(size,))
+
+
+@dataclass
+class PhysspecResults:
+    """
+    PhysspecResults -- physspec calculation results (CalculationResults) as numpy arrays:
+        y0 -- peaks intensities, x1 -- peaks energies, y1, dy1 -- peaks areas and uncertainties,
+        x2, y2 -- continuum energies and counts, fcol, dfcol -- collided flux,
+        func, dfunc -- uncollided flux, it is absent in CalculationResults, so it is read from
+        physspec json output, when appspec input needs it (None before)
+    Arrays created by PhysspecDllWrapper are views to the library memory (zero-copy),
+    they are valid until the next calculation or reset, use copy() to keep them longer.
+    """
+    y0: np.ndarray
+    x1: np.ndarray
+    y1: np.ndarray
+    dy1: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    fcol: float
+    dfcol: float
+    func: tp.Optional[float] = None
+    dfunc: tp.Optional[float] = None
+
+    @property
+    def npeaks(self) -> int:
+        return len(self.x1)
+
+    @property
+    def nchannels(self) -> int:
+        return len(self.x2)
+
+    @staticmethod
+    def create_from_ct(ct_res: CalculationResults) -> "PhysspecResults":
+        return PhysspecResults(
+            y0=_as_array(ct_res.y0, ct_res.npeaks),
+            x1=_as_array(ct_res.x1, ct_res.npeaks),
+            y1=_as_array(ct_res.y1, ct_res.npeaks),
+            dy1=_as_array(ct_res.dy1, ct_res.npeaks),
+            x2=_as_array(ct_res.x2, ct_res.nchannels),
+            y2=_as_array(ct_res.y2, ct_res.nchannels),
+            fcol=float(ct_res.fcol),
+            dfcol=float(ct_res.dfcol),
+        )
+
+    def copy(self) -> "PhysspecResults":
+        return PhysspecResults(
+            self.y0.copy(), self.x1.copy(), self.y1.copy(), self.dy1.copy(),
+            self.x2.copy(), self.y2.copy(), self.fcol, self.dfcol, self.func, self.dfunc)
+
+
 def _get_attribute(lib, attributes: tp.List[str]):
     """
         tries to get exported attribute from attributes list
@@ -91,6 +149,13 @@ class PhysspecDllWrapper:
     def physspec_calculate(self, histories: int, calculate_results: bool) -> CalculationResults:
         return self._physspec_calculate(histories, calculate_results)
 
+    def physspec_calculate_arrays(self, histories: int) -> PhysspecResults:
+        """calculates and returns results as zero-copy views to the library memory"""
+        res = self._physspec_calculate(histories, True)
+        if not res:
+            raise RuntimeError("physspec calculation returned no results")
+        return PhysspecResults.create_from_ct(res.contents)
+
     def physspec_reset(self) -> None:
         self._physspec_reset()
 
@@ -0,0 +1,140 @@
+"""
+    Runs tccfcalc for many in-files, e.g. for parameters sweeps. tccfcalc reads tccfcalc.in
+    and Lib from the current directory and writes tccfcalc.out there, so every calculation
+    runs in its own temporary directory and calculations can run in worker processes.
+    Results are cached by in-file content, nuclide, histories and seed: a point,
+    which is already calculated, is read from the cache directory.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ..lsrm_parsers.out_file_parser import parse_out_file_col_format
+from .effcalc import calculate_batches
+from .lib_factory import create_tccfcalc_wrapper
+from .nuclide import Nuclide
+from .tccfcalc_wrapper import get_prepare_error_message
+
+
+TCCFCALC_IN_FILENAME = "tccfcalc.in"
+TCCFCALC_OUT_FILENAME = "tccfcalc.out"
+LIB_DIRNAME = "Lib"
+
+
+class TccfcalcTask(tp.NamedTuple):
+    in_text: str  # content of tccfcalc.in: detector, source and calculation parameters
+    histories: int  # in thousands
+    seed: int  # seed for random generator, tasks with the same seed use the same random numbers
+    nuclide: Nuclide = Nuclide.get_default()
+
+
+class TccfcalcResult(tp.NamedTuple):
+    energies: np.ndarray
+    efficiencies: np.ndarray
+    rel_errors: np.ndarray  # relative uncertainties of efficiencies
+
+    @staticmethod
+    def parse_from_out(filename: str) -> 'TccfcalcResult':
+        data = parse_out_file_col_format(filename)
+        return TccfcalcResult(np.array(data["Energy"]), np.array(data["Eff"]),
+                              np.array(data["dEff(%)"]) / 100)
+
+
+def get_task_key(task: TccfcalcTask) -> str:
+    key = f'{task.nuclide.z},{task.nuclide.a},{task.nuclide.m};{task.histories};{task.seed};'
+    return hashlib.sha1(bytes(key + task.in_text, 'utf-8')).hexdigest()
+
+
+def _link_lib(lib_dir: str, work_dir: str) -> None:
+    source = os.path.join(lib_dir, LIB_DIRNAME)
+    if not os.path.isdir(source):
+        return
+    target = os.path.join(work_dir, LIB_DIRNAME)
+    try:
+        os.symlink(source, target, target_is_directory=True)
+    except OSError:
+        # no symlinks privileges on windows
+        shutil.copytree(source, target)
+
+
+def _run_task(task: TccfcalcTask, lib_dir: str, work_root: str, batch_size: int,
+              output_filename: str) -> None:
+    work_dir = tempfile.mkdtemp(prefix="tccfcalc_", dir=work_root)
+    cur_dir = os.getcwd()
+    try:
+        with open(os.path.join(work_dir, TCCFCALC_IN_FILENAME), 'w') as f:
+            f.write(task.in_text)
+        _link_lib(lib_dir, work_dir)
+        os.chdir(work_dir)
+        lib = create_tccfcalc_wrapper(lib_dir)
+        nuclide = task.nuclide
+        error_num = lib.tccfcalc_prepare(nuclide.a, nuclide.z, nuclide.m, work_dir,
+                                         os.path.join(work_dir, LIB_DIRNAME), task.seed)
+        if error_num:
+            raise RuntimeError(f'tccfcalc prepare error #{error_num}: '
+                               f'{get_prepare_error_message(error_num)}')
+        calculate_batches(lib, task.histories * 1000, batch_size, "")
+        del lib
+        # out-file appears in cache, when calculation is done, so broken runs are not cached
+        shutil.copy(os.path.join(work_dir, TCCFCALC_OUT_FILENAME), output_filename + '.tmp')
+        os.replace(output_filename + '.tmp', output_filename)
+    finally:
+        os.chdir(cur_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_tasks(args) -> None:
+    """worker task"""
+    tasks, lib_dir, work_root, batch_size, output_filenames = args
+    for task, output_filename in zip(tasks, output_filenames):
+        _run_task(task, lib_dir, work_root, batch_size, output_filename)
+
+
+class TccfcalcRunner:
+    """
+    TccfcalcRunner runs tccfcalc tasks in worker processes and caches results
+        - lib_dir: directory with tccfcalc library and Lib (default: current directory)
+        - cache_dir: directory for out-files of calculated tasks, "" -- no cache
+        - workers: number of worker processes, 1 -- run in this process
+        - batch_size: histories in one library call
+    """
+    def __init__(self, lib_dir: str = "", cache_dir: str = "", workers: int = 1,
+                 batch_size: int = 1000):
+        self.lib_dir = os.path.abspath(lib_dir or os.getcwd())
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else ""
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cache_hits = 0
+
+    def _get_out_filename(self, out_dir: str, task: TccfcalcTask) -> str:
+        return os.path.join(out_dir, f'{get_task_key(task)}.out')
+
+    def run(self, tasks: tp.List[TccfcalcTask]) -> tp.List[TccfcalcResult]:
+        out_dir = self.cache_dir or tempfile.mkdtemp(prefix="tccfcalc_out_")
+        os.makedirs(out_dir, exist_ok=True)
+        try:
+            out_filenames = [self._get_out_filename(out_dir, task) for task in tasks]
+            # the same task can be in the list several times
+            todo = {f: task for f, task in zip(out_filenames, tasks) if not os.path.exists(f)}
+            self.cache_hits = len(set(out_filenames)) - len(todo)
+            self._run_missing(list(todo.values()), list(todo.keys()), out_dir)
+            return [TccfcalcResult.parse_from_out(f) for f in out_filenames]
+        finally:
+            if not self.cache_dir:
+                shutil.rmtree(out_dir, ignore_errors=True)
+
+    def _run_missing(self, tasks: tp.List[TccfcalcTask], out_filenames: tp.List[str],
+                     work_root: str) -> None:
+        if self.workers > 1 and len(tasks) > 1:
+            n = min(self.workers, len(tasks))
+            args = [(tasks[i::n], self.lib_dir, work_root, self.batch_size, out_filenames[i::n])
+                    for i in range(n)]
+            with ProcessPoolExecutor(max_workers=n) as pool:
+                list(pool.map(_run_tasks, args))
+        else:
+            _run_tasks((tasks, self.lib_dir, work_root, self.batch_size, out_filenames))
@@ -3,6 +3,7 @@ import shutil
 import typing as tp
 
 from operations.operation_registry import register_operation
+from .common_code.physspec_results_store import discard_results, put_results
 from .mcmodules_wrappers.physspec import calc_physspec
 
 
@@ -10,12 +11,31 @@ from .mcmodules_wrappers.physspec import calc_physspec
 class PhysspecOperation:
     """
     PhysspecOperation calculates physical spectrum using physspec.dll (physspec.so)
+    parameters:
+        - input_filename: physspec input json-file
+        - output_filename: physspec output json-file
+        - histories: number of histories
+        - seed: random generator seed
+        - batch_size: histories in one library call, progress and throughput are logged
+            for every batch (default: 0 -- all histories in one call),
+            batches need accumulation of histories between library calls
+        - metrics_filename: json lines file, batches throughput metrics are appended to (optional)
+        - save_json: save results to output_filename (default: true)
+        - keep_in_memory: keep results in memory by output_filename, so appspec input operations
+            take them without parsing of json output (default: false).
+            It needs save_json: uncollided flux is absent in calculation results, appspec input
+            operations read only it from json output. Straight calculation results are saved
+            to json only.
     """
     def __init__(self):
         self.input_filename = "physspec_input.json"
         self.output_filename = "physspec_output.json"
         self.histories = 1000
         self.seed = 0
+        self.batch_size = 0
+        self.metrics_filename = ""
+        self.save_json = True
+        self.keep_in_memory = False
 
     @staticmethod
     def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'PhysspecOperation':
@@ -26,6 +46,14 @@ class PhysspecOperation:
                                           section.get('output_filename', op.output_filename))
         op.histories = section.get('histories', op.histories)
         op.seed = section.get('seed', op.seed)
+        op.batch_size = section.get('batch_size', op.batch_size)
+        if section.get('metrics_filename'):
+            op.metrics_filename = os.path.join(project_dir, section['metrics_filename'])
+        op.save_json = section.get('save_json', op.save_json)
+        op.keep_in_memory = section.get('keep_in_memory', op.keep_in_memory)
+        assert op.save_json or op.keep_in_memory, "physspec results should be saved or kept in memory"
+        assert op.save_json or not op.keep_in_memory, \
+            "keep_in_memory needs save_json: uncollided flux is read from json output"
         return op
 
     def run(self) -> None:
@@ -33,8 +61,13 @@ class PhysspecOperation:
         # copy input -> physspec_input.json
         if self.input_filename != 'physspec_input.json':
             shutil.copy(self.input_filename, 'physspec_input.json')
+        # previous results for this output are outdated
+        discard_results(self.output_filename)
         # run physspec
-        calc_physspec(self.seed, self.histories)
+        results = calc_physspec(self.seed, self.histories, self.save_json, self.batch_size,
+                                self.metrics_filename)
+        if self.keep_in_memory:
+            put_results(self.output_filename, results)
         # copy physspec_output.json -> output
-        if self.output_filename != 'physspec_output.json':
+        if self.save_json and self.output_filename != 'physspec_output.json':
             shutil.copy('physspec_output.json', self.output_filename)
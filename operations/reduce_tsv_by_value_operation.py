@@ -1,3 +1,4 @@
+import bisect
 import math
 import os
 import typing as tp
@@ -11,38 +12,54 @@ def _read_header(input_filename: str) -> tp.List[str]:
             return [w for w in line.strip().split('\t')]
 
 
-def _read_row(input_filename: str, pivot_value: float) -> tp.List[float]:
-    with open(input_filename) as f:
-        for i, line in enumerate(f):
-            if i == 0:
-                continue
-            line = line.strip()
-            data = [float(w) for w in line.split('\t')]
-            if math.isclose(data[0], pivot_value):
-                return data
+class _RowIndex:
+    """rows of tsv-file indexed by value in 1st column, file is read once"""
+    def __init__(self, input_filename: str):
+        rows = []
+        with open(input_filename) as f:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if i == 0 or not line:
+                    continue
+                rows.append([float(w) for w in line.split('\t')])
+        # stable sort: the first row in file wins for equal keys
+        self.rows = sorted(rows, key=lambda row: row[0])
+        self.keys = [row[0] for row in self.rows]
+
+    def find(self, pivot_value: float) -> tp.Optional[tp.List[float]]:
+        pos = bisect.bisect_left(self.keys, pivot_value)
+        # the closest keys are around insertion position
+        candidates = [i for i in (pos - 1, pos) if 0 <= i < len(self.keys)
+                      and math.isclose(self.keys[i], pivot_value)]
+        if not candidates:
+            return None
+        return self.rows[min(candidates, key=lambda i: abs(self.keys[i] - pivot_value))]
 
 
-def _reduce_tsv_by_value(input_filenames: tp.List[str], output_filename: str,
-                         new_axis_name: str, new_axes_values: tp.List[float],
-                         pivot_value: float, skip_absent_rows: bool):
-    header = [new_axis_name] + _read_header(input_filenames[0])
-    new_data = []
+def _reduce_tsv_by_values(input_filenames: tp.List[str], new_axes_values: tp.List[float],
+                          pivot_values: tp.List[float], skip_absent_rows: bool) -> tp.List[tp.List[tp.List[float]]]:
+    """rows of new table for every pivot value"""
+    new_data = [[] for _ in pivot_values]
     for input_filename, new_value in zip(input_filenames, new_axes_values):
-        row = _read_row(input_filename, pivot_value)
-        if not row:
-            error_line = f"There is no row for value {pivot_value} in file: {input_filename}"
-            if skip_absent_rows:
-                print(error_line)
-                continue
-            else:
-                raise Exception(error_line)
-        new_data.append([new_value] + _read_row(input_filename, pivot_value))
+        index = _RowIndex(input_filename)
+        for pivot_rows, pivot_value in zip(new_data, pivot_values):
+            row = index.find(pivot_value)
+            if not row:
+                error_line = f"There is no row for value {pivot_value} in file: {input_filename}"
+                if skip_absent_rows:
+                    print(error_line)
+                    continue
+                else:
+                    raise Exception(error_line)
+            pivot_rows.append([new_value] + row)
+    return new_data
+
 
-    # save new data to output
+def _save_tsv(header: tp.List[str], rows: tp.List[tp.List[float]], output_filename: str):
     with open(output_filename, 'w') as f:
         f.write("\t".join(header))
         f.write("\n")
-        for row in new_data:
+        for row in rows:
             f.write("\t".join([str(v) for v in row]))
             f.write("\n")
 
@@ -58,13 +75,19 @@ class ReduceTsvByValueOperation:
         new_axis_name: new column in result tsv-file
         new_axis_values: value for each input filename, which it correcponds
         col1value_pivot: value in 1st column to select line
+        col1value_pivots: list of values in 1st column instead of col1value_pivot,
+            every input file is read once for all of them
+        output_filenames: filename with results for every value from col1value_pivots,
+            if absent, rows for all values are saved to output_filename (long format)
     """
     def __init__(self):
         self.input_filenames = []
         self.output_filename = ""
+        self.output_filenames = []
         self.new_axis_name = "name"
         self.new_axis_values = []
         self.col1value_pivot = 0.0
+        self.col1value_pivots = []
         self.skip_absent_rows = False
 
     @staticmethod
@@ -74,16 +97,28 @@ class ReduceTsvByValueOperation:
         op.input_filenames = [
             os.path.join(project_dir, input_filename)
             for input_filename in section['input_filenames']]
-        op.output_filename = os.path.join(project_dir, section['output_filename'])
         op.new_axis_name = section["new_axis_name"]
         op.new_axis_values = section["new_axis_values"]
         assert len(op.input_filenames) == len(op.new_axis_values)
         op.col1value_pivot = section.get('col1value_pivot', op.col1value_pivot)
+        op.col1value_pivots = section.get('col1value_pivots', [op.col1value_pivot])
+        if section.get('output_filenames'):
+            op.output_filenames = [os.path.join(project_dir, output_filename)
+                                   for output_filename in section['output_filenames']]
+            assert len(op.output_filenames) == len(op.col1value_pivots), \
+                "one output filename for every pivot value is needed"
+        else:
+            op.output_filename = os.path.join(project_dir, section['output_filename'])
         op.skip_absent_rows = section.get('skip_absent_rows', op.skip_absent_rows)
         return op
 
     def run(self) -> None:
         print('start reduce_tsv_by_value')
-        _reduce_tsv_by_value(self.input_filenames, self.output_filename,
-                             self.new_axis_name, self.new_axis_values,
-                             self.col1value_pivot, self.skip_absent_rows)
+        header = [self.new_axis_name] + _read_header(self.input_filenames[0])
+        new_data = _reduce_tsv_by_values(self.input_filenames, self.new_axis_values,
+                                         self.col1value_pivots, self.skip_absent_rows)
+        if self.output_filenames:
+            for rows, output_filename in zip(new_data, self.output_filenames):
+                _save_tsv(header, rows, output_filename)
+        else:
+            _save_tsv(header, [row for rows in new_data for row in rows], self.output_filename)
@@ -4,7 +4,9 @@ from dataclasses import dataclass
 import numpy as np
 
 from operations.lsrm_parsers.efaparser import get_efficiency_from_efa, Efficiency, EffZone
-from .orth_poly_wrapper import OrthogonalPolynomialWrapper
+from .orth_poly_numpy import (NumpyOrthogonalPolynomialFitter,
+                              approximate_orthogonal_polynomials_batch, pad_to_batch)
+from .orth_poly_wrapper import OrthogonalPolynomialsApproximation, OrthogonalPolynomialWrapper
 
 
 @dataclass
@@ -16,6 +18,20 @@ class ZoneConfig:
 
 DEFAULT_ZONES_CONFIG = [ZoneConfig(4, 50, 400.0), ZoneConfig(2, 250, 3000.0)]
 
+LIBRARY_BACKEND = "library"  # liborthogonal_polynomials.so
+NUMPY_BACKEND = "numpy"
+BACKENDS = [LIBRARY_BACKEND, NUMPY_BACKEND]
+
+
+def zones_config_from_yaml(zones: tp.List[tp.Dict[str, tp.Any]]) -> tp.List[ZoneConfig]:
+    """zones: [{degree: 3, left: 50, right: 300}, ...]"""
+    return [ZoneConfig(z["degree"], z["left"], z["right"]) for z in zones]
+
+
+def has_enough_points(eff: Efficiency, zones_config: tp.List[ZoneConfig]) -> bool:
+    x = np.log10([p.energy for p in eff.points])
+    return all(np.count_nonzero(_zone_mask(x, zc)) > zc.degree for zc in zones_config)
+
 
 def convert_orth_to_lsrm(orth_poly_coeffs: tp.List[tp.List[float]]) -> tp.List[tp.List[float]]:
     res = []
@@ -25,8 +41,17 @@ def convert_orth_to_lsrm(orth_poly_coeffs: tp.List[tp.List[float]]) -> tp.List[t
     return res
 
 
-def approx_efr_with_polynomes(eff: Efficiency, zones_config: tp.List[ZoneConfig]):
-    eff.zones = []
+def create_fitter(backend: str = LIBRARY_BACKEND):
+    """creates orthogonal polynomial fitter: library wrapper or its numpy implementation"""
+    if backend == LIBRARY_BACKEND:
+        return OrthogonalPolynomialWrapper()
+    if backend == NUMPY_BACKEND:
+        return NumpyOrthogonalPolynomialFitter()
+    raise RuntimeError(f"unknown backend {backend}, use one of {BACKENDS}")
+
+
+def get_fit_data(eff: Efficiency) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """points for approximation: log10(energy), log10(efficiency), weights"""
     x = np.log10([p.energy for p in eff.points])
     y = np.log10([p.eff for p in eff.points])
     dyplus = np.log10([1.0 + p.deff/100.0 for p in eff.points])
@@ -34,25 +59,67 @@ def approx_efr_with_polynomes(eff: Efficiency, zones_config: tp.List[ZoneConfig]
     dy = np.maximum(dyplus, dyminus)
     dy = dyplus
     w = 1/dy**2
-    lib = OrthogonalPolynomialWrapper()
+    return x, y, w
+
+
+def _zone_mask(x: np.ndarray, zc: ZoneConfig) -> np.ndarray:
+    return (np.log10(zc.left_boundary) <= x) & (x <= np.log10(zc.right_boundary))
+
+
+def _create_zone(zc: ZoneConfig, eff_poly: OrthogonalPolynomialsApproximation) -> EffZone:
+    return EffZone(zc.degree, np.log10(zc.left_boundary), np.log10(zc.right_boundary),
+                   eff_poly.quality,
+                   np.asarray(eff_poly.main_coeffs).tolist(),
+                   convert_orth_to_lsrm(np.asarray(eff_poly.orth_poly_coeffs).tolist()))
+
+
+def approx_efr_with_polynomes(eff: Efficiency, zones_config: tp.List[ZoneConfig],
+                              backend: str = LIBRARY_BACKEND, fitter=None):
+    """fitter: created once and reused for many calls, if it's None it's created by backend"""
+    eff.zones = []
+    x, y, w = get_fit_data(eff)
+    lib = fitter or create_fitter(backend)
     # create poly for every zone
     for zc in zones_config:
-        x_l = np.log10(zc.left_boundary)
-        x_r = np.log10(zc.right_boundary)
-        x_z = x[(x_l <= x) & (x <= x_r)]
-        y_z = y[(x_l <= x) & (x <= x_r)]
-        w_z = w[(x_l <= x) & (x <= x_r)]
+        mask = _zone_mask(x, zc)
+        x_z = x[mask]
+        y_z = y[mask]
+        w_z = w[mask]
         assert len(x_z) > zc.degree
         eff_poly = lib.approximate_orthogonal_polynomials(x_z, y_z, w_z, degree=zc.degree)
-        zone = EffZone(zc.degree, x_l, x_r, eff_poly.quality,
-                       eff_poly.main_coeffs, convert_orth_to_lsrm(eff_poly.orth_poly_coeffs))
-        eff.zones.append(zone)
+        eff.zones.append(_create_zone(zc, eff_poly))
     return eff
 
 
-def approx_with_polynomes(efr_filename: str, zones_config: tp.List[ZoneConfig]):
+def approx_efrs_with_polynomes(effs: tp.List[Efficiency], zones_config: tp.List[ZoneConfig],
+                               backend: str = LIBRARY_BACKEND) -> tp.List[Efficiency]:
+    """
+    approximates many efficiencies with the same zones config,
+    numpy backend fits every zone for all efficiencies at once
+    """
+    if backend != NUMPY_BACKEND:
+        fitter = create_fitter(backend)
+        return [approx_efr_with_polynomes(eff, zones_config, fitter=fitter) for eff in effs]
+    fit_data = [get_fit_data(eff) for eff in effs]
+    for eff in effs:
+        eff.zones = []
+    for zc in zones_config:
+        masks = [_zone_mask(x, zc) for x, _, _ in fit_data]
+        assert all(np.count_nonzero(mask) > zc.degree for mask in masks)
+        eff_polys = approximate_orthogonal_polynomials_batch(
+            pad_to_batch([x[mask] for (x, _, _), mask in zip(fit_data, masks)]),
+            pad_to_batch([y[mask] for (_, y, _), mask in zip(fit_data, masks)]),
+            pad_to_batch([w[mask] for (_, _, w), mask in zip(fit_data, masks)]),
+            zc.degree)
+        for eff, eff_poly in zip(effs, eff_polys):
+            eff.zones.append(_create_zone(zc, eff_poly))
+    return effs
+
+
+def approx_with_polynomes(efr_filename: str, zones_config: tp.List[ZoneConfig],
+                          backend: str = LIBRARY_BACKEND):
     eff = get_efficiency_from_efa(efr_filename)
-    return approx_efr_with_polynomes(eff, zones_config)
+    return approx_efr_with_polynomes(eff, zones_config, backend)
 
 
 def main():
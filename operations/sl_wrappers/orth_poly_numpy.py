@@ -0,0 +1,149 @@
+"""
+    Numpy implementation of the weighted orthogonal polynomial approximation
+    (liborthogonal_polynomials ApproximateOrthogonalPolynomials).
+    Polynomials are orthonormal on the data points with normalized weights (w / sum(w)),
+    so P_0 = 1. Results are in the same layout as the library ones:
+        main_coeffs -- coefficients of the orthogonal polynomials,
+        orth_poly_coeffs -- row i has i+1 coefficients from the highest degree, padded by zeros,
+        chi2 -- weighted chi2 per degree of freedom,
+        quality -- 2 * sqrt(chi2 / sum(w)), uncertainty of the approximation is
+            sqrt(sum(P_i**2)) * quality (coverage factor 2, as zones deviations in LSRM efa-files).
+    Many approximations with the same degree are fitted at once (unused points have zero weight).
+"""
+import typing as tp
+
+import numpy as np
+
+from .orth_poly_wrapper import (OrthogonalPolynomialsApproximation, OrthogonalPolynomialWrapper,
+                                PreparedOrthogonalPolynomials, evaluate_orthogonal_polynomials,
+                                _load_example_input)
+
+
+EPS = 1e-12
+# zone deviations in LSRM efa-files are expanded uncertainties (checked on examples/*.efa)
+COVERAGE_FACTOR = 2.0
+
+
+def approximate_orthogonal_polynomials_batch(
+        xs: np.ndarray, ys: np.ndarray, ws: np.ndarray,
+        degree: int) -> tp.List[OrthogonalPolynomialsApproximation]:
+    """
+    approximates every row of xs, ys, ws (2d-arrays: approximations x points),
+        points with zero weight are ignored (use them to pad rows to the same length)
+    """
+    xs = np.atleast_2d(np.asarray(xs, dtype=np.float64))
+    ys = np.atleast_2d(np.asarray(ys, dtype=np.float64))
+    ws = np.atleast_2d(np.asarray(ws, dtype=np.float64))
+    assert xs.shape == ys.shape == ws.shape, "arrays must have same shapes"
+    assert degree >= 0
+    m = xs.shape[0]
+    n = degree + 1
+    ws = np.where(ws > 0, ws, 0.0)
+    xs = np.where(ws > 0, xs, 0.0)
+    ys = np.where(ws > 0, ys, 0.0)
+    points = np.count_nonzero(ws, axis=1)
+    if np.any(points < n):
+        raise RuntimeError(f"not enough points for degree {degree}")
+    w_sum = ws.sum(axis=1)
+    wn = ws / w_sum[:, None]
+
+    # values[:, i, :] -- P_i on points, coeffs[:, i, k] -- coefficient of x**k in P_i
+    values = np.zeros((m, n, xs.shape[1]))
+    coeffs = np.zeros((m, n, n))
+    values[:, 0, :] = 1.0
+    coeffs[:, 0, 0] = 1.0
+    for k in range(1, n):
+        q = xs * values[:, k-1, :]
+        q_coeffs = np.zeros((m, n))
+        q_coeffs[:, 1:] = coeffs[:, k-1, :-1]
+        # full reorthogonalization, degree is small
+        for _ in range(2):
+            proj = np.einsum('mp,mip,mp->mi', wn, values[:, :k, :], q)
+            q = q - np.einsum('mi,mip->mp', proj, values[:, :k, :])
+            q_coeffs = q_coeffs - np.einsum('mi,mij->mj', proj, coeffs[:, :k, :])
+        norm = np.sqrt(np.sum(wn * q**2, axis=1))
+        if np.any(norm < EPS):
+            raise RuntimeError(f"points are degenerate for degree {degree}")
+        values[:, k, :] = q / norm[:, None]
+        coeffs[:, k, :] = q_coeffs / norm[:, None]
+
+    main_coeffs = np.einsum('mp,mip,mp->mi', wn, values, ys)
+    residuals = ys - np.einsum('mi,mip->mp', main_coeffs, values)
+    dof = points - n
+    chi2 = np.where(dof > 0, np.sum(ws * residuals**2, axis=1) / np.maximum(dof, 1), 0.0)
+    quality = COVERAGE_FACTOR * np.sqrt(chi2 / w_sum)
+
+    # library layout: from the highest degree
+    orth_poly_coeffs = np.zeros((m, n, n))
+    for i in range(n):
+        orth_poly_coeffs[:, i, :i+1] = coeffs[:, i, i::-1]
+
+    return [
+        OrthogonalPolynomialsApproximation(main_coeffs[j], orth_poly_coeffs[j],
+                                           float(quality[j]), float(chi2[j]))
+        for j in range(m)
+    ]
+
+
+def approximate_orthogonal_polynomials(
+        x: tp.Sequence[float], y: tp.Sequence[float], w: tp.Sequence[float],
+        degree: int) -> OrthogonalPolynomialsApproximation:
+    assert len(x) == len(y) == len(w), "arrays must have same lengths"
+    return approximate_orthogonal_polynomials_batch(
+        np.asarray(x)[None, :], np.asarray(y)[None, :], np.asarray(w)[None, :], degree)[0]
+
+
+def pad_to_batch(arrays: tp.List[tp.Sequence[float]], fill: float = 0.0) -> np.ndarray:
+    """stacks arrays with different lengths to 2d-array, use zero weights for padding"""
+    size = max(len(a) for a in arrays)
+    res = np.full((len(arrays), size), fill, dtype=np.float64)
+    for i, a in enumerate(arrays):
+        res[i, :len(a)] = a
+    return res
+
+
+class NumpyOrthogonalPolynomialFitter:
+    """
+    NumpyOrthogonalPolynomialFitter -- drop-in replacement for OrthogonalPolynomialWrapper
+    without the shared library
+    """
+    def approximate_orthogonal_polynomials(
+            self,
+            x: tp.Sequence[float], y: tp.Sequence[float], w: tp.Sequence[float],
+            degree: int) -> OrthogonalPolynomialsApproximation:
+        return approximate_orthogonal_polynomials(x, y, w, degree)
+
+    def get_value_from_orthogonal_polynomials(
+            self, polynomials: OrthogonalPolynomialsApproximation, x: float) -> tp.Tuple[float, float]:
+        ys, dys = evaluate_orthogonal_polynomials(polynomials, np.array([x]))
+        return float(ys[0]), float(dys[0])
+
+    def prepare(self, polynomials: OrthogonalPolynomialsApproximation
+                ) -> PreparedOrthogonalPolynomials:
+        return PreparedOrthogonalPolynomials(polynomials)
+
+
+def main():
+    """compares numpy approximation with the library one on the example data"""
+    x, y, w = _load_example_input()
+    polys = approximate_orthogonal_polynomials(x, y, w, 4)
+    print("numpy approximation:")
+    print(polys)
+
+    try:
+        lib = OrthogonalPolynomialWrapper()
+    except (AttributeError, OSError) as e:
+        print(f"library is not loaded, nothing to compare: {e}")
+        return
+    lib_polys = lib.approximate_orthogonal_polynomials(x, y, w, 4)
+    print("library approximation:")
+    print(lib_polys)
+    print("max diff:")
+    print("main_coeffs:", np.max(np.abs(polys.main_coeffs - lib_polys.main_coeffs)))
+    print("orth_poly_coeffs:", np.max(np.abs(polys.orth_poly_coeffs - lib_polys.orth_poly_coeffs)))
+    print("quality:", abs(polys.quality - lib_polys.quality))
+    print("chi2:", abs(polys.chi2 - lib_polys.chi2))
+
+
+if __name__ == "__main__":
+    main()
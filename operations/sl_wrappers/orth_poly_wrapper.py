@@ -2,11 +2,13 @@ import ctypes as ct
 import os.path
 import typing as tp
 from dataclasses import dataclass, field
-from itertools import chain
 
 import numpy as np
 
 
+_DoubleArray = np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS')
+
+
 def _get_attribute(lib, attributes: tp.List[str]):
     """
         tries to get exported attribute from attributes list
@@ -32,43 +34,115 @@ class _OrthogonalPolynomialsApproximation(ct.Structure):
     ]
 
 
+def _as_array(ptr, shape: tp.Tuple[int, ...]) -> np.ndarray:
+    if not ptr or 0 in shape:
+        return np.zeros(shape)
+    return np.ctypeslib.as_array(ptr, shape=shape)
+
+
 @dataclass
 class OrthogonalPolynomialsApproximation:
-    main_coeffs: tp.List[float] = field(default_factory=list)
-    orth_poly_coeffs: tp.List[tp.List[float]] = field(default_factory=list)
+    """
+    OrthogonalPolynomialsApproximation:
+        main_coeffs: coefficients of the orthogonal polynomials (degree + 1)
+        orth_poly_coeffs: (degree + 1) x (degree + 1) matrix, row i -- coefficients of polynomial i
+        quality, chi2: approximation quality and chi2
+    """
+    main_coeffs: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    orth_poly_coeffs: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)))
     quality: float = 0.0
     chi2: float = 0.0
 
     @staticmethod
     def create_from_ct(ct_opa: _OrthogonalPolynomialsApproximation
                        ) -> "OrthogonalPolynomialsApproximation":
-        res = OrthogonalPolynomialsApproximation()
-        for i in range(ct_opa.main_coeffs_size):
-            res.main_coeffs.append(float(ct_opa.main_coeffs[i]))
-
+        """copies arrays, so ct_opa memory can be freed after"""
         n = ct_opa.orth_poly_coeffs_size
-        for i in range(n):
-            res.orth_poly_coeffs.append([])
-            for j in range(n):
-                res.orth_poly_coeffs[-1].append(float(ct_opa.orth_poly_coeffs[i*n+j]))
-        res.quality = float(ct_opa.quality)
-        res.chi2 = float(ct_opa.chi2)
-        return res
+        return OrthogonalPolynomialsApproximation(
+            main_coeffs=_as_array(ct_opa.main_coeffs, (ct_opa.main_coeffs_size,)).copy(),
+            orth_poly_coeffs=_as_array(ct_opa.orth_poly_coeffs, (n, n)).copy(),
+            quality=float(ct_opa.quality),
+            chi2=float(ct_opa.chi2),
+        )
 
 
 def make_c_struct(polynomials: OrthogonalPolynomialsApproximation) -> _OrthogonalPolynomialsApproximation:
+    main_coeffs = np.ascontiguousarray(polynomials.main_coeffs, dtype=np.float64)
+    orth_poly_coeffs = np.ascontiguousarray(polynomials.orth_poly_coeffs, dtype=np.float64)
+    n = len(orth_poly_coeffs)
+    assert orth_poly_coeffs.size == n**2
     c_poly = _OrthogonalPolynomialsApproximation()
-    c_poly.main_coeffs_size = ct.c_uint64(len(polynomials.main_coeffs))
-    c_poly.main_coeffs = (ct.c_double * len(polynomials.main_coeffs))(*polynomials.main_coeffs)
-    orth_poly_coeffs = list(chain.from_iterable(polynomials.orth_poly_coeffs))
-    assert len(orth_poly_coeffs) == len(polynomials.orth_poly_coeffs)**2
-    c_poly.orth_poly_coeffs_size = ct.c_uint64(len(polynomials.orth_poly_coeffs))
-    c_poly.orth_poly_coeffs = (ct.c_double * len(orth_poly_coeffs))(*orth_poly_coeffs)
+    c_poly.main_coeffs_size = ct.c_uint64(len(main_coeffs))
+    c_poly.main_coeffs = main_coeffs.ctypes.data_as(ct.POINTER(ct.c_double))
+    c_poly.orth_poly_coeffs_size = ct.c_uint64(n)
+    c_poly.orth_poly_coeffs = orth_poly_coeffs.ctypes.data_as(ct.POINTER(ct.c_double))
     c_poly.quality = ct.c_double(polynomials.quality)
     c_poly.chi2 = ct.c_double(polynomials.chi2)
+    # struct points to numpy memory, keep arrays alive with it
+    c_poly._arrays = (main_coeffs, orth_poly_coeffs)
     return c_poly
 
 
+def _orth_poly_values(orth_poly_coeffs: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    """
+    values of orthogonal polynomials: (degree + 1) x len(xs),
+    row i of orth_poly_coeffs -- i+1 coefficients from the highest degree (padded by zeros)
+    """
+    n = len(orth_poly_coeffs)
+    # power_coeffs[i, k] -- coefficient of x**k in polynomial i
+    power_coeffs = np.zeros((n, n))
+    for i in range(n):
+        power_coeffs[i, :i+1] = orth_poly_coeffs[i, i::-1]
+    return power_coeffs @ np.vander(xs, n, increasing=True).T
+
+
+def evaluate_orthogonal_polynomials(polynomials: OrthogonalPolynomialsApproximation,
+                                    xs: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """
+    numpy implementation of GetValueFromOrthogonalPolynomials for many points:
+        y = sum(main_coeffs[i] * P_i(x)), dy = sqrt(sum(P_i(x)**2)) * quality
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    values = _orth_poly_values(np.asarray(polynomials.orth_poly_coeffs, dtype=np.float64), xs)
+    ys = np.asarray(polynomials.main_coeffs, dtype=np.float64) @ values
+    dys = np.sqrt(np.sum(values**2, axis=0)) * polynomials.quality
+    return ys, dys
+
+
+class PreparedOrthogonalPolynomials:
+    """
+    PreparedOrthogonalPolynomials -- approximation marshalled to the library struct once,
+    evaluate(xs) returns values and their uncertainties for all xs.
+    Without library (lib is None) numpy implementation is used.
+    """
+    def __init__(self, polynomials: OrthogonalPolynomialsApproximation,
+                 lib: tp.Optional["OrthogonalPolynomialWrapper"] = None):
+        self.polynomials = polynomials
+        self._lib = lib
+        self._c_poly = make_c_struct(polynomials) if lib is not None else None
+
+    @property
+    def is_native(self) -> bool:
+        return self._lib is not None
+
+    def evaluate(self, xs: tp.Sequence[float]) -> tp.Tuple[np.ndarray, np.ndarray]:
+        xs = np.asarray(xs, dtype=np.float64)
+        if self._lib is None:
+            return evaluate_orthogonal_polynomials(self.polynomials, xs)
+        return self._lib._get_values_from_c_struct(self._c_poly, xs)
+
+
+def prepare_orthogonal_polynomials(polynomials: OrthogonalPolynomialsApproximation,
+                                   path_to_dll: tp.Optional[str] = None
+                                   ) -> PreparedOrthogonalPolynomials:
+    """prepares approximation with the library if it's found or with numpy implementation"""
+    try:
+        lib = OrthogonalPolynomialWrapper(path_to_dll)
+    except (AttributeError, OSError):
+        lib = None
+    return PreparedOrthogonalPolynomials(polynomials, lib)
+
+
 class OrthogonalPolynomialWrapper:
     def __init__(self, path_to_dll: tp.Optional[str] = None, lib_name: tp.Optional[str] = None):
         if path_to_dll is None:
@@ -83,7 +157,7 @@ class OrthogonalPolynomialWrapper:
             ['ApproximateOrthogonalPolynomials']
         )
         self._approximate_orthogonal_polynomials.argtypes = [
-            ct.POINTER(ct.c_double), ct.POINTER(ct.c_double), ct.POINTER(ct.c_double), ct.c_uint,
+            _DoubleArray, _DoubleArray, _DoubleArray, ct.c_uint,
             ct.c_int,
             ct.POINTER(_OrthogonalPolynomialsApproximation)]
         self._approximate_orthogonal_polynomials.restype = ct.c_int
@@ -118,13 +192,14 @@ class OrthogonalPolynomialWrapper:
 
     def approximate_orthogonal_polynomials(
             self,
-            x: tp.List[float], y: tp.List[float], w: tp.List[float],
+            x: tp.Sequence[float], y: tp.Sequence[float], w: tp.Sequence[float],
             degree: int) -> OrthogonalPolynomialsApproximation:
-        assert len(x) == len(y) == len(w), "arrays must have same lengths"
-        size = len(x)
-        xx = (ct.c_double * size)(*x)
-        yy = (ct.c_double * size)(*y)
-        ww = (ct.c_double * size)(*w)
+        """arrays are passed by pointer, float64 contiguous numpy arrays are not copied"""
+        xx = np.ascontiguousarray(x, dtype=np.float64)
+        yy = np.ascontiguousarray(y, dtype=np.float64)
+        ww = np.ascontiguousarray(w, dtype=np.float64)
+        assert len(xx) == len(yy) == len(ww), "arrays must have same lengths"
+        size = len(xx)
         c_poly = _OrthogonalPolynomialsApproximation()
         err = self._approximate_orthogonal_polynomials(
             xx, yy, ww, size, degree, ct.pointer(c_poly)
@@ -147,6 +222,26 @@ class OrthogonalPolynomialWrapper:
             raise RuntimeError(f"error code: {err}")
         return float(y.value), float(dy.value)
 
+    def prepare(self, polynomials: OrthogonalPolynomialsApproximation
+                ) -> PreparedOrthogonalPolynomials:
+        return PreparedOrthogonalPolynomials(polynomials, self)
+
+    def _get_values_from_c_struct(self, c_poly: _OrthogonalPolynomialsApproximation,
+                                  xs: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+        ys = np.empty(len(xs))
+        dys = np.empty(len(xs))
+        y = ct.c_double(0.0)
+        dy = ct.c_double(0.0)
+        p_poly, p_y, p_dy = ct.byref(c_poly), ct.byref(y), ct.byref(dy)
+        get_value = self._get_value_from_orthogonal_polynomials
+        for i, x in enumerate(xs.tolist()):
+            err = get_value(p_poly, x, p_y, p_dy)
+            if err != 0:
+                raise RuntimeError(f"error code: {err}")
+            ys[i] = y.value
+            dys[i] = dy.value
+        return ys, dys
+
 
 def _load_example_input():
     data = [0]*8
@@ -191,6 +286,14 @@ def main():
     print(f"{x_test} -> {y_test}, {dy_test}")
     print(f"{x_t} -> {10**y_test}, {10**dy_test}")
 
+    # get values on grid
+    x_grid = np.log10(np.linspace(50.0, 225.0, 8))
+    y_grid, dy_grid = lib.prepare(polys).evaluate(x_grid)
+    y_np, dy_np = evaluate_orthogonal_polynomials(polys, x_grid)
+    print("grid values (library, numpy):")
+    for x_g, y_g, dy_g, y_n, dy_n in zip(x_grid, y_grid, dy_grid, y_np, dy_np):
+        print(f"{10**x_g} -> {10**y_g}, {dy_g}; {10**y_n}, {dy_n}")
+
 
 if __name__ == "__main__":
     main()
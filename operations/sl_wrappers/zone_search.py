@@ -0,0 +1,183 @@
+"""
+    Search of efficiency calibration zones (boundaries and degrees) for auto calibration.
+    Every candidate zones config is fitted with numpy orthogonal polynomial fitter
+    (all cross-validation folds of the zone in one batch) and scored by
+    cross-validation chi2: sum(w * (y - y_predicted)**2) / N for held-out points,
+    predictions use the same zones joining as Efficiency.get_eff.
+"""
+import itertools
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .efficiency_calibration import ZoneConfig
+from .orth_poly_numpy import approximate_orthogonal_polynomials_batch, pad_to_batch
+from .orth_poly_wrapper import evaluate_orthogonal_polynomials
+
+
+# outer zones bounds are widened a bit to keep the edge points after log10/10** round trip
+BOUNDS_EPS = 1e-9
+
+@dataclass
+class ZoneSearchConfig:
+    """
+    ZoneSearchConfig:
+        degrees: candidate degrees for every zone
+        splits: candidate energies (keV) between zones,
+            if empty n_splits log-spaced energies between 20% and 80% quantiles of points
+        overlap: zones near split overlap: left zone ends at split * (1 + overlap),
+            right zone starts at split / (1 + overlap)
+        max_zones: maximal number of zones
+        folds: number of cross-validation folds
+        workers: number of processes to score candidates
+        seed: seed for folds shuffling
+    """
+    degrees: tp.List[int] = field(default_factory=lambda: [2, 3, 4, 5])
+    splits: tp.List[float] = field(default_factory=list)
+    n_splits: int = 8
+    overlap: float = 0.25
+    max_zones: int = 2
+    folds: int = 5
+    workers: int = 1
+    seed: int = 0
+
+
+@dataclass
+class ZoneCandidateScore:
+    zones_config: tp.List[ZoneConfig]
+    cv_chi2: float
+    chi2: float  # max chi2 of zones fitted on all points
+    quality: float  # max quality of zones fitted on all points
+
+
+def _predict(zones: tp.List[tp.Tuple[float, float]], zone_values: tp.List[np.ndarray],
+             x: np.ndarray) -> np.ndarray:
+    """joins zones values as Efficiency.get_eff: zones -- (log10 left, log10 right)"""
+    y = np.array(zone_values[0], dtype=np.float64)
+    for i in range(1, len(zones)):
+        l_left, l_right = zones[i-1]
+        r_left, _ = zones[i]
+        y_l, y_r = zone_values[i-1], zone_values[i]
+        lo, hi = min(r_left, l_right), max(r_left, l_right)
+        if r_left < l_right:
+            # overlap
+            t = (x - r_left) / (l_right - r_left)
+            joined = (1 - t) * y_r + t * y_l
+        elif r_left > l_right:
+            # between
+            t = (x - l_right) / (r_left - l_right)
+            joined = (1 - t) * y_l + t * y_r
+        else:
+            joined = y_r
+        joined = np.where(x > hi, y_r, joined)
+        y = np.where(x > lo, joined, y)
+    return y
+
+
+def _score_candidate(zones_config: tp.List[ZoneConfig], x: np.ndarray, y: np.ndarray,
+                     w: np.ndarray, fold_ids: np.ndarray, folds: int
+                     ) -> tp.Optional[ZoneCandidateScore]:
+    zones = [(np.log10(zc.left_boundary), np.log10(zc.right_boundary)) for zc in zones_config]
+    # rows: folds (training sets) and all points
+    train_masks = [fold_ids != f for f in range(folds)] + [np.ones(len(x), dtype=bool)]
+    fold_values: tp.List[tp.List[np.ndarray]] = [[] for _ in range(folds)]
+    chi2, quality = 0.0, 0.0
+    for zc, (left, right) in zip(zones_config, zones):
+        zone_mask = (left <= x) & (x <= right)
+        masks = [zone_mask & m for m in train_masks]
+        if any(np.count_nonzero(m) <= zc.degree for m in masks):
+            return None
+        try:
+            polys = approximate_orthogonal_polynomials_batch(
+                pad_to_batch([x[m] for m in masks]),
+                pad_to_batch([y[m] for m in masks]),
+                pad_to_batch([w[m] for m in masks]),
+                zc.degree)
+        except RuntimeError:
+            return None
+        for f in range(folds):
+            fold_values[f].append(evaluate_orthogonal_polynomials(polys[f], x)[0])
+        chi2 = max(chi2, polys[-1].chi2)
+        quality = max(quality, polys[-1].quality)
+
+    cv_sum = 0.0
+    for f in range(folds):
+        held_out = fold_ids == f
+        y_pred = _predict(zones, fold_values[f], x)
+        cv_sum += np.sum(w[held_out] * (y[held_out] - y_pred[held_out])**2)
+    return ZoneCandidateScore(zones_config, float(cv_sum / len(x)), chi2, quality)
+
+
+def _score_candidates(args) -> tp.List[ZoneCandidateScore]:
+    candidates, x, y, w, fold_ids, folds = args
+    scores = (_score_candidate(c, x, y, w, fold_ids, folds) for c in candidates)
+    return [s for s in scores if s is not None]
+
+
+def _get_splits(x: np.ndarray, config: ZoneSearchConfig) -> tp.List[float]:
+    if config.splits:
+        return sorted(config.splits)
+    low, high = np.quantile(x, [0.2, 0.8])
+    return (10**np.linspace(low, high, config.n_splits)).tolist()
+
+
+def generate_candidates(energy_min: float, energy_max: float, splits: tp.List[float],
+                        config: ZoneSearchConfig) -> tp.List[tp.List[ZoneConfig]]:
+    """all zones configs with up to max_zones zones from splits and degrees"""
+    ratio = 1.0 + config.overlap
+    candidates = []
+    for n_zones in range(1, config.max_zones + 1):
+        for zone_splits in itertools.combinations(splits, n_zones - 1):
+            # overlaps of the neighbour splits must not intersect
+            bounds = [energy_min] + list(zone_splits) + [energy_max]
+            if any(bounds[i] * ratio >= bounds[i+1] / ratio for i in range(1, len(bounds) - 2)):
+                continue
+            if zone_splits and (zone_splits[0] / ratio <= energy_min or
+                                zone_splits[-1] * ratio >= energy_max):
+                continue
+            for degrees in itertools.product(config.degrees, repeat=n_zones):
+                zones = []
+                for i, degree in enumerate(degrees):
+                    left = bounds[i] if i == 0 else bounds[i] / ratio
+                    right = bounds[i+1] if i + 1 == n_zones else bounds[i+1] * ratio
+                    zones.append(ZoneConfig(degree, left, right))
+                candidates.append(zones)
+    return candidates
+
+
+def search_zones(x: np.ndarray, y: np.ndarray, w: np.ndarray,
+                 config: ZoneSearchConfig) -> tp.List[ZoneCandidateScore]:
+    """
+    search_zones scores candidate zones configs for points (log10 energy, log10 efficiency, weight),
+        returns scores sorted from the best one
+    """
+    x = np.asarray(x, dtype=np.float64)
+    energy_min = float(10**np.min(x) * (1 - BOUNDS_EPS))
+    energy_max = float(10**np.max(x) * (1 + BOUNDS_EPS))
+    candidates = generate_candidates(energy_min, energy_max, _get_splits(x, config), config)
+    rng = np.random.default_rng(config.seed)
+    fold_ids = rng.permutation(len(x)) % config.folds
+
+    if config.workers > 1 and len(candidates) > 1:
+        chunk_size = (len(candidates) + config.workers - 1) // config.workers
+        chunks = [candidates[i:i+chunk_size] for i in range(0, len(candidates), chunk_size)]
+        with ProcessPoolExecutor(max_workers=config.workers) as pool:
+            results = pool.map(_score_candidates,
+                               [(chunk, x, y, w, fold_ids, config.folds) for chunk in chunks])
+            scores = [s for chunk_scores in results for s in chunk_scores]
+    else:
+        scores = _score_candidates((candidates, x, y, w, fold_ids, config.folds))
+    if not scores:
+        raise RuntimeError("no valid zones config is found, check degrees and splits")
+    return sorted(scores, key=lambda s: (s.cv_chi2, s.quality))
+
+
+def save_scores_to_tsv(scores: tp.List[ZoneCandidateScore], output_filename: str) -> None:
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(["zones", "cv_chi2", "chi2", "quality"]) + '\n')
+        for s in scores:
+            zones = ";".join(f"{zc.degree},{zc.left_boundary:.2f},{zc.right_boundary:.2f}"
+                             for zc in s.zones_config)
+            f.write('\t'.join([zones, str(s.cv_chi2), str(s.chi2), str(s.quality)]) + '\n')
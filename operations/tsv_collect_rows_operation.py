@@ -0,0 +1,154 @@
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+from .common_code.row_collector import add_row, clear_rows, get_stale_runs, read_rows
+
+
+OUTPUT_FORMATS = ["tsv", "npz"]
+
+
+def _sort_key(row: tp.List[str]) -> tp.List[tp.Tuple[int, tp.Any]]:
+    """numbers are compared as numbers and go before text values"""
+    key = []
+    for v in row:
+        try:
+            key.append((0, float(v)))
+        except ValueError:
+            key.append((1, v))
+    return key
+
+
+def _to_array(values: tp.List[str]) -> np.ndarray:
+    """float array or text array for column with not numerical values"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array(values, dtype=np.str_)
+
+
+def _read_column(filename: str, column_name: str) -> tp.List[float]:
+    """values of one column, other columns are not parsed"""
+    with open(filename) as f:
+        header = None
+        col_idx = None
+        values = []
+        for line in f:
+            line = line.rstrip()
+            if not line:
+                continue
+            if header is None:
+                header = line.split('\t')
+                if column_name not in header:
+                    raise RuntimeError(f"no column {column_name} in {filename}")
+                col_idx = header.index(column_name)
+                continue
+            values.append(float(line.split('\t')[col_idx]))
+    return values
+
+
+@register_operation
+class TsvCollectRowOperation:
+    """
+    TsvCollectRowOperation makes dataset for detector characterisation from tsv-files
+        as TsvOneColumnJoinOperation, but row is kept in memory buffer of process
+        (flushed to the process shard file, when buffer_rows rows are collected),
+        the dataset is written once by TsvCollectedRowsSaveOperation after iterations.
+        It is safe in ForFilesOperation with parallel workers
+    parameters:
+        - input_filename: input tsv-file (e.g. effcalc converted calculation results)
+        - output_filename: dataset filename, the same in all iterations
+        - column_name: column of input file, its values are added to row (default: Eff)
+        - row_exist_values: values in the row beginning (e.g. detector parameters)
+        - buffer_rows: number of rows in memory before flush to shard file (default: 1000)
+    """
+    def __init__(self):
+        self.input_filename = ""
+        self.output_filename = ""
+        self.column_name = "Eff"
+        self.row_exist_values = []
+        self.buffer_rows = 1000
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'TsvCollectRowOperation':
+        op = TsvCollectRowOperation()
+        op.input_filename = os.path.join(project_dir, section['input_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.column_name = section.get("column_name", op.column_name)
+        op.row_exist_values = section.get("row_exist_values", op.row_exist_values)
+        op.buffer_rows = section.get("buffer_rows", op.buffer_rows)
+        assert op.buffer_rows > 0
+        return op
+
+    def run(self) -> None:
+        print('start tsv_collect_row operation')
+        add_row(self.output_filename,
+                self.row_exist_values + _read_column(self.input_filename, self.column_name),
+                self.buffer_rows)
+
+
+@register_operation
+class TsvCollectedRowsSaveOperation:
+    """
+    TsvCollectedRowsSaveOperation writes dataset collected by TsvCollectRowOperation:
+        merges shard files of all processes of the current graph run and memory buffer,
+        shards (and shards of failed runs) are removed after the dataset is saved
+    parameters:
+        - output_filename: dataset filename as in TsvCollectRowOperation
+        - header: list of column names (optional for tsv)
+        - format: tsv or npz (binary numpy archive, output_filename must end with .npz:
+            array for every column from header (text array for not numerical column),
+            or one 2d float array "data" without header)
+        - sort: sort rows by all columns (numbers as numbers), rows of parallel workers
+            are in any order (default: false)
+    """
+    def __init__(self):
+        self.output_filename = ""
+        self.header: tp.List[str] = []
+        self.format = "tsv"
+        self.sort = False
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str
+                        ) -> 'TsvCollectedRowsSaveOperation':
+        op = TsvCollectedRowsSaveOperation()
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.header = section.get("header", op.header)
+        op.format = section.get("format", op.format)
+        assert op.format in OUTPUT_FORMATS, f"unsupported format {op.format}"
+        if op.format == "npz":
+            assert op.output_filename.endswith('.npz'), "npz dataset filename must end with .npz"
+        op.sort = section.get("sort", op.sort)
+        return op
+
+    def run(self) -> None:
+        print('start tsv_collected_rows_save operation')
+        stale_runs = get_stale_runs(self.output_filename)
+        if stale_runs:
+            print(f'shards of {len(stale_runs)} previous runs are ignored: {", ".join(stale_runs)}')
+        rows = read_rows(self.output_filename)
+        if self.sort:
+            rows.sort(key=_sort_key)
+        if rows and self.header and any(len(row) != len(self.header) for row in rows):
+            raise RuntimeError(f"rows of {self.output_filename} and header have different length")
+        print(f'{len(rows)} rows')
+        if self.format == "npz":
+            if self.header:
+                columns = [[row[i] for row in rows] for i in range(len(self.header))]
+                np.savez(self.output_filename,
+                         **{n: _to_array(c) for n, c in zip(self.header, columns)})
+            else:
+                try:
+                    data = np.array(rows, dtype=np.float64)
+                except ValueError:
+                    raise RuntimeError(f"not numerical values in {self.output_filename}, "
+                                       f"set header to save text columns")
+                np.savez(self.output_filename, data=data)
+        else:
+            with open(self.output_filename, 'w') as f:
+                if self.header:
+                    f.write('\t'.join(self.header) + '\n')
+                f.write(''.join('\t'.join(row) + '\n' for row in rows))
+        clear_rows(self.output_filename)
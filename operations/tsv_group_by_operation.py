@@ -0,0 +1,234 @@
+import itertools
+import os
+import typing as tp
+
+import numpy as np
+
+from operations.operation_registry import register_operation
+
+
+AGGREGATE_FUNCTION_NAMES = ["min", "max", "argmin", "argmax", "mean", "std", "wmean", "count"]
+
+
+def _read_header(input_filename: str) -> tp.List[str]:
+    with open(input_filename) as f:
+        for line in f:
+            return line.rstrip('\n').split('\t')
+    raise RuntimeError(f"empty tsv-file: {input_filename}")
+
+
+def _read_chunks(input_filename: str, columns: tp.List[int], chunk_size: int
+                 ) -> tp.Iterator[np.ndarray]:
+    """float arrays of chunk_size rows (or less) with selected columns, header is skipped"""
+    with open(input_filename) as f:
+        next(f)
+        while True:
+            lines = [line for line in itertools.islice(f, chunk_size) if line.strip()]
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter='\t', usecols=columns, ndmin=2)
+
+
+def _first_rows_by_group(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """index of the 1st row with the least value for every group 0..groups.max()"""
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(sorted_groups)) + 1])
+    return order[starts]
+
+
+class _GroupAggregator:
+    """
+    accumulates partial aggregates by chunks: count, mean and sum of squared deviations
+        (merged by Chan's formulas), weighted sums, min/max with values in their rows
+    """
+    def __init__(self, key_count: int, aggregations: tp.List[tp.Dict[str, str]]):
+        self.key_count = key_count
+        self.aggregations = aggregations
+        self.group_ids: tp.Dict[tp.Tuple[float, ...], int] = {}
+        self.count = np.zeros(0)
+        self.state = [self._create_state(agg["function"]) for agg in aggregations]
+
+    @staticmethod
+    def _create_state(func: str) -> tp.Dict[str, np.ndarray]:
+        """arrays by group of one aggregation, empty before the 1st chunk"""
+        if func in ("mean", "std"):
+            names = ["mean", "m2"]
+        elif func == "wmean":
+            names = ["wsum", "wxsum"]
+        elif func in ("min", "argmin"):
+            names = ["min", "at"]
+        elif func in ("max", "argmax"):
+            names = ["max", "at"]
+        else:
+            names = []
+        return {name: np.zeros(0) for name in names}
+
+    def _resize(self, size: int):
+        def grow(a: np.ndarray, fill: float) -> np.ndarray:
+            return np.concatenate([a, np.full(size - len(a), fill)])
+        self.count = grow(self.count, 0.0)
+        for state in self.state:
+            for k, a in state.items():
+                fill = np.inf if k == "min" else -np.inf if k == "max" else 0.0
+                state[k] = grow(a, fill)
+
+    def _get_group_ids(self, keys: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+        """global ids of chunk groups and group index of every chunk row"""
+        if keys.shape[1] == 0:
+            # no key columns: all rows are in one group
+            unique_keys, inverse = keys[:1], np.zeros(len(keys), dtype=int)
+        else:
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        ids = np.array([self.group_ids.setdefault(tuple(k), len(self.group_ids))
+                        for k in unique_keys.tolist()], dtype=int)
+        if len(self.group_ids) > len(self.count):
+            self._resize(len(self.group_ids))
+        return ids, inverse.reshape(-1)
+
+    def update(self, keys: np.ndarray, values: tp.List[tp.Dict[str, np.ndarray]]):
+        """keys: (rows, key columns), values: arrays of aggregation columns"""
+        ids, inverse = self._get_group_ids(keys)
+        chunk_count = np.bincount(inverse, minlength=len(ids)).astype(float)
+        count = self.count[ids]
+        for agg, state, v in zip(self.aggregations, self.state, values):
+            func = agg["function"]
+            if func in ("mean", "std"):
+                chunk_mean = np.bincount(inverse, v["column"], len(ids)) / chunk_count
+                chunk_m2 = np.bincount(inverse, (v["column"] - chunk_mean[inverse])**2, len(ids))
+                total = count + chunk_count
+                delta = chunk_mean - state["mean"][ids]
+                state["mean"][ids] += delta * chunk_count / total
+                state["m2"][ids] += chunk_m2 + delta**2 * count * chunk_count / total
+            elif func == "wmean":
+                state["wsum"][ids] += np.bincount(inverse, v["weight_column"], len(ids))
+                state["wxsum"][ids] += np.bincount(inverse, v["weight_column"] * v["column"],
+                                                   len(ids))
+            elif func in ("min", "max", "argmin", "argmax"):
+                k = "min" if func.endswith("min") else "max"
+                sign = 1.0 if k == "min" else -1.0
+                rows = _first_rows_by_group(inverse, sign * v["column"])
+                chunk_best = v["column"][rows]
+                # strict comparison: the earliest row wins for equal values
+                better = sign * chunk_best < sign * state[k][ids]
+                state[k][ids[better]] = chunk_best[better]
+                if "value_column" in v:
+                    state["at"][ids[better]] = v["value_column"][rows[better]]
+        self.count[ids] += chunk_count
+
+    def result(self) -> tp.Tuple[np.ndarray, np.ndarray]:
+        """group keys sorted and aggregates (groups, aggregations)"""
+        keys = np.array(list(self.group_ids.keys()), dtype=float).reshape(len(self.group_ids),
+                                                                         self.key_count)
+        ids = np.array(list(self.group_ids.values()), dtype=int)
+        columns = []
+        for agg, state in zip(self.aggregations, self.state):
+            func = agg["function"]
+            if func == "count":
+                columns.append(self.count)
+            elif func == "mean":
+                columns.append(state["mean"])
+            elif func == "std":
+                columns.append(np.sqrt(state["m2"] / self.count))
+            elif func == "wmean":
+                columns.append(state["wxsum"] / state["wsum"])
+            elif func in ("min", "max"):
+                columns.append(state[func])
+            else:
+                columns.append(state["at"])
+        values = np.stack(columns, axis=1)[ids] if columns else np.zeros((len(ids), 0))
+        order = np.lexsort(keys.T[::-1]) if keys.shape[1] else np.arange(len(ids))
+        return keys[order], values[order]
+
+
+def _get_aggregation_name(agg: tp.Dict[str, str]) -> str:
+    if agg.get("name"):
+        return agg["name"]
+    if agg["function"] == "count":
+        return "count"
+    if agg["function"] in ("argmin", "argmax"):
+        return f'{agg["value_column"]}_at_{agg["function"][3:]}_{agg["column"]}'
+    return f'{agg["function"]}_{agg["column"]}'
+
+
+def _tsv_group_by(input_filename: str, output_filename: str, key_columns: tp.List[str],
+                  aggregations: tp.List[tp.Dict[str, str]], chunk_size: int):
+    header = _read_header(input_filename)
+    # columns are read once even if used in many aggregations
+    used = list(dict.fromkeys(
+        key_columns + [agg[k] for agg in aggregations
+                       for k in ("column", "weight_column", "value_column") if k in agg]))
+    for name in used:
+        if name not in header:
+            raise RuntimeError(f"no column {name} in {input_filename}")
+    positions = {name: i for i, name in enumerate(used)}
+
+    aggregator = _GroupAggregator(len(key_columns), aggregations)
+    rows = 0
+    for chunk in _read_chunks(input_filename, [header.index(name) for name in used], chunk_size):
+        keys = chunk[:, [positions[name] for name in key_columns]]
+        values = [{k: chunk[:, positions[agg[k]]]
+                   for k in ("column", "weight_column", "value_column") if k in agg}
+                  for agg in aggregations]
+        aggregator.update(keys, values)
+        rows += len(chunk)
+    keys, values = aggregator.result()
+    print(f'{rows} rows, {len(keys)} groups')
+
+    with open(output_filename, 'w') as f:
+        f.write('\t'.join(key_columns + [_get_aggregation_name(agg) for agg in aggregations]))
+        f.write('\n')
+        for key, row in zip(keys.tolist(), values.tolist()):
+            f.write('\t'.join(str(v) for v in key + row))
+            f.write('\n')
+
+
+@register_operation
+class TsvGroupByOperation:
+    """
+    TsvGroupByOperation aggregates numeric tsv-file by groups of rows with the same
+        key columns values (e.g. dataset made by TsvOneColumnJoinOperation),
+        file is processed by chunks of rows, so memory depends on number of groups only
+    parameters:
+        - input_filename: input tsv-file with header
+        - output_filename: output tsv-file: key columns and aggregations, sorted by keys
+            (only header for input without rows)
+        - key_columns: list of columns to group by, empty list -- one group for all rows
+        - aggregations: list of {function: ..., column: ..., name: ...}, functions:
+            min, max, mean, std (as numpy.std), count,
+            wmean -- weighted mean, needs weight_column,
+            argmin, argmax -- value of value_column in row with min/max of column,
+            name is output column name (optional)
+        - chunk_size: number of rows in one chunk (default: 100000)
+    """
+    def __init__(self):
+        self.input_filename = ""
+        self.output_filename = ""
+        self.key_columns: tp.List[str] = []
+        self.aggregations: tp.List[tp.Dict[str, str]] = []
+        self.chunk_size = 100000
+
+    @staticmethod
+    def parse_from_yaml(section: tp.Dict[str, tp.Any], project_dir: str) -> 'TsvGroupByOperation':
+        op = TsvGroupByOperation()
+        op.input_filename = os.path.join(project_dir, section['input_filename'])
+        op.output_filename = os.path.join(project_dir, section['output_filename'])
+        op.key_columns = section.get("key_columns", op.key_columns)
+        op.aggregations = section["aggregations"]
+        for agg in op.aggregations:
+            assert agg["function"] in AGGREGATE_FUNCTION_NAMES, \
+                f"unsupported function {agg['function']}"
+            if agg["function"] != "count":
+                assert "column" in agg, f"column is needed for {agg['function']}"
+            if agg["function"] == "wmean":
+                assert "weight_column" in agg, "weight_column is needed for wmean"
+            if agg["function"] in ("argmin", "argmax"):
+                assert "value_column" in agg, f"value_column is needed for {agg['function']}"
+        op.chunk_size = section.get("chunk_size", op.chunk_size)
+        assert op.chunk_size > 0
+        return op
+
+    def run(self) -> None:
+        print('start tsv_group_by operation')
+        _tsv_group_by(self.input_filename, self.output_filename, self.key_columns,
+                      self.aggregations, self.chunk_size)
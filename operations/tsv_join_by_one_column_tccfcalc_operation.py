@@ -38,6 +38,7 @@ class TsvOneColumnJoinOperation:
     TsvOneColumnJoinOperation makes dataset for detector characterisation from tsv-files
         (effcalc converted calculatoin results). It takes input file content, makes
         a row and appends to output tsv-file.
+        See TsvCollectRowOperation to write the dataset once (and in parallel iterations).
     """
     def __init__(self):
         self.input_filename = ""
@@ -1,17 +1,46 @@
 import argparse
+import os
 
 from create_graph import parse_config
+from operations.common_code.profiler import Profiler, set_profiler
+from operations.mcmodules_wrappers.lib_factory import DEFAULT_FAKE_HISTORY_COST, enable_fake_libs
 
 
 def main():
     parser = argparse.ArgumentParser(description="runs computation graph")
     parser.add_argument("config_filename", help="input config with computation graph")
+    parser.add_argument("--profile", action="store_true",
+                        help="measure time, memory and io of every operation and print summary")
+    parser.add_argument("--profile-output", default=None,
+                        help="profile files prefix: <prefix>.json and <prefix>.trace.json, " +
+                             "default: <config_filename without ext>.profile")
+    parser.add_argument("--fake-libs", action="store_true",
+                        help="use python stand-ins of tccfcalc, physspec and appspec libraries " +
+                             "with synthetic results (for benchmarks and tests)")
+    parser.add_argument("--fake-history-cost", type=float, default=DEFAULT_FAKE_HISTORY_COST,
+                        help="cpu seconds per Monte-Carlo history in fake libraries, " +
+                             f"default: {DEFAULT_FAKE_HISTORY_COST}")
     args = parser.parse_args()
 
+    if args.fake_libs:
+        enable_fake_libs(args.fake_history_cost)
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        set_profiler(profiler)
+
     graph = parse_config(args.config_filename)
     graph.run()
     print('done')
 
+    if profiler is not None:
+        print(profiler.format_summary())
+        prefix = args.profile_output or os.path.splitext(args.config_filename)[0] + '.profile'
+        profiler.save_json(prefix + '.json')
+        profiler.save_chrome_trace(prefix + '.trace.json')
+        print(f'profile is saved to {prefix}.json and {prefix}.trace.json')
+
 
 if __name__ == "__main__":
     main()